@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the blocking engine.
+
+Every operation runs against a temporary hosts file and configuration, so
+the real hosts file is never touched and no administrator rights are
+needed. For each blocklist size the suite measures:
+
+    validate   validate_website() over the raw entries, one at a time
+    normalize  normalize_batch() over the same entries
+    apply      start_blocking() on a synthetic hosts file
+    add        patching one added site into the active section
+    remove     patching one removed site out of the active section
+    unapply    stop_blocking()
+    schedule   compiling size/100 schedules and evaluating a whole week
+
+Wall time comes from a plain run, peak memory from a second run under
+tracemalloc (which slows code down), and bytes written from the engine's
+ApplyResult. Results are printed and saved as JSON; pass --compare with
+an earlier file to see the change per operation.
+
+Usage:
+    python benchmarks/bench.py [--sizes 1000,10000,100000] [--output bench.json]
+    python benchmarks/bench.py --sizes 1000000 --compare previous.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DISABLE_DNS_FLUSH", "1")
+
+from blocker.engine import BlockerEngine, validate_website  # noqa: E402
+from blocker.normalize import normalize_batch  # noqa: E402
+from blocker.weekly import WEEKDAYS, WeeklyIndex  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Lines of unrelated content in the synthetic hosts file
+HOSTS_PREAMBLE_LINES = 200
+
+
+def synthetic_sites(count):
+    """Return count distinct domains in the mix of forms users type in"""
+    forms = ("site{}.example.com", "https://www.site{}.example.org/path", "SITE{}.Example.NET")
+    return [forms[i % len(forms)].format(i) for i in range(count)]
+
+
+def synthetic_hosts():
+    """Return a hosts file with a realistic amount of unrelated content"""
+    lines = ["127.0.0.1 localhost", "::1 localhost ip6-localhost ip6-loopback"]
+    lines.extend(f"10.0.{i // 256}.{i % 256} host{i}.lan" for i in range(HOSTS_PREAMBLE_LINES))
+    return "\n".join(lines) + "\n"
+
+
+def synthetic_schedules(count):
+    """Return count overlapping daytime and overnight schedules"""
+    schedules = []
+    for i in range(count):
+        start = (i * 7) % (24 * 60)
+        end = (start + 90 + i % 600) % (24 * 60)
+        schedules.append({
+            'start_time': f"{start // 60:02d}:{start % 60:02d}",
+            'end_time': f"{end // 60:02d}:{end % 60:02d}",
+            'days': [WEEKDAYS[(i + k) % 7] for k in range(1 + i % 5)]
+        })
+    return schedules
+
+
+class Workspace:
+    """Temporary directory holding a hosts file and configuration"""
+
+    def __init__(self):
+        self.path = tempfile.mkdtemp(prefix="blocker-bench-")
+        self.hosts_path = os.path.join(self.path, "hosts")
+        self.config_file = os.path.join(self.path, "blocker_config.json")
+        with open(self.hosts_path, 'w') as file:
+            file.write(synthetic_hosts())
+
+    def engine(self, sites=(), blocking=False, render_cache=True):
+        """
+        Return a fresh engine on this workspace, optionally already blocking sites.
+
+        Rendered sections are cached in the workspace, or not at all without
+        render_cache, so an operation that renders is timed rendering.
+        """
+        if os.path.exists(self.config_file):
+            os.unlink(self.config_file)
+        with open(self.hosts_path, 'w') as file:
+            file.write(synthetic_hosts())
+        engine = BlockerEngine(
+            config_file=self.config_file,
+            hosts_path=self.hosts_path,
+            backup_path=os.path.join(self.path, "hosts_backup.txt")
+        )
+        engine.subdomain_corpus = os.path.join(self.path, "no_corpus.txt")
+        engine.render_cache = os.path.join(self.path, "render_cache") if render_cache else None
+        if sites:
+            engine.add_websites(sites)
+        if blocking:
+            engine.start_blocking()
+        return engine
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def bytes_of(result):
+    """Return the bytes written reported by an operation result, if any"""
+    return getattr(result, 'bytes_written', 0) or 0
+
+
+def operations(workspace, size):
+    """Yield (name, setup, run) for each benchmarked operation at one size"""
+    raw = synthetic_sites(size)
+    cleaned = [validate_website(site)[1] for site in raw]
+
+    def validate(sites):
+        for site in sites:
+            validate_website(site)
+        return 0
+
+    def add(engine):
+        engine.blocked_sites.add("added.example")
+        return bytes_of(engine.apply_delta(added_sites=["added.example"]))
+
+    def remove(engine):
+        site = cleaned[size // 2]
+        engine.blocked_sites.discard(site)
+        return bytes_of(engine.apply_delta(removed_sites=[site]))
+
+    def normalize(sites):
+        for _ in normalize_batch(sites):
+            pass
+        return 0
+
+    yield "validate", lambda: raw, validate
+
+    yield "normalize", lambda: raw, normalize
+
+    yield ("apply",
+           lambda: workspace.engine(cleaned, render_cache=False),
+           lambda engine: bytes_of(engine.start_blocking()))
+
+    yield "add", lambda: workspace.engine(cleaned, blocking=True), add
+
+    yield "remove", lambda: workspace.engine(cleaned, blocking=True), remove
+
+    yield ("unapply",
+           lambda: workspace.engine(cleaned, blocking=True),
+           lambda engine: bytes_of(engine.stop_blocking()))
+
+    def evaluate_week(schedules):
+        index = WeeklyIndex(schedules)
+        moment = datetime(2024, 1, 1)
+        for minute in range(7 * 24 * 60):
+            index.is_active(moment + timedelta(minutes=minute))
+        index.boundaries()
+        return 0
+
+    yield "schedule", lambda: synthetic_schedules(max(1, size // 100)), evaluate_week
+
+
+def measure(setup, run, memory=True):
+    """Return (seconds, peak_bytes, bytes_written) for one operation"""
+    context = setup()
+    started = time.perf_counter()
+    written = run(context)
+    seconds = time.perf_counter() - started
+    close = getattr(context, 'close', None)
+    if close is not None:
+        close()
+
+    peak = None
+    if memory:
+        context = setup()
+        tracemalloc.start()
+        try:
+            run(context)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        close = getattr(context, 'close', None)
+        if close is not None:
+            close()
+    return seconds, peak, written
+
+
+def run_suite(sizes, only=None, memory=True):
+    """Run every operation at every size and return the result records"""
+    results = []
+    workspace = Workspace()
+    try:
+        for size in sizes:
+            for name, setup, run in operations(workspace, size):
+                if only and name not in only:
+                    continue
+                seconds, peak, written = measure(setup, run, memory)
+                record = {
+                    'operation': name,
+                    'size': size,
+                    'seconds': round(seconds, 6),
+                    'peak_bytes': peak,
+                    'bytes_written': written,
+                }
+                results.append(record)
+                print(format_record(record), flush=True)
+    finally:
+        workspace.close()
+    return results
+
+
+def format_record(record, previous=None):
+    """Format one result line, with the change against a previous run"""
+    peak = record['peak_bytes']
+    line = (f"{record['operation']:<10} {record['size']:>9,} "
+            f"{record['seconds'] * 1000:>11.2f} ms "
+            f"{(peak / 1e6 if peak is not None else float('nan')):>9.1f} MB peak "
+            f"{record['bytes_written']:>12,} B written")
+    if previous:
+        ratio = record['seconds'] / previous['seconds'] if previous['seconds'] else float('inf')
+        line += f"  ({ratio:.2f}x vs previous)"
+    return line
+
+
+def compare(results, previous_path):
+    """Print each result next to the matching one from an earlier run"""
+    with open(previous_path, 'r') as file:
+        previous = {
+            (record['operation'], record['size']): record
+            for record in json.load(file)['results']
+        }
+    print(f"\nCompared with {previous_path}:")
+    for record in results:
+        print(format_record(record, previous.get((record['operation'], record['size']))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Website Blocker engine benchmarks")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated blocklist sizes (default %(default)s)")
+    parser.add_argument("--only", help="comma-separated operations to run")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the tracemalloc run (halves the running time)")
+    parser.add_argument("--output", default="bench_results.json", help="where to save the JSON results")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    only = set(args.only.split(",")) if args.only else None
+
+    print(f"{'operation':<10} {'size':>9} {'wall time':>14} {'memory':>14} {'written':>20}")
+    results = run_suite(sizes, only, memory=not args.no_memory)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=4)
+    print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
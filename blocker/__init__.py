@@ -0,0 +1,21 @@
+"""
+Website Blocker core package.
+
+The modules in this package are GUI-free so they can be used from the
+command line, from cron jobs, or as the backend of the Tk interface in
+website_blocker.py.
+"""
+
+from .engine import (
+    BlockerEngine,
+    BlockerError,
+    DuplicateWebsiteError,
+    InvalidScheduleError,
+    InvalidWebsiteError,
+    check_admin_privileges,
+    get_hosts_path,
+    validate_website,
+)
+from .store import BlocklistStore
+
+__version__ = "2.0"
@@ -0,0 +1,7 @@
+"""Allow ``python -m blocker`` to run the command line interface"""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,427 @@
+"""
+Command line interface for Website Blocker.
+
+Usage:
+    python -m blocker on|off|status
+    python -m blocker add <website> [<website> ...]
+    python -m blocker remove <website> [<website> ...]
+    python -m blocker import <blocklist> [<blocklist> ...]
+    python -m blocker sinkhole [--listen HOST:PORT] [--upstream HOST:PORT]
+    python -m blocker group list
+    python -m blocker group create <name> [--always]
+    python -m blocker group delete <name>
+    python -m blocker group add|remove <name> <website> [<website> ...]
+    python -m blocker group schedule <name> <HH:MM> <HH:MM> <day> [<day> ...]
+    python -m blocker group always <name> on|off
+    python -m blocker snapshot enable [<path>] | disable
+    python -m blocker snapshot from-json <config.json> <snapshot>
+    python -m blocker snapshot to-json <snapshot> <config.json>
+    python -m blocker layout [--address ADDR] [--ipv6 ADDR|off] [--aliases N]
+    python -m blocker focus start <minutes> [<website> ...] [--break MIN] [--cycles N]
+    python -m blocker focus list | cancel <id>
+    python -m blocker daemon [--group GROUP]
+
+Only the headless engine is imported, so toggling from a script or cron job
+never pays for tkinter startup. When the blocker daemon is running, commands
+are sent to it and need no privileges; --local (or --config/--hosts) works
+on the files directly instead. Without the daemon, "focus start" stays in
+the foreground until the session ends, or is cut short with Ctrl+C.
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+from .engine import BlockerEngine, BlockerError, format_schedule
+
+
+def build_parser():
+    """Build the argument parser"""
+    parser = argparse.ArgumentParser(
+        prog="block",
+        description="Website Blocker - command line interface"
+    )
+    parser.add_argument("--config", help="path to blocker_config.json")
+    parser.add_argument("--hosts", help="path to the hosts file")
+    parser.add_argument("--stats", action="append", metavar="FILE",
+                        help="write timing stats to FILE (.prom for Prometheus text, else JSON)")
+    parser.add_argument("--socket", help="path of the daemon socket")
+    parser.add_argument("--local", action="store_true",
+                        help="do not use the daemon, even if it is running")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("on", help="start blocking")
+    commands.add_parser("off", help="stop blocking")
+    commands.add_parser("status", help="show blocking status and blocked websites")
+
+    add_parser = commands.add_parser("add", help="add websites to the blocked list")
+    add_parser.add_argument("websites", nargs="+")
+
+    remove_parser = commands.add_parser("remove", help="remove websites from the blocked list")
+    remove_parser.add_argument("websites", nargs="+")
+
+    import_parser = commands.add_parser(
+        "import", help="import hosts, adblock or plain-domain blocklists"
+    )
+    import_parser.add_argument("files", nargs="+")
+
+    sinkhole_parser = commands.add_parser(
+        "sinkhole", help="answer DNS queries for blocked names from a local resolver"
+    )
+    sinkhole_parser.add_argument("--listen", help="address to listen on (default from config)")
+    sinkhole_parser.add_argument("--upstream", help="resolver to forward other queries to")
+
+    group_parser = commands.add_parser("group", help="manage named site groups")
+    group_commands = group_parser.add_subparsers(dest="group_command", required=True)
+    group_commands.add_parser("list", help="list site groups")
+    create_parser = group_commands.add_parser("create", help="create a site group")
+    create_parser.add_argument("name")
+    create_parser.add_argument("--always", action="store_true", help="block around the clock")
+    delete_parser = group_commands.add_parser("delete", help="delete a site group")
+    delete_parser.add_argument("name")
+    for action in ("add", "remove"):
+        sites_parser = group_commands.add_parser(action, help=f"{action} websites")
+        sites_parser.add_argument("name")
+        sites_parser.add_argument("websites", nargs="+")
+    schedule_parser = group_commands.add_parser("schedule", help="add a weekly schedule")
+    schedule_parser.add_argument("name")
+    schedule_parser.add_argument("start_time")
+    schedule_parser.add_argument("end_time")
+    schedule_parser.add_argument("days", nargs="+")
+    always_parser = group_commands.add_parser("always", help="block a group around the clock")
+    always_parser.add_argument("name")
+    always_parser.add_argument("state", choices=["on", "off"])
+
+    snapshot_parser = commands.add_parser(
+        "snapshot", help="keep large blocklists in a compact binary snapshot"
+    )
+    snapshot_commands = snapshot_parser.add_subparsers(dest="snapshot_command", required=True)
+    enable_parser = snapshot_commands.add_parser("enable", help="store the blocked list in a snapshot")
+    enable_parser.add_argument("path", nargs="?", help="snapshot file (default blocklist.snap)")
+    snapshot_commands.add_parser("disable", help="store the blocked list in the JSON config again")
+    from_json_parser = snapshot_commands.add_parser(
+        "from-json", help="convert an exported configuration to a snapshot"
+    )
+    from_json_parser.add_argument("json_file")
+    from_json_parser.add_argument("snapshot_file")
+    to_json_parser = snapshot_commands.add_parser(
+        "to-json", help="convert a snapshot to a configuration that can be imported"
+    )
+    to_json_parser.add_argument("snapshot_file")
+    to_json_parser.add_argument("json_file")
+
+    layout_parser = commands.add_parser(
+        "layout", help="show or change how the hosts section is written"
+    )
+    layout_parser.add_argument("--address", help="IPv4 address blocked names resolve to")
+    layout_parser.add_argument("--ipv6", metavar="ADDR",
+                               help="also write IPv6 lines to this address (:: or ::1), or 'off'")
+    layout_parser.add_argument("--aliases", type=int, metavar="N",
+                               help="hostnames per line, 1 to 9 (default 1)")
+
+    focus_parser = commands.add_parser(
+        "focus", help="block websites for the next few minutes, pomodoro style"
+    )
+    focus_commands = focus_parser.add_subparsers(dest="focus_command", required=True)
+    focus_start_parser = focus_commands.add_parser(
+        "start", help="start a focus session (the blocked list if no websites are given)"
+    )
+    focus_start_parser.add_argument("minutes", type=float)
+    focus_start_parser.add_argument("websites", nargs="*")
+    focus_start_parser.add_argument("--break", dest="break_minutes", type=float, default=0,
+                                    metavar="MIN", help="minutes unblocked between work periods")
+    focus_start_parser.add_argument("--cycles", type=int, default=1, metavar="N",
+                                    help="number of work periods (default 1)")
+    focus_commands.add_parser("list", help="list running focus sessions")
+    focus_cancel_parser = focus_commands.add_parser("cancel", help="end a focus session now")
+    focus_cancel_parser.add_argument("id", type=int)
+
+    daemon_parser = commands.add_parser(
+        "daemon", help="run the privileged daemon that owns the hosts file and schedules"
+    )
+    daemon_parser.add_argument("--group", help="only members of this group may use the socket")
+
+    return parser
+
+
+# Commands that always run on an engine in this process
+LOCAL_COMMANDS = {'daemon', 'sinkhole', 'snapshot'}
+
+
+def create_engine(args):
+    """Connect to the daemon, or create an engine honouring the command line overrides"""
+    local = args.local or args.config or args.hosts or args.stats
+    if not local and args.command not in LOCAL_COMMANDS:
+        from .daemon import connect
+
+        engine = connect(args.socket)
+        if engine is not None:
+            return engine
+
+    kwargs = {}
+    if args.command == 'daemon':
+        kwargs['background_save'] = True
+    if args.config:
+        kwargs['config_file'] = args.config
+    if args.hosts:
+        kwargs['hosts_path'] = args.hosts
+    if args.stats:
+        from .stats import Stats
+
+        kwargs['stats'] = Stats()
+    engine = BlockerEngine(**kwargs)
+    if args.stats:
+        engine.stats_paths = args.stats
+    return engine
+
+
+def report_flush(engine):
+    """Print the outcome of the DNS flush that followed a hosts change"""
+    result = engine.last_flush
+    if result is None or result.method == "disabled":
+        return
+    if result.ok:
+        print(f"DNS cache flushed via {result.method} in {result.duration * 1000:.0f} ms.")
+    else:
+        print(f"Warning: DNS cache flush failed ({result.error}).", file=sys.stderr)
+
+
+def cmd_on(engine, args):
+    """Start blocking"""
+    if not engine.blocked_sites:
+        print("No websites to block. Add some with 'add' first.", file=sys.stderr)
+        return 1
+    result = engine.start_blocking()
+    print(f"Blocking {result.sites} websites ({result.bytes_written} bytes written).")
+    report_flush(engine)
+    return 0
+
+
+def cmd_off(engine, args):
+    """Stop blocking"""
+    result = engine.stop_blocking()
+    print(f"Website blocking stopped ({result.bytes_written} bytes written).")
+    report_flush(engine)
+    return 0
+
+
+def cmd_status(engine, args):
+    """Print blocking status and the blocked list"""
+    print(f"Status: {'Active' if engine.is_blocking else 'Inactive'}")
+    if engine.remote:
+        print("Managed by the blocker daemon")
+    if engine.active_groups:
+        print(f"Active groups: {', '.join(sorted(engine.active_groups))}")
+    if engine.focus_sessions:
+        print(f"Focus sessions: {len(engine.focus_sessions)} ({len(engine.active_focus)} blocking)")
+    print(f"Blocked websites: {len(engine.blocked_sites)}")
+    for site in engine.blocked_sites:
+        print(f"  {site}")
+    return 0
+
+
+def cmd_add(engine, args):
+    """Add websites to the blocked list"""
+    status = 0
+    for website in args.websites:
+        try:
+            print(f"Added {engine.add_website(website)}")
+        except BlockerError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            status = 1
+    return status
+
+
+def cmd_remove(engine, args):
+    """Remove websites from the blocked list"""
+    status = 0
+    for website in args.websites:
+        try:
+            print(f"Removed {engine.remove_website(website)}")
+        except BlockerError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            status = 1
+    return status
+
+
+def cmd_import(engine, args):
+    """Import blocklist files"""
+    for path in args.files:
+        report = engine.import_blocklist(path)
+        print(f"{path}: {report.summary()}")
+    return 0
+
+
+def cmd_sinkhole(engine, args):
+    """Run the DNS sinkhole in the foreground"""
+    from .sinkhole import run_sinkhole
+
+    last_check = [0.0]
+
+    def is_blocked(hostname):
+        # Pick up edits made by other processes, at most once a second
+        now = time.monotonic()
+        if now - last_check[0] >= 1.0:
+            last_check[0] = now
+            engine.reload_if_changed()
+        return engine.is_hostname_blocked(hostname)
+
+    run_sinkhole(
+        is_blocked,
+        listen=args.listen or engine.dns_listen,
+        upstream=args.upstream or engine.dns_upstream
+    )
+    return 0
+
+
+def cmd_group(engine, args):
+    """Manage named site groups"""
+    action = args.group_command
+    if action == "list":
+        for name, group in engine.groups.items():
+            state = "active" if name in engine.active_groups else "inactive"
+            when = "always" if group.always else (
+                "; ".join(format_schedule(s) for s in group.schedules) or "no schedule"
+            )
+            print(f"{name} ({state}, {len(group.sites)} sites): {when}")
+    elif action == "create":
+        engine.create_group(args.name, always=args.always)
+        print(f"Created group {args.name}")
+    elif action == "delete":
+        engine.delete_group(args.name)
+        print(f"Deleted group {args.name}")
+    elif action == "add":
+        result = engine.add_group_sites(args.name, args.websites)
+        print(f"Added {result.changed} websites to {args.name} "
+              f"({result.unchanged} duplicates, {result.invalid} invalid)")
+    elif action == "remove":
+        result = engine.remove_group_sites(args.name, args.websites)
+        print(f"Removed {result.changed} websites from {args.name}")
+    elif action == "schedule":
+        days = [day.capitalize() for day in args.days]
+        schedule = engine.add_group_schedule(args.name, args.start_time, args.end_time, days)
+        print(f"Scheduled {args.name}: {format_schedule(schedule)}")
+    elif action == "always":
+        engine.set_group_always(args.name, args.state == "on")
+        print(f"Group {args.name} is blocked {'always' if args.state == 'on' else 'on schedule'}")
+    return 0
+
+
+def cmd_snapshot(engine, args):
+    """Manage the binary blocklist snapshot"""
+    from .snapshot import json_to_snapshot, snapshot_to_json
+
+    action = args.snapshot_command
+    if action == "enable":
+        engine.enable_snapshot(args.path)
+        print(f"Blocked list stored in {engine.snapshot_file} ({len(engine.blocked_sites)} websites)")
+    elif action == "disable":
+        engine.disable_snapshot()
+        print(f"Blocked list stored in {engine.config_file}")
+    elif action == "from-json":
+        count = json_to_snapshot(args.json_file, args.snapshot_file)
+        print(f"Wrote {count} websites to {args.snapshot_file}")
+    elif action == "to-json":
+        count = snapshot_to_json(args.snapshot_file, args.json_file)
+        print(f"Wrote {count} websites to {args.json_file}")
+    return 0
+
+
+def cmd_layout(engine, args):
+    """Show or change the hosts section layout"""
+    changes = {}
+    if args.address is not None:
+        changes['address'] = args.address
+    if args.ipv6 is not None:
+        changes['address6'] = None if args.ipv6 == "off" else args.ipv6
+    if args.aliases is not None:
+        changes['aliases'] = args.aliases
+    options = engine.set_render_options(**changes)
+    print(f"Sink address: {options.address}")
+    print(f"IPv6 sink address: {options.address6 or 'off'}")
+    print(f"Hostnames per line: {options.aliases}")
+    return 0
+
+
+def cmd_focus(engine, args):
+    """Start, list or cancel focus sessions"""
+    from .focus import format_session
+
+    action = args.focus_command
+    if action == "list":
+        now = time.time()
+        for session in engine.focus_sessions.values():
+            print(format_session(session, now))
+    elif action == "cancel":
+        engine.cancel_focus(args.id)
+        print(f"Focus session #{args.id} ended")
+    elif action == "start":
+        lock = threading.Lock()
+
+        def dispatch(func, *func_args):
+            with lock:
+                func(*func_args)
+
+        if not engine.remote:
+            # Nothing else will end the session, so this process runs its timers
+            engine.start_focus_timers(dispatch=dispatch)
+        with lock:
+            session = engine.start_focus(args.minutes, args.websites or None,
+                                         args.break_minutes, args.cycles)
+        print(f"Started {format_session(session, time.time())}")
+        if engine.remote:
+            return 0
+
+        print("Press Ctrl+C to end it early.")
+        try:
+            while session.id in engine.focus_sessions:
+                time.sleep(0.2)
+        except KeyboardInterrupt:
+            with lock:
+                if session.id in engine.focus_sessions:
+                    engine.cancel_focus(session.id)
+        print(f"Focus session #{session.id} ended")
+    return 0
+
+
+def cmd_daemon(engine, args):
+    """Run the privileged daemon in the foreground"""
+    from .daemon import BlockerDaemon
+
+    BlockerDaemon(engine, args.socket, group=args.group).serve_forever()
+    return 0
+
+
+COMMANDS = {
+    'on': cmd_on,
+    'off': cmd_off,
+    'status': cmd_status,
+    'add': cmd_add,
+    'remove': cmd_remove,
+    'import': cmd_import,
+    'sinkhole': cmd_sinkhole,
+    'group': cmd_group,
+    'snapshot': cmd_snapshot,
+    'layout': cmd_layout,
+    'focus': cmd_focus,
+    'daemon': cmd_daemon,
+}
+
+
+def main(argv=None):
+    """Run the command line interface and return an exit status"""
+    args = build_parser().parse_args(argv)
+
+    try:
+        engine = create_engine(args)
+        try:
+            return COMMANDS[args.command](engine, args)
+        finally:
+            engine.close()
+    except PermissionError:
+        print("Permission denied. Please run as administrator/root.", file=sys.stderr)
+        return 1
+    except (BlockerError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
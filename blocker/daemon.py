@@ -0,0 +1,693 @@
+"""
+Privileged blocking daemon.
+
+Writing the hosts file needs root (or an administrator), and schedules are
+only enforced while something runs the scheduler. BlockerDaemon is a
+long-lived process, started as root (by systemd, launchd, ...), that owns
+the engine: the blocklist, the schedules and the hosts file. The GUI and
+the CLI run unprivileged and talk to it over a Unix socket, so blocking
+keeps following the schedules after the window closes.
+
+The protocol is one JSON object per line in each direction:
+
+    {"id": 1, "method": "add_website", "args": ["example.com"], "kwargs": {}}
+    {"id": 1, "result": "example.com"}
+    {"id": 2, "error": {"type": "DuplicateWebsiteError", "message": "..."}}
+
+Only the engine methods listed in METHODS can be called. Clients read and
+write their own files (imports and exports), so the daemon never opens a
+path chosen by a client. Who may connect is decided by the permissions of
+the socket file, which only root (or the --group) can open. Where the
+platform reports the peer of a connection (SO_PEERCRED), methods that
+change state are also refused to anyone but root, the daemon's own user
+and members of that group. Clients can only point the sink at a loopback
+or unspecified address, never at a server elsewhere.
+
+RemoteEngine offers the parts of the BlockerEngine interface the GUI and
+the CLI use, forwarding each call to the daemon. Its properties answer
+from the state fetched by the last call or refresh(), so reading them
+never waits on the socket; the GUI refreshes on its worker thread.
+"""
+
+import itertools
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+from .engine import (
+    ApplyResult,
+    BlockerError,
+    BulkResult,
+    DuplicateWebsiteError,
+    InvalidScheduleError,
+    InvalidWebsiteError,
+    UnknownFocusError,
+    UnknownGroupError,
+    validate_website,
+    write_exported_config,
+)
+from .focus import FocusSession
+from .groups import SiteGroup
+from .hosts import RenderOptions
+from .stats import NULL_STATS
+from .store import BlocklistStore
+
+DEFAULT_SOCKET_PATH = "/var/run/website-blocker.sock"
+# Permissions of the socket: only the daemon's user, or also the members
+# of the group given with --group
+DEFAULT_SOCKET_MODE = 0o600
+GROUP_SOCKET_MODE = 0o660
+
+# struct ucred, as returned for SO_PEERCRED: pid, uid, gid
+_PEERCRED = struct.Struct("3i")
+
+# Seconds a client waits for an answer; applying a huge list takes a while
+DEFAULT_TIMEOUT = 60.0
+
+# Lines sent per import_lines call when a client imports a blocklist file
+IMPORT_CHUNK_LINES = 100000
+
+# Engine methods clients may call, and whether they can change the main
+# blocked list (clients then fetch the list again)
+METHODS = {
+    'start_blocking': False,
+    'stop_blocking': False,
+    'resync_blocking': False,
+    'add_website': True,
+    'remove_website': True,
+    'add_websites': True,
+    'remove_websites': True,
+    'import_lines': True,
+    'clear_websites': True,
+    'import_config_dict': True,
+    'add_schedule': False,
+    'remove_schedule': False,
+    'create_group': False,
+    'delete_group': False,
+    'add_group_sites': False,
+    'remove_group_sites': False,
+    'add_group_schedule': False,
+    'remove_group_schedule': False,
+    'set_group_always': False,
+    'set_render_options': False,
+    'start_focus': False,
+    'cancel_focus': False,
+    'backup_hosts': False,
+    'restore_hosts': False,
+}
+
+# Read-only requests answered by the daemon itself
+QUERIES = ('ping', 'state', 'sites', 'config', 'is_hostname_blocked')
+
+
+class DaemonError(BlockerError):
+    """Raised when the daemon can not be reached or sends a bad answer"""
+
+
+def socket_path():
+    """Return the daemon socket path, honouring BLOCKER_SOCKET"""
+    return os.environ.get("BLOCKER_SOCKET", DEFAULT_SOCKET_PATH)
+
+
+def daemon_supported():
+    """Return True if this platform has Unix domain sockets"""
+    return hasattr(socket, 'AF_UNIX')
+
+
+def peer_credentials(sock):
+    """Return the (pid, uid, gid) of the process connected to a Unix socket, or None where unsupported"""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    return _PEERCRED.unpack(sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _PEERCRED.size))
+
+
+def check_remote_render_options(changes):
+    """Raise PermissionError unless every sink address in changes is loopback or unspecified"""
+    import ipaddress
+
+    for key in ('address', 'address6'):
+        value = changes.get(key)
+        if value is None:
+            continue
+        try:
+            address = ipaddress.ip_address(value)
+        except (TypeError, ValueError):
+            # Not an address at all; the engine rejects it with its own message
+            continue
+        if not (address.is_loopback or address.is_unspecified):
+            raise PermissionError(f"Clients may only sink to a loopback or unspecified address, not {value}")
+
+
+def encode_result(value):
+    """Return (result, result_type) with result types sent as plain objects"""
+    from .importer import ImportReport
+
+    if isinstance(value, (ApplyResult, BulkResult, ImportReport, RenderOptions)):
+        return value._asdict(), type(value).__name__
+    if isinstance(value, SiteGroup):
+        return dict(value.to_dict(), name=value.name), 'SiteGroup'
+    if isinstance(value, FocusSession):
+        return value.to_dict(), 'FocusSession'
+    return value, None
+
+
+def decode_result(result, result_type):
+    """Rebuild a result encoded by encode_result"""
+    from .importer import ImportReport
+
+    types = {'ApplyResult': ApplyResult, 'BulkResult': BulkResult, 'ImportReport': ImportReport,
+             'RenderOptions': RenderOptions}
+    if result_type in types:
+        return types[result_type](**result)
+    if result_type == 'SiteGroup':
+        return SiteGroup.from_dict(result.pop('name'), result)
+    if result_type == 'FocusSession':
+        return FocusSession.from_dict(result)
+    return result
+
+
+# Exceptions re-raised on the client side; anything else becomes BlockerError
+ERRORS = {
+    cls.__name__: cls for cls in (
+        BlockerError, InvalidWebsiteError, DuplicateWebsiteError, InvalidScheduleError,
+        UnknownGroupError, UnknownFocusError, PermissionError, FileNotFoundError,
+    )
+}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        daemon = self.server.blocker_daemon
+        try:
+            credentials = peer_credentials(self.connection)
+        except OSError as e:
+            print(f"Could not identify a client: {e}", file=sys.stderr)
+            return
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("not a JSON object")
+                args, kwargs = request.get('args', []), request.get('kwargs', {})
+                if not isinstance(args, list) or not isinstance(kwargs, dict):
+                    raise ValueError("args must be a list and kwargs an object")
+                response = {'id': request.get('id')}
+                response.update(daemon.handle(request.get('method'), args, kwargs, credentials))
+            except ValueError as e:
+                response = {'id': None, 'error': {'type': 'DaemonError', 'message': f"Bad request: {e}"}}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+class BlockerDaemon:
+    """Serves one engine to GUI and CLI clients and runs its scheduler"""
+
+    def __init__(self, engine, path=None, group=None, mode=None):
+        self.engine = engine
+        self.path = path or socket_path()
+        self.group = group
+        self.mode = mode if mode is not None else (GROUP_SOCKET_MODE if group else DEFAULT_SOCKET_MODE)
+        self.generation = 0
+        self.sites_generation = 0
+        self.auto_started = False
+        self._lock = threading.RLock()
+        self._server = None
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Requests
+    # ------------------------------------------------------------------
+
+    def handle(self, method, args, kwargs, credentials=None):
+        """
+        Run one request and return the result or error fields of the response.
+
+        credentials are the (pid, uid, gid) of the client, or None when the
+        platform can not tell; then the socket permissions are the only check.
+        """
+        try:
+            if method in QUERIES:
+                with self._lock:
+                    result = getattr(self, f"query_{method}")(*args, **kwargs)
+            elif method in METHODS:
+                self.authorize(credentials)
+                if method == 'set_render_options':
+                    check_remote_render_options(kwargs)
+                with self._lock:
+                    if method in ('start_blocking', 'stop_blocking'):
+                        # A manual toggle overrides the schedule until it next changes
+                        self.auto_started = False
+                    try:
+                        result = getattr(self.engine, method)(*args, **kwargs)
+                    finally:
+                        self.changed(METHODS[method])
+            else:
+                raise DaemonError(f"Unknown method: {method}")
+            result, result_type = encode_result(result)
+        except Exception as e:
+            # args[0] rather than str(), which quotes the message of a KeyError
+            message = e.args[0] if len(e.args) == 1 and isinstance(e.args[0], str) else str(e)
+            return {'error': {'type': type(e).__name__, 'message': message}}
+        return {'result': result, 'result_type': result_type}
+
+    def authorize(self, credentials):
+        """Raise PermissionError unless the client may change state"""
+        if credentials is None:
+            return
+        _, uid, gid = credentials
+        if uid in (0, os.geteuid()):
+            return
+        if self.group and self._in_group(uid, gid):
+            return
+        raise PermissionError(f"User {uid} is not allowed to control the blocker daemon.")
+
+    def _in_group(self, uid, gid):
+        """Return True if the user is a member of the daemon's group"""
+        import grp
+        import pwd
+
+        try:
+            group = grp.getgrnam(self.group)
+        except KeyError:
+            return False
+        if gid == group.gr_gid:
+            return True
+        try:
+            user = pwd.getpwuid(uid)
+        except KeyError:
+            return False
+        return user.pw_gid == group.gr_gid or user.pw_name in group.gr_mem
+
+    def changed(self, sites=False):
+        """Note a state change so clients know to refresh"""
+        self.generation += 1
+        if sites:
+            self.sites_generation += 1
+
+    def query_ping(self):
+        return {'pid': os.getpid(), 'generation': self.generation}
+
+    def query_state(self):
+        engine = self.engine
+        flush = engine.last_flush
+        return {
+            'generation': self.generation,
+            'sites_generation': self.sites_generation,
+            'is_blocking': engine.is_blocking,
+            'site_count': len(engine.blocked_sites),
+            'scheduled_blocks': engine.scheduled_blocks,
+            'groups': {name: group.to_dict() for name, group in engine.groups.items()},
+            'active_groups': sorted(engine.active_groups),
+            'focus_sessions': [session.to_dict() for session in engine.focus_sessions.values()],
+            'active_focus': sorted(engine.active_focus),
+            'auto_started': self.auto_started,
+            'config_file': os.path.abspath(engine.config_file),
+            'hosts_path': engine.hosts_path,
+            'backup_path': os.path.abspath(engine.backup_path),
+            'last_flush': flush._asdict() if flush is not None else None,
+            'repairs': [repair._asdict() for repair in engine.repairs],
+        }
+
+    def query_sites(self):
+        return {'sites_generation': self.sites_generation, 'sites': self.engine.blocked_sites.to_list()}
+
+    def query_config(self):
+        return self.engine.config_dict()
+
+    def query_is_hostname_blocked(self, hostname):
+        return self.engine.is_hostname_blocked(hostname)
+
+    # ------------------------------------------------------------------
+    # Scheduler
+    # ------------------------------------------------------------------
+
+    def dispatch(self, func, *args):
+        """Run a scheduler transition under the engine lock"""
+        with self._lock:
+            try:
+                func(*args)
+            finally:
+                self.changed()
+
+    def apply_schedule(self, should_block):
+        """Start or stop blocking when the main schedules start or end"""
+        engine = self.engine
+        try:
+            if should_block and not engine.is_blocking and engine.blocked_sites:
+                self.auto_started = True
+                result = engine.start_blocking()
+                print(f"Schedule started: blocking {result.sites} websites", file=sys.stderr)
+            elif not should_block and engine.is_blocking and self.auto_started:
+                # Only stop if it was auto-started by the scheduler
+                self.auto_started = False
+                engine.stop_blocking()
+                print("Schedule ended: blocking stopped", file=sys.stderr)
+        except Exception as e:
+            print(f"Scheduled blocking failed: {e}", file=sys.stderr)
+
+    # ------------------------------------------------------------------
+    # Server
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Bind the socket, start the scheduler and serve in a background thread"""
+        if not daemon_supported():
+            raise DaemonError("The daemon needs Unix domain sockets, which this platform lacks.")
+        if os.path.exists(self.path):
+            if connect(self.path) is not None:
+                raise DaemonError(f"A daemon is already listening on {self.path}")
+            # Left behind by a daemon that did not shut down cleanly
+            os.unlink(self.path)
+
+        # Create the socket without access for others, so nobody can
+        # connect before its permissions are set
+        umask = os.umask(0o177)
+        try:
+            self._server = _Server(self.path, _Handler)
+        finally:
+            os.umask(umask)
+        self._server.blocker_daemon = self
+        if self.group:
+            import grp
+
+            os.chown(self.path, -1, grp.getgrnam(self.group).gr_gid)
+        os.chmod(self.path, self.mode)
+
+        try:
+            self.engine.resume_enforcement()
+        except OSError as e:
+            print(f"Could not start the DNS sinkhole: {e}", file=sys.stderr)
+        self.engine.start_scheduler(self.apply_schedule, dispatch=self.dispatch)
+        self.engine.start_focus_timers(dispatch=self.dispatch)
+        watcher = self.engine.start_watcher(dispatch=self.dispatch)
+        print(f"Watching {self.engine.hosts_path} ({watcher.method})", file=sys.stderr)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="daemon", daemon=True)
+        self._thread.start()
+        print(f"Listening on {self.path}", file=sys.stderr)
+        return self
+
+    def serve_forever(self):
+        """Serve until SIGTERM or SIGINT, then shut down cleanly"""
+        stop = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stop.set())
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda *_: self.reload())
+        self.start()
+        try:
+            while not stop.wait(1.0):
+                pass
+        finally:
+            self.close()
+
+    def reload(self):
+        """Pick up a configuration edited by hand, then re-apply it"""
+        with self._lock:
+            try:
+                if self.engine.reload_if_changed():
+                    self.engine.schedules_changed()
+                    self.engine.resync_blocking()
+                    print("Configuration reloaded", file=sys.stderr)
+            except Exception as e:
+                print(f"Reload failed: {e}", file=sys.stderr)
+            finally:
+                self.changed(sites=True)
+
+    def close(self):
+        """Stop serving and release the engine; the hosts file is left as it is"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        # Not under the lock: closing joins the scheduler thread, which may
+        # be waiting for it
+        self.engine.close()
+
+
+class DaemonClient:
+    """Connection to the daemon; calls are serialized, so threads may share it"""
+
+    def __init__(self, path=None, timeout=DEFAULT_TIMEOUT):
+        self.path = path or socket_path()
+        self.timeout = timeout
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._socket = None
+        self._file = None
+
+    def connect(self):
+        """Open the connection, raising OSError if the daemon is not listening"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self._socket = sock
+        self._file = sock.makefile('rb')
+        return self
+
+    def call(self, method, *args, **kwargs):
+        """Run a method in the daemon and return its result"""
+        request_id = next(self._ids)
+        request = {'id': request_id, 'method': method, 'args': args, 'kwargs': kwargs}
+        data = json.dumps(request).encode() + b"\n"
+        with self._lock:
+            try:
+                if self._socket is None:
+                    self.connect()
+                self._socket.sendall(data)
+                line = self._file.readline()
+            except OSError as e:
+                self.close()
+                raise DaemonError(f"Lost connection to the blocker daemon: {e}") from e
+            if not line:
+                self.close()
+                raise DaemonError("The blocker daemon closed the connection.")
+
+        try:
+            response = json.loads(line)
+        except ValueError as e:
+            raise DaemonError(f"Bad answer from the blocker daemon: {e}") from e
+        error = response.get('error')
+        if error is not None:
+            raise ERRORS.get(error['type'], BlockerError)(error['message'])
+        return decode_result(response.get('result'), response.get('result_type'))
+
+    def close(self):
+        """Close the connection"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+def connect(path=None):
+    """Return a RemoteEngine connected to the daemon, or None if none is running"""
+    if not daemon_supported():
+        return None
+    client = DaemonClient(path)
+    engine = RemoteEngine(client)
+    try:
+        client.connect()
+        engine.refresh()
+    except (OSError, DaemonError):
+        client.close()
+        return None
+    return engine
+
+
+class RemoteEngine:
+    """BlockerEngine stand-in that forwards every operation to the daemon"""
+
+    remote = True
+
+    def __init__(self, client):
+        self.client = client
+        self.progress = None
+        self.on_dns_flush = None
+        self.on_repair = None
+        self.stats = NULL_STATS
+        self.scheduler = None
+        self._state = None
+        self._sites = None
+        self._sites_generation = None
+
+    def __getattr__(self, name):
+        if name in METHODS:
+            return lambda *args, **kwargs: self._call(name, *args, **kwargs)
+        raise AttributeError(name)
+
+    def _call(self, method, *args, **kwargs):
+        try:
+            return self.client.call(method, *args, **kwargs)
+        finally:
+            # Whatever the outcome, read the state again on this thread (the
+            # worker, in the GUI), so the properties never wait on the socket
+            try:
+                self.refresh()
+            except BlockerError:
+                # Keep the last state; the next refresh tries again
+                pass
+
+    def refresh(self):
+        """Fetch the daemon state; return True if it changed since the last fetch"""
+        previous = self._state
+        state = self.client.call('state')
+        if self._sites is not None and self._sites_generation != state['sites_generation']:
+            self._fetch_sites()
+        self._state = state
+        return previous is None or previous['generation'] != state['generation']
+
+    def _fetch_sites(self):
+        reply = self.client.call('sites')
+        self._sites = BlocklistStore(reply['sites'])
+        self._sites_generation = reply['sites_generation']
+
+    @property
+    def state(self):
+        """The daemon state as of the last refresh(); fetched here only the first time"""
+        if self._state is None:
+            self.refresh()
+        return self._state
+
+    @property
+    def blocked_sites(self):
+        """
+        The main blocked list as of the last refresh().
+
+        The list is fetched here on first use only; after that refresh()
+        fetches it again whenever it changed.
+        """
+        if self._sites is None:
+            self._fetch_sites()
+        return self._sites
+
+    @property
+    def is_blocking(self):
+        return self.state['is_blocking']
+
+    @property
+    def scheduled_blocks(self):
+        return self.state['scheduled_blocks']
+
+    @property
+    def groups(self):
+        return {name: SiteGroup.from_dict(name, data) for name, data in self.state['groups'].items()}
+
+    @property
+    def active_groups(self):
+        return frozenset(self.state['active_groups'])
+
+    @property
+    def focus_sessions(self):
+        return {data['id']: FocusSession.from_dict(data) for data in self.state['focus_sessions']}
+
+    @property
+    def active_focus(self):
+        return frozenset(self.state['active_focus'])
+
+    @property
+    def config_file(self):
+        return self.state['config_file']
+
+    @property
+    def hosts_path(self):
+        return self.state['hosts_path']
+
+    @property
+    def backup_path(self):
+        return self.state['backup_path']
+
+    @property
+    def last_flush(self):
+        from .dnsflush import FlushResult
+
+        flush = self.state['last_flush']
+        return FlushResult(**flush) if flush is not None else None
+
+    def validate_website(self, website):
+        """Validate website URL format"""
+        return validate_website(website)
+
+    def is_hostname_blocked(self, hostname):
+        """Check a hostname against the blocklists the daemon enforces"""
+        return self.client.call('is_hostname_blocked', hostname)
+
+    def import_blocklist(self, path):
+        """
+        Read a blocklist here and import its lines in the daemon.
+
+        The file is sent in chunks of IMPORT_CHUNK_LINES lines, one
+        import_lines call each, so neither side holds the whole file. If a
+        chunk fails, the chunks before it stay imported.
+        """
+        from .importer import ImportReport
+
+        started = time.perf_counter()
+        totals = [0, 0, 0, 0]
+        with open(path, 'r', encoding='utf-8', errors='replace') as file:
+            while True:
+                lines = [line.rstrip('\r\n') for line in itertools.islice(file, IMPORT_CHUNK_LINES)]
+                if not lines:
+                    break
+                report = self._call('import_lines', lines)
+                totals = [total + count for total, count in zip(totals, report[:4])]
+                if self.progress is not None:
+                    self.progress(f"Importing blocklist ({totals[0]:,} lines sent)")
+        return ImportReport(*totals, time.perf_counter() - started)
+
+    def import_config(self, filename):
+        """Read an exported configuration here and import it in the daemon"""
+        with open(filename, 'r') as file:
+            config = json.load(file)
+        return self._call('import_config_dict', config)
+
+    def export_config(self, filename=None):
+        """Export the daemon's configuration to a local JSON file"""
+        return write_exported_config(self.client.call('config'), filename)
+
+    def reload_if_changed(self):
+        """Refresh the cached state; return True if the daemon state changed"""
+        return self.refresh()
+
+    def start_scheduler(self, on_change, dispatch=None):
+        """Schedules are enforced by the daemon, so nothing runs here"""
+        return None
+
+    def start_watcher(self, dispatch=None):
+        """The daemon watches and repairs the hosts file itself"""
+        return None
+
+    def resume_enforcement(self):
+        """The daemon runs the enforcement backend"""
+        return None
+
+    def start_focus_timers(self, dispatch=None):
+        """Focus sessions are timed by the daemon"""
+        return None
+
+    def flush_config(self):
+        """The daemon saves its own configuration"""
+
+    def close(self):
+        """Disconnect; the daemon keeps enforcing the blocklist and schedules"""
+        self.client.close()
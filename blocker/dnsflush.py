@@ -0,0 +1,212 @@
+"""
+DNS cache flushing.
+
+After the hosts file changes, the resolver cache may still hold answers
+for newly blocked names. How to flush it depends on the host: ipconfig on
+Windows, dscacheutil plus mDNSResponder on macOS, and on Linux whichever
+cache is running (systemd-resolved, nscd, ...), if any.
+
+The first flush tries the candidate methods for the platform in order and
+remembers the one that worked, so later flushes run a single command. A
+Linux method is only a candidate while its service is running (systemctl
+is-active, or pidof for caches started outside systemd), not merely
+because its command is installed. If none works the host is assumed to
+have no cache to flush until REPROBE_INTERVAL has passed, after which the
+next flush probes again, so a cache started later is picked up. What was
+detected is remembered per process: the GUI, the daemon and each CLI run
+probe on their own. Every command has a timeout, and DnsFlusher runs
+flushes on a worker thread so callers never wait on them.
+"""
+
+import os
+import platform
+import shutil
+import subprocess
+import threading
+import time
+from collections import namedtuple
+
+DEFAULT_TIMEOUT = 5.0
+
+FlushResult = namedtuple('FlushResult', ['method', 'ok', 'duration', 'error'])
+
+# (name, commands, service) candidates per platform, most specific first;
+# service is the daemon that must be running for the method to apply, or
+# None if it always does. The hosts file is only writable as
+# administrator/root, so no sudo is needed here.
+STRATEGIES = {
+    'windows': [
+        ("ipconfig", [["ipconfig", "/flushdns"]], None),
+    ],
+    'darwin': [
+        ("dscacheutil", [["dscacheutil", "-flushcache"], ["killall", "-HUP", "mDNSResponder"]], None),
+    ],
+    'linux': [
+        ("resolvectl", [["resolvectl", "flush-caches"]], "systemd-resolved"),
+        ("systemd-resolve", [["systemd-resolve", "--flush-caches"]], "systemd-resolved"),
+        ("nscd", [["nscd", "--invalidate=hosts"]], "nscd"),
+        ("dnsmasq", [["killall", "-HUP", "dnsmasq"]], "dnsmasq"),
+    ],
+}
+
+# Strategy name used once detection found nothing to flush
+NO_CACHE = "none"
+# Seconds after which a host found to have no cache is probed again
+REPROBE_INTERVAL = 300.0
+
+_detected = None
+_detect_lock = threading.Lock()
+
+
+def service_running(service, timeout=DEFAULT_TIMEOUT):
+    """Return True if the named service is active under systemd or has a running process"""
+    checks = [["systemctl", "is-active", "--quiet", service], ["pidof", service]]
+    for command in checks:
+        if shutil.which(command[0]) is None:
+            continue
+        try:
+            result = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout)
+        except (OSError, subprocess.SubprocessError):
+            continue
+        if result.returncode == 0:
+            return True
+    return False
+
+
+def candidate_strategies(system=None):
+    """Return the (name, commands) strategies for this platform that are installed and running"""
+    system = system or platform.system().lower()
+    return [
+        (name, commands) for name, commands, service in STRATEGIES.get(system, [])
+        if all(shutil.which(command[0]) for command in commands)
+        and (service is None or service_running(service))
+    ]
+
+
+def run_strategy(commands, timeout=DEFAULT_TIMEOUT):
+    """Run the commands of one strategy, raising on failure or timeout"""
+    deadline = time.monotonic() + timeout
+    for command in commands:
+        subprocess.run(
+            command,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            check=True,
+            timeout=max(0.1, deadline - time.monotonic())
+        )
+
+
+def describe_error(error):
+    """Return a short description of a failed flush command"""
+    if isinstance(error, subprocess.TimeoutExpired):
+        return f"{error.cmd[0]} timed out after {error.timeout:.1f}s"
+    if isinstance(error, subprocess.CalledProcessError):
+        detail = (error.stderr or b"").decode(errors='replace').strip().splitlines()
+        return f"{error.cmd[0]} exited with {error.returncode}" + (f": {detail[-1]}" if detail else "")
+    return str(error)
+
+
+def flush_dns(timeout=DEFAULT_TIMEOUT):
+    """Flush the resolver cache with the detected method and return a FlushResult"""
+    global _detected
+
+    started = time.monotonic()
+    if os.environ.get("DISABLE_DNS_FLUSH"):
+        return FlushResult("disabled", True, 0.0, None)
+
+    with _detect_lock:
+        if _detected is not None:
+            name, commands, detected_at = _detected
+            if commands is not None:
+                try:
+                    run_strategy(commands, timeout)
+                except (OSError, subprocess.SubprocessError) as e:
+                    # The cache may have been stopped or replaced; detect again next time
+                    _detected = None
+                    return FlushResult(name, False, time.monotonic() - started, describe_error(e))
+                return FlushResult(name, True, time.monotonic() - started, None)
+            if started - detected_at < REPROBE_INTERVAL:
+                return FlushResult(name, True, 0.0, None)
+
+        errors = []
+        for name, commands in candidate_strategies():
+            remaining = timeout - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            try:
+                run_strategy(commands, remaining)
+            except (OSError, subprocess.SubprocessError) as e:
+                errors.append(describe_error(e))
+                continue
+            _detected = (name, commands, started)
+            return FlushResult(name, True, time.monotonic() - started, None)
+
+        # Nothing here caches DNS (or nothing we can flush): hosts changes
+        # apply as they are, so skip probing for a while
+        _detected = (NO_CACHE, None, time.monotonic())
+        if errors:
+            return FlushResult(NO_CACHE, False, time.monotonic() - started, "; ".join(errors))
+        return FlushResult(NO_CACHE, True, time.monotonic() - started, None)
+
+
+class DnsFlusher:
+    """
+    Runs DNS flushes on a background thread.
+
+    Requests made while a flush is running are coalesced into one more
+    flush afterwards. on_done(FlushResult) is called from the worker thread.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, on_done=None):
+        self.timeout = timeout
+        self.on_done = on_done
+        self.last_result = None
+        self._condition = threading.Condition()
+        self._requested = False
+        self._busy = False
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="dns-flush", daemon=True)
+        self._thread.start()
+
+    def request(self):
+        """Schedule a flush"""
+        with self._condition:
+            self._requested = True
+            self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        """Wait until no flush is pending or running; return False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._requested and not self._busy, timeout
+            )
+
+    def close(self):
+        """Let a pending flush finish (bounded by the timeout) and stop the worker"""
+        self.wait(self.timeout)
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._thread.join(self.timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._requested:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                self._requested = False
+                self._busy = True
+
+            result = flush_dns(self.timeout)
+            self.last_result = result
+            if self.on_done is not None:
+                try:
+                    self.on_done(result)
+                except Exception:
+                    pass
+
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
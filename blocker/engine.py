@@ -0,0 +1,1343 @@
+"""
+Headless blocking engine for Website Blocker.
+
+Owns the blocklist, schedules and hosts file operations. Nothing in this
+module touches tkinter or webbrowser, so it can be driven from the CLI,
+cron jobs or the GUI alike.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+
+from .hosts import (
+    DEFAULT_RENDER,
+    ApplyResult,
+    RenderOptions,
+    SectionIndex,
+    apply_rendered,
+    check_render_options,
+    commit_bytes,
+    commit_hosts,
+    file_stamp,
+    has_section,
+    read_hosts,
+    render_section,
+    strip_section,
+)
+from .focus import FocusSession
+from .groups import MAIN_SCHEDULE, SiteGroup, Timetable
+from .normalize import normalize_batch, normalize_hostname
+from .rendercache import DEFAULT_CACHE_DIR, SectionCache, content_key
+from .stats import NULL_STATS, Stats
+from .store import BlocklistStore
+from .weekly import WEEKDAYS, WeeklyIndex
+from .wildcard import (
+    blocklist_matches,
+    expand_sites,
+    is_wildcard,
+    iter_corpus,
+)
+
+CONFIG_VERSION = "2.0"
+DEFAULT_CONFIG_FILE = "blocker_config.json"
+DEFAULT_BACKUP_PATH = "hosts_backup.txt"
+DEFAULT_CORPUS_FILE = "subdomain_corpus.txt"
+
+# Enforcement backends: rewrite the hosts file, or answer from a local DNS sinkhole
+BACKEND_HOSTS = "hosts"
+BACKEND_DNS = "dns"
+DEFAULT_DNS_LISTEN = "127.0.0.1:53"
+DEFAULT_DNS_UPSTREAM = "1.1.1.1:53"
+
+BulkResult = namedtuple('BulkResult', ['changed', 'unchanged', 'invalid'])
+# One repair of the hosts file after an outside edit; full is True when the
+# whole section had to be written again
+RepairResult = namedtuple('RepairResult', ['time', 'restored', 'removed', 'bytes_written', 'full'])
+
+# Repairs kept in BlockerEngine.repairs
+MAX_REPAIRS = 100
+
+
+class BlockerError(Exception):
+    """Base class for engine errors that are reported to the user"""
+
+
+class InvalidWebsiteError(BlockerError, ValueError):
+    """Raised when a website does not look like a valid domain"""
+
+
+class DuplicateWebsiteError(BlockerError):
+    """Raised when a website is already in the blocked list"""
+
+
+class InvalidScheduleError(BlockerError, ValueError):
+    """Raised when a schedule has a malformed time or no days"""
+
+
+class UnknownGroupError(BlockerError, KeyError):
+    """Raised when a site group does not exist"""
+
+
+class UnknownFocusError(BlockerError, KeyError):
+    """Raised when a focus session does not exist or has ended"""
+
+
+def get_hosts_path():
+    """Get the hosts file path based on the operating system"""
+    custom_path = os.environ.get("CUSTOM_HOSTS_PATH")
+    if custom_path:
+        return custom_path
+    system = platform.system().lower()
+    if system == "windows":
+        return r"C:\Windows\System32\drivers\etc\hosts"
+    else:  # Linux, macOS, Unix-like
+        return "/etc/hosts"
+
+
+def check_admin_privileges():
+    """Check if the program is running with admin/root privileges"""
+    system = platform.system().lower()
+    try:
+        if system == "windows":
+            import ctypes
+            return bool(ctypes.windll.shell32.IsUserAnAdmin())
+        else:
+            return os.geteuid() == 0
+    except Exception:
+        return False
+
+
+def validate_website(website):
+    """Validate website URL format and return (is_valid, cleaned_website)"""
+    hostname, reason = normalize_hostname(website)
+    return reason is None, hostname
+
+
+def normalize_websites(websites):
+    """Normalize many websites in bulk and return (valid_sites, invalid_count)"""
+    valid = []
+    invalid = 0
+    for batch in normalize_batch(websites):
+        valid.extend(batch.accepted)
+        invalid += len(batch.rejected)
+    return valid, invalid
+
+
+def make_schedule(start_time, end_time, days):
+    """Validate and build a schedule entry"""
+    try:
+        datetime.strptime(start_time, "%H:%M")
+        datetime.strptime(end_time, "%H:%M")
+    except (TypeError, ValueError):
+        raise InvalidScheduleError("Please use HH:MM format (e.g., 09:00)") from None
+
+    if not days:
+        raise InvalidScheduleError("Please select at least one day.")
+    if isinstance(days, str) or not isinstance(days, (list, tuple)):
+        raise InvalidScheduleError("Days must be a list of weekdays.")
+
+    unknown = [day for day in days if day not in WEEKDAYS]
+    if unknown:
+        raise InvalidScheduleError(f"Unknown day: {unknown[0]}")
+
+    return {
+        'start_time': start_time,
+        'end_time': end_time,
+        'days': list(days)
+    }
+
+
+def check_schedule(entry):
+    """Validate a stored schedule entry and return it as built by make_schedule"""
+    if not isinstance(entry, dict):
+        raise InvalidScheduleError(f"Not a schedule: {entry!r}")
+    try:
+        return make_schedule(entry['start_time'], entry['end_time'], entry['days'])
+    except KeyError as e:
+        raise InvalidScheduleError(f"Schedule has no {e.args[0]!r}") from None
+
+
+def load_schedules(entries, source="configuration"):
+    """Validate stored schedule entries, reporting and skipping the bad ones"""
+    if not isinstance(entries, list):
+        print(f"Ignoring schedules in {source}: not a list", file=sys.stderr)
+        return []
+    schedules = []
+    for entry in entries:
+        try:
+            schedules.append(check_schedule(entry))
+        except InvalidScheduleError as e:
+            print(f"Skipping schedule in {source}: {e}", file=sys.stderr)
+    return schedules
+
+
+def load_groups(entries):
+    """Build the stored site groups by name, reporting and skipping the bad ones"""
+    if not isinstance(entries, dict):
+        print("Ignoring site groups in configuration: not an object", file=sys.stderr)
+        return {}
+    groups = {}
+    for name, data in entries.items():
+        try:
+            group = SiteGroup.from_dict(name, data)
+        except ValueError as e:
+            print(f"Skipping site group in configuration: {e}", file=sys.stderr)
+            continue
+        group.schedules = load_schedules(group.schedules, f"site group {name!r}")
+        groups[name] = group
+    return groups
+
+
+def load_focus_sessions(entries):
+    """Build the stored focus sessions by id, reporting and skipping the bad ones"""
+    if not isinstance(entries, list):
+        print("Ignoring focus sessions in configuration: not a list", file=sys.stderr)
+        return {}
+    sessions = {}
+    for entry in entries:
+        try:
+            session = FocusSession.from_dict(entry)
+        except ValueError as e:
+            print(f"Skipping focus session in configuration: {e}", file=sys.stderr)
+            continue
+        if session.id in sessions:
+            print(f"Skipping focus session in configuration: duplicate id #{session.id}", file=sys.stderr)
+            continue
+        sessions[session.id] = session
+    return sessions
+
+
+def format_schedule(schedule):
+    """Format a schedule entry for display"""
+    days = ', '.join(d[:3] for d in schedule['days'])
+    return f"{schedule['start_time']}-{schedule['end_time']}: {days}"
+
+
+def write_exported_config(config, filename=None):
+    """Write an exported configuration to a JSON file and return its name"""
+    if filename is None:
+        filename = f"website_blocker_config_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(filename, 'w') as file:
+        json.dump(config, file, indent=4)
+    return filename
+
+
+class BlockerEngine:
+    """GUI-free core that manages the blocklist, schedules and hosts file"""
+
+    # True for the stand-in that forwards to the daemon (see blocker.daemon)
+    remote = False
+
+    def __init__(self, config_file=DEFAULT_CONFIG_FILE, hosts_path=None,
+                 backup_path=DEFAULT_BACKUP_PATH, background_save=False,
+                 background_flush=False, stats=None):
+        self.config_file = config_file
+        self.hosts_path = hosts_path or get_hosts_path()
+        self.backup_path = backup_path
+        self.blocked_sites = BlocklistStore()
+        self.scheduled_blocks = []
+        self.groups = {}
+        # Replaced, never changed in place, so other threads can read it
+        self.active_groups = frozenset()
+        self.focus_sessions = {}
+        self.focus_next_id = 1
+        # Like active_groups, replaced rather than changed in place
+        self.active_focus = frozenset()
+        self.focus_timers = None
+        self._focus_timers = {}
+        self._focus_dispatch = None
+        self.is_blocking = False
+        self.blocking_enabled = True
+        self._blocking_saved = False
+        self.subdomain_corpus = DEFAULT_CORPUS_FILE
+        self.backend = BACKEND_HOSTS
+        self.dns_listen = DEFAULT_DNS_LISTEN
+        self.dns_upstream = DEFAULT_DNS_UPSTREAM
+        self.snapshot_file = None
+        self.render_cache = DEFAULT_CACHE_DIR
+        self._section_cache = None
+        self.render_options = DEFAULT_RENDER
+        self._sinkhole = None
+        self._section_index = None
+        self._config_mtime = None
+        self.scheduler = None
+        self.watcher = None
+        self.repairs = deque(maxlen=MAX_REPAIRS)
+        self.on_repair = None
+        self._schedule_index = None
+        self._timetable = None
+        self._on_schedule_change = None
+        self._main_scheduled = None
+        self._writer = None
+        self._flusher = None
+        self.last_flush = None
+        self.on_dns_flush = None
+        self.progress = None
+        # Instrumentation: BLOCKER_STATS lists files (os.pathsep separated)
+        # to dump the stats to on close, as JSON or as Prometheus text (.prom)
+        self.stats_paths = [path for path in os.environ.get("BLOCKER_STATS", "").split(os.pathsep) if path]
+        if stats is None and self.stats_paths:
+            stats = Stats()
+        self.stats = stats if stats is not None else NULL_STATS
+
+        self.load_config()
+        self.is_blocking = self.detect_blocking()
+        self.active_groups = self.timetable().state_at(datetime.now()) - {MAIN_SCHEDULE}
+        self.active_focus = self.focus_state_at(time.time())
+
+        if background_save:
+            from .persist import ConfigWriter
+
+            self._writer = ConfigWriter()
+        # The flush thread (and subprocess) are only started by the first flush
+        self.background_flush = background_flush
+
+    # ------------------------------------------------------------------
+    # Configuration
+    # ------------------------------------------------------------------
+
+    def config_dict(self, include_sites=True):
+        """Return the serializable configuration"""
+        config = {
+            'blocked_sites': self.blocked_sites.to_list() if include_sites else [],
+            'scheduled_blocks': list(self.scheduled_blocks),
+            'site_groups': {name: group.to_dict() for name, group in self.groups.items()},
+            'focus_sessions': [session.to_dict() for session in self.focus_sessions.values()],
+            'focus_next_id': self.focus_next_id,
+            'blocking': self.is_blocking,
+            'subdomain_corpus': self.subdomain_corpus,
+            'backend': self.backend,
+            'dns_listen': self.dns_listen,
+            'dns_upstream': self.dns_upstream,
+            'blocklist_snapshot': self.snapshot_file,
+            'render_cache': self.render_cache,
+            'sink_address': self.render_options.address,
+            'sink_address_v6': self.render_options.address6,
+            'hosts_aliases': self.render_options.aliases,
+            'version': CONFIG_VERSION,
+            'created_by': 'Umar J'
+        }
+        if not include_sites:
+            del config['blocked_sites']
+        return config
+
+    def load_config(self):
+        """Load configuration from JSON file"""
+        if os.path.exists(self.config_file):
+            try:
+                self._config_mtime = os.path.getmtime(self.config_file)
+                with open(self.config_file, 'r') as file:
+                    config = json.load(file)
+                    self.snapshot_file = config.get('blocklist_snapshot')
+                    self.blocked_sites = self._load_sites(config.get('blocked_sites', []))
+                    self.scheduled_blocks = load_schedules(config.get('scheduled_blocks', []))
+                    self.groups = load_groups(config.get('site_groups', {}))
+                    self.focus_sessions = load_focus_sessions(config.get('focus_sessions', []))
+                    # Ids are never reused, even after a session ended
+                    next_id = config.get('focus_next_id', 1)
+                    if not isinstance(next_id, int) or isinstance(next_id, bool):
+                        next_id = 1
+                    self.focus_next_id = max(next_id, max(self.focus_sessions, default=0) + 1)
+                    self.blocking_enabled = config.get('blocking', True)
+                    self._blocking_saved = config.get('blocking') is True
+                    self._schedule_index = None
+                    self._timetable = None
+                    self.subdomain_corpus = config.get('subdomain_corpus', DEFAULT_CORPUS_FILE)
+                    self.backend = config.get('backend', BACKEND_HOSTS)
+                    self.dns_listen = config.get('dns_listen', DEFAULT_DNS_LISTEN)
+                    self.dns_upstream = config.get('dns_upstream', DEFAULT_DNS_UPSTREAM)
+                    self.render_cache = config.get('render_cache', DEFAULT_CACHE_DIR)
+                    self._section_cache = None
+                    self.render_options = self._load_render_options(config)
+            except Exception as e:
+                print(f"Error loading config: {e}", file=sys.stderr)
+                self.blocked_sites = BlocklistStore()
+                self.scheduled_blocks = []
+
+    def _load_render_options(self, config):
+        """Read the hosts layout from the configuration, falling back to the default"""
+        options = RenderOptions(
+            config.get('sink_address', DEFAULT_RENDER.address),
+            config.get('sink_address_v6', DEFAULT_RENDER.address6),
+            config.get('hosts_aliases', DEFAULT_RENDER.aliases),
+        )
+        if options == DEFAULT_RENDER:
+            return DEFAULT_RENDER
+        try:
+            check_render_options(options)
+        except ValueError as e:
+            print(f"Ignoring hosts layout in config: {e}", file=sys.stderr)
+            return DEFAULT_RENDER
+        return options
+
+    def _load_sites(self, sites):
+        """Build the blocklist store, on top of the snapshot when one is configured"""
+        if self.snapshot_file is None or not os.path.exists(self.snapshot_file):
+            return BlocklistStore(sites)
+
+        from .snapshot import Snapshot, SnapshotStore
+
+        return SnapshotStore(Snapshot(self.snapshot_file), sites)
+
+    def reload_if_changed(self):
+        """Reload the configuration if another process has saved it"""
+        try:
+            mtime = os.path.getmtime(self.config_file)
+        except OSError:
+            return False
+        if mtime == self._config_mtime:
+            return False
+        self.load_config()
+        return True
+
+    def save_config(self):
+        """Save configuration to JSON file, in the background if enabled"""
+        try:
+            if self._writer is not None:
+                # Serialized here, on the thread that owns the engine; the
+                # writer keeps retrying until the files are on disk
+                files = self.config_files()
+                self._writer.mark_dirty(files)
+                self._rebase_snapshot(files)
+            else:
+                self.write_config()
+        except Exception as e:
+            print(f"Error saving config: {e}", file=sys.stderr)
+
+    def write_config(self):
+        """Write the configuration, and the blocklist snapshot if enabled, now"""
+        files = self.config_files()
+        for path, data in files:
+            commit_bytes(path, data)
+        self._rebase_snapshot(files)
+
+    def _rebase_snapshot(self, files):
+        """Put the blocklist on top of the snapshot just serialized, so it is unmodified again"""
+        data = dict(files).get(self.snapshot_file)
+        if data is None:
+            return
+
+        from .snapshot import Snapshot, SnapshotStore
+
+        snapshot = Snapshot(self.snapshot_file, verify=False, data=data)
+        if isinstance(self.blocked_sites, SnapshotStore):
+            self.blocked_sites.rebase(snapshot)
+        else:
+            self.blocked_sites = SnapshotStore(snapshot)
+
+    def config_files(self):
+        """Serialize the configuration into (path, data) pairs, in write order"""
+        from .persist import dump_config
+
+        if self.snapshot_file is None:
+            return [(self.config_file, dump_config(self.config_dict()).encode('utf-8'))]
+
+        from .snapshot import SnapshotStore, encode_snapshot
+
+        # The JSON file is only rewritten after the snapshot it relies on
+        # is safely on disk; an untouched snapshot is not rewritten at all
+        files = []
+        store = self.blocked_sites
+        unchanged = (
+            isinstance(store, SnapshotStore) and not store.modified
+            and store.snapshot.path == self.snapshot_file
+        )
+        if not unchanged:
+            files.append((self.snapshot_file, encode_snapshot(store.to_list())))
+        files.append((self.config_file, dump_config(self.config_dict(include_sites=False)).encode('utf-8')))
+        return files
+
+    def enable_snapshot(self, path=None):
+        """Keep the blocked list in a binary snapshot instead of the JSON file"""
+        from .snapshot import DEFAULT_SNAPSHOT_FILE
+
+        self.snapshot_file = path or DEFAULT_SNAPSHOT_FILE
+        self.save_config()
+        self.flush_config()
+
+    def disable_snapshot(self):
+        """Store the blocked list in the JSON file again"""
+        self.blocked_sites = BlocklistStore(self.blocked_sites.to_list())
+        self.snapshot_file = None
+        self.save_config()
+        self.flush_config()
+
+    def flush_config(self):
+        """Write any configuration change still waiting in the background"""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self):
+        """Flush pending state and stop background threads"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self.scheduler is not None:
+            self.scheduler.stop()
+            self.scheduler = None
+        if self.focus_timers is not None:
+            self.focus_timers.stop()
+            self.focus_timers = None
+            self._focus_timers = {}
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        if self._flusher is not None:
+            self._flusher.close()
+            self._flusher = None
+        self.background_flush = False
+        self.stop_sinkhole()
+        if self.stats.enabled and self.stats_paths:
+            self.write_stats(*self.stats_paths)
+
+    def write_stats(self, *paths):
+        """Dump the collected stats to each path (.prom for Prometheus text, else JSON)"""
+        if not self.stats.enabled:
+            raise BlockerError("Stats collection is not enabled.")
+        for path in paths:
+            self.stats.write(path)
+        return paths
+
+    def export_config(self, filename=None):
+        """Export configuration to a JSON file and return its name"""
+        return write_exported_config(self.config_dict(), filename)
+
+    def import_config(self, filename):
+        """Import configuration from a JSON file"""
+        with open(filename, 'r') as file:
+            config = json.load(file)
+        self.import_config_dict(config)
+
+    def import_config_dict(self, config):
+        """Import an exported configuration that has already been parsed"""
+        # Validate config structure
+        if 'blocked_sites' not in config or 'scheduled_blocks' not in config:
+            raise BlockerError("Invalid configuration file format.")
+
+        # Entries end up in the hosts file, so they must be hostnames and
+        # nothing else; the whole import is refused before anything is saved
+        sites = config['blocked_sites']
+        if not isinstance(sites, list) or not all(isinstance(site, str) for site in sites):
+            raise BlockerError("Invalid configuration file format.")
+        valid, invalid = normalize_websites(sites)
+        if invalid:
+            raise InvalidWebsiteError(f"The configuration has {invalid} invalid websites.")
+
+        entries = config['scheduled_blocks']
+        if not isinstance(entries, list):
+            raise BlockerError("Invalid configuration file format.")
+        schedules = []
+        for position, entry in enumerate(entries, 1):
+            try:
+                schedules.append(check_schedule(entry))
+            except InvalidScheduleError as e:
+                raise InvalidScheduleError(f"Schedule {position} in the configuration is invalid: {e}") from None
+
+        self.blocked_sites = BlocklistStore(valid)
+        self.scheduled_blocks = schedules
+        self.save_config()
+        self.schedules_changed()
+        self.resync_blocking()
+
+    # ------------------------------------------------------------------
+    # Blocklist management
+    # ------------------------------------------------------------------
+
+    def validate_website(self, website):
+        """Validate website URL format"""
+        return validate_website(website)
+
+    def add_website(self, website):
+        """Add a website to the blocked list and return the cleaned domain"""
+        is_valid, cleaned_website = self.validate_website(website.strip())
+        if not is_valid:
+            raise InvalidWebsiteError(f"Invalid website URL: {website}")
+        if not self.blocked_sites.add(cleaned_website):
+            raise DuplicateWebsiteError(f"{cleaned_website} is already in the blocked list.")
+
+        self.save_config()
+        self.apply_delta(added_sites=[cleaned_website])
+        return cleaned_website
+
+    def remove_website(self, website):
+        """Remove a website from the blocked list"""
+        is_valid, cleaned_website = self.validate_website(website.strip())
+        if not self.blocked_sites.discard(cleaned_website):
+            raise BlockerError(f"{cleaned_website} is not in the blocked list.")
+
+        self.save_config()
+        self.apply_delta(removed_sites=[cleaned_website])
+        return cleaned_website
+
+    def add_websites(self, websites):
+        """Validate and add many websites at once, saving the config once"""
+        valid, invalid = normalize_websites(websites)
+
+        added = self.blocked_sites.add_many(valid)
+        if added:
+            added_sites = self.blocked_sites.newest(added)
+            self.save_config()
+            self.apply_delta(added_sites=added_sites)
+        return BulkResult(added, len(valid) - added, invalid)
+
+    def remove_websites(self, websites):
+        """Validate and remove many websites at once, saving the config once"""
+        valid, invalid = normalize_websites(websites)
+
+        present = [site for site in dict.fromkeys(valid) if site in self.blocked_sites]
+        removed = self.blocked_sites.remove_many(present)
+        if removed:
+            self.save_config()
+            self.apply_delta(removed_sites=present)
+        return BulkResult(removed, len(valid) - removed, invalid)
+
+    def import_blocklist(self, path):
+        """Stream a hosts, adblock or plain-domain list into the blocklist"""
+        with open(path, 'r', encoding='utf-8', errors='replace') as file:
+            return self.import_lines(file)
+
+    def import_lines(self, lines):
+        """Import the lines of a hosts, adblock or plain-domain list"""
+        from .importer import import_lines
+
+        report = import_lines(lines, self.blocked_sites)
+        if report.accepted:
+            added_sites = self.blocked_sites.newest(report.accepted)
+            self.save_config()
+            self.apply_delta(added_sites=added_sites)
+        return report
+
+    def clear_websites(self):
+        """Clear all websites from the blocked list"""
+        self.blocked_sites.clear()
+        self.save_config()
+        self.resync_blocking()
+
+    # ------------------------------------------------------------------
+    # Schedules
+    # ------------------------------------------------------------------
+
+    def add_schedule(self, start_time, end_time, days):
+        """Add a scheduled blocking session and return it"""
+        schedule = make_schedule(start_time, end_time, days)
+        self.scheduled_blocks.append(schedule)
+        self.save_config()
+        self.schedules_changed()
+        return schedule
+
+    def remove_schedule(self, index):
+        """Remove the schedule at the given index"""
+        del self.scheduled_blocks[index]
+        self.save_config()
+        self.schedules_changed()
+
+    def schedules_changed(self):
+        """Recompile the schedule index and wake the scheduler"""
+        self._schedule_index = None
+        self._timetable = None
+        if self.scheduler is not None:
+            self.scheduler.wake()
+        else:
+            # Without a scheduler thread, apply group changes right away
+            self.apply_timetable_state(self.timetable().state_at(datetime.now()))
+
+    def start_scheduler(self, on_change, dispatch=None):
+        """
+        Start the event-driven scheduler.
+
+        on_change(should_block) is called whenever the main schedules start
+        or stop, and once with the current state; group transitions are
+        applied by the engine itself. dispatch(func, *args) runs both on the
+        thread that owns the engine (the GUI passes root.after); by default
+        they run directly on the scheduler thread.
+        """
+        from .scheduler import Scheduler
+
+        if dispatch is None:
+            dispatch = lambda func, *args: func(*args)
+
+        if self.scheduler is None:
+            self._on_schedule_change = on_change
+            self._main_scheduled = None
+            # The first evaluation re-applies whichever groups are active now
+            self.active_groups = frozenset()
+            self.scheduler = Scheduler(
+                self.timetable,
+                lambda state: dispatch(self.apply_timetable_state, state)
+            ).start()
+        return self.scheduler
+
+    def schedule_index(self):
+        """Return the compiled WeeklyIndex of the current schedules"""
+        index = self._schedule_index
+        if index is None:
+            index = self._schedule_index = WeeklyIndex(self.scheduled_blocks)
+        return index
+
+    def timetable(self):
+        """Return the combined Timetable of main and group schedules"""
+        if self._timetable is None:
+            self._timetable = Timetable(self.schedule_index(), self.groups.values())
+        return self._timetable
+
+    def should_block_at(self, moment):
+        """Return True if any schedule covers the given datetime"""
+        return self.schedule_index().is_active(moment)
+
+    def apply_timetable_state(self, state):
+        """
+        Act on a scheduler transition.
+
+        Groups entering or leaving the blocked state are applied as a delta
+        of just their hostnames; a change of the main schedules is passed on
+        to the on_change callback given to start_scheduler.
+        """
+        groups = frozenset(state) - {MAIN_SCHEDULE}
+        previous = self.active_groups
+        entering = [self.groups[name] for name in groups - previous if name in self.groups]
+        leaving = [self.groups[name] for name in previous - groups if name in self.groups]
+        self.active_groups = groups
+        self.stats.incr('scheduler_transitions')
+        if entering or leaving:
+            self.stats.incr('group_transitions', len(entering) + len(leaving))
+            try:
+                self.apply_group_transition(entering, leaving)
+            except Exception:
+                # Not applied (the write is atomic): a retry starts over
+                self.active_groups = previous
+                raise
+
+        main = MAIN_SCHEDULE in state
+        if self.scheduler is not None and main != self._main_scheduled:
+            scheduled = self._main_scheduled
+            self._main_scheduled = main
+            if self._on_schedule_change is not None:
+                try:
+                    self._on_schedule_change(main)
+                except Exception:
+                    self._main_scheduled = scheduled
+                    raise
+
+    def apply_group_transition(self, entering, leaving):
+        """Apply the hostnames of groups that entered or left the blocked state"""
+        added = [site for group in entering for site in group.sites]
+        removed = [site for group in leaving for site in group.sites]
+        return self._patch_section(added, removed)
+
+    # ------------------------------------------------------------------
+    # Site groups
+    # ------------------------------------------------------------------
+
+    def get_group(self, name):
+        """Return the named group or raise UnknownGroupError"""
+        try:
+            return self.groups[name]
+        except KeyError:
+            raise UnknownGroupError(f"No site group named {name!r}.")
+
+    def create_group(self, name, always=False):
+        """Create an empty site group"""
+        if name in self.groups:
+            raise BlockerError(f"Site group {name!r} already exists.")
+        group = self.groups[name] = SiteGroup(name, always=always)
+        self.save_config()
+        self.schedules_changed()
+        return group
+
+    def delete_group(self, name):
+        """Delete a site group, unblocking its sites if it was active"""
+        group = self.get_group(name)
+        del self.groups[name]
+        self.save_config()
+        if name in self.active_groups:
+            self.active_groups = self.active_groups - {name}
+            self.apply_group_transition([], [group])
+        self.schedules_changed()
+
+    def add_group_sites(self, name, websites):
+        """Validate and add websites to a group"""
+        group = self.get_group(name)
+        valid, invalid = normalize_websites(websites)
+
+        added = group.sites.add_many(valid)
+        if added:
+            self.save_config()
+            if name in self.active_groups:
+                self._patch_section(group.sites.newest(added), ())
+        return BulkResult(added, len(valid) - added, invalid)
+
+    def remove_group_sites(self, name, websites):
+        """Remove websites from a group"""
+        group = self.get_group(name)
+        cleaned = [validate_website(website.strip())[1] for website in websites]
+        removed = group.sites.remove_many(cleaned)
+        if removed:
+            self.save_config()
+            if name in self.active_groups:
+                self._patch_section((), cleaned)
+        return BulkResult(removed, len(cleaned) - removed, 0)
+
+    def add_group_schedule(self, name, start_time, end_time, days):
+        """Add a weekly schedule to a group"""
+        group = self.get_group(name)
+        schedule = make_schedule(start_time, end_time, days)
+        group.schedules.append(schedule)
+        group.schedules_changed()
+        self.save_config()
+        self.schedules_changed()
+        return schedule
+
+    def remove_group_schedule(self, name, index):
+        """Remove the group schedule at the given index"""
+        group = self.get_group(name)
+        del group.schedules[index]
+        group.schedules_changed()
+        self.save_config()
+        self.schedules_changed()
+
+    def set_group_always(self, name, always):
+        """Block a group around the clock, or only on its schedules"""
+        group = self.get_group(name)
+        group.always = bool(always)
+        self.save_config()
+        self.schedules_changed()
+
+    # ------------------------------------------------------------------
+    # Focus sessions
+    # ------------------------------------------------------------------
+
+    def get_focus(self, session_id):
+        """Return the focus session with the given id or raise UnknownFocusError"""
+        try:
+            return self.focus_sessions[session_id]
+        except KeyError:
+            raise UnknownFocusError(f"No focus session #{session_id}.")
+
+    def start_focus(self, minutes, websites=None, break_minutes=0, cycles=1):
+        """
+        Block websites from now on for the given number of minutes.
+
+        Without websites the main blocked list is blocked. With cycles > 1
+        the work period repeats after a break of break_minutes, during which
+        nothing is blocked. Returns the new FocusSession.
+        """
+        try:
+            work = float(minutes) * 60
+            rest = float(break_minutes) * 60
+            cycles = int(cycles)
+        except (TypeError, ValueError):
+            raise InvalidScheduleError("Focus lengths must be numbers of minutes.") from None
+        if work <= 0 or rest < 0:
+            raise InvalidScheduleError("Focus sessions need a positive length and a break of 0 or more minutes.")
+        if cycles < 1:
+            raise InvalidScheduleError("Focus sessions need at least one cycle.")
+
+        sites = None
+        if websites is not None:
+            sites, invalid = normalize_websites(websites)
+            if not sites:
+                raise InvalidWebsiteError("No valid websites to block.")
+
+        session_id = self.focus_next_id
+        self.focus_next_id += 1
+        session = FocusSession(session_id, time.time(), work, rest, cycles, sites)
+        self.focus_sessions[session_id] = session
+        self.save_config()
+        self.focus_due(session_id)
+        return session
+
+    def cancel_focus(self, session_id):
+        """End a focus session now, unblocking its sites"""
+        session = self.get_focus(session_id)
+        timer = self._focus_timers.pop(session_id, None)
+        if timer is not None:
+            self.focus_timers.cancel(timer)
+        self._set_focus(session, False)
+        del self.focus_sessions[session_id]
+        self.save_config()
+
+    def focus_state_at(self, moment):
+        """Return the ids of the focus sessions in a work period at the given time, as a frozenset"""
+        working = set()
+        for session in self.focus_sessions.values():
+            phase = session.phase_at(moment)
+            if phase is not None and phase.working:
+                working.add(session.id)
+        return frozenset(working)
+
+    def active_sessions(self):
+        """Return the focus sessions currently in a work period"""
+        return [self.focus_sessions[session_id] for session_id in sorted(self.active_focus)
+                if session_id in self.focus_sessions]
+
+    def start_focus_timers(self, dispatch=None):
+        """
+        Start the timer wheel that moves focus sessions between phases.
+
+        dispatch(func, *args) runs each phase change on the thread that owns
+        the engine, as for start_scheduler. Sessions found in the
+        configuration may have changed phase, or ended, while nothing was
+        running, so if there are any the hosts file is enforced in full once.
+        """
+        from .timerwheel import TimerThread
+
+        if dispatch is None:
+            dispatch = lambda func, *args: func(*args)
+
+        if self.focus_timers is None:
+            self._focus_dispatch = dispatch
+            self.focus_timers = TimerThread().start()
+            if self.focus_sessions:
+                dispatch(self._resume_focus)
+        return self.focus_timers
+
+    def _resume_focus(self):
+        now = time.time()
+        finished = [session.id for session in self.focus_sessions.values() if session.phase_at(now) is None]
+        for session_id in finished:
+            del self.focus_sessions[session_id]
+        if finished:
+            self.save_config()
+        self.active_focus = self.focus_state_at(now)
+        for session in self.focus_sessions.values():
+            self._arm_focus(session, now)
+        # Also removes the entries of sessions that ended while nothing ran;
+        # an unchanged hosts file is not written
+        return self.enforce()
+
+    def _arm_focus(self, session, now):
+        """Set the session's timer for its next phase change"""
+        if self.focus_timers is None:
+            return
+        timer = self._focus_timers.pop(session.id, None)
+        if timer is not None:
+            self.focus_timers.cancel(timer)
+        phase = session.phase_at(now)
+        if phase is not None:
+            self._focus_timers[session.id] = self.focus_timers.schedule(
+                phase.ends, self._focus_dispatch, self.focus_due, session.id
+            )
+
+    def focus_due(self, session_id):
+        """Bring a focus session's blocking in line with its phase, and re-arm its timer"""
+        session = self.focus_sessions.get(session_id)
+        if session is None:
+            # Cancelled while its timer was being dispatched
+            return None
+        now = time.time()
+        phase = session.phase_at(now)
+        result = self._set_focus(session, phase is not None and phase.working)
+        if phase is None:
+            del self.focus_sessions[session_id]
+            self._focus_timers.pop(session_id, None)
+            self.save_config()
+        else:
+            self._arm_focus(session, now)
+        return result
+
+    def _set_focus(self, session, working):
+        """Block or unblock the sites of one focus session as a delta"""
+        if working == (session.id in self.active_focus):
+            return None
+        before = self.enforced_stores()
+        if working:
+            self.active_focus = self.active_focus | {session.id}
+        else:
+            self.active_focus = self.active_focus - {session.id}
+        after = self.enforced_stores()
+        self.stats.incr('focus_transitions')
+        if self.backend != BACKEND_HOSTS:
+            return self.enforce()
+
+        # The main blocked list may be enforced already, or still be afterwards;
+        # stores compare by content, so they are told apart by identity
+        before_ids = {id(store) for store in before}
+        after_ids = {id(store) for store in after}
+        entering = [store for store in after if id(store) not in before_ids]
+        leaving = [store for store in before if id(store) not in after_ids]
+        added = [site for store in entering for site in store]
+        removed = [site for store in leaving for site in store]
+        return self._patch_section(added, removed)
+
+    # ------------------------------------------------------------------
+    # Hosts file
+    # ------------------------------------------------------------------
+
+    def main_enforced(self):
+        """Return True if the main blocked list is blocked, manually or by a focus session"""
+        return self.is_blocking or any(session.sites is None for session in self.active_sessions())
+
+    def enforced_stores(self):
+        """Return the site stores currently being blocked"""
+        stores = [self.groups[name].sites for name in sorted(self.active_groups) if name in self.groups]
+        stores.extend(session.sites for session in self.active_sessions() if session.sites is not None)
+        if self.main_enforced():
+            stores.insert(0, self.blocked_sites)
+        return stores
+
+    def is_enforcing(self):
+        """Return True if anything is blocked, manually, by a group or by a focus session"""
+        return self.is_blocking or bool(self.active_groups) or bool(self.active_focus)
+
+    def is_hostname_blocked(self, hostname):
+        """Check a hostname against the enforced blocklists, including wildcards"""
+        for store in self.enforced_stores():
+            if blocklist_matches(store, hostname):
+                return True
+        return False
+
+    def start_sinkhole(self):
+        """Start the in-process DNS sinkhole if it is not running yet"""
+        if self._sinkhole is None:
+            from .sinkhole import SinkholeThread
+
+            self._sinkhole = SinkholeThread(
+                self.is_hostname_blocked,
+                listen=self.dns_listen,
+                upstream=self.dns_upstream
+            ).start()
+        return self._sinkhole
+
+    def stop_sinkhole(self):
+        """Shut down the in-process DNS sinkhole"""
+        if self._sinkhole is not None:
+            self._sinkhole.stop()
+            self._sinkhole = None
+
+    def detect_blocking(self):
+        """Check whether blocking was left on: the saved state, and for hosts also the file"""
+        if not self.blocking_enabled:
+            return False
+        if self.backend == BACKEND_DNS:
+            # Nothing outlives the sinkhole, so the saved state is all there is
+            return self._blocking_saved
+        try:
+            return has_section(read_hosts(self.hosts_path))
+        except OSError:
+            return False
+
+    def blocked_hostnames(self):
+        """Return every hostname to block, expanding wildcard rules"""
+        corpus = iter_corpus(self.subdomain_corpus)
+        sites = (site for store in self.enforced_stores() for site in store)
+        return list(dict.fromkeys(expand_sites(sites, corpus)))
+
+    def start_blocking(self):
+        """Start blocking websites and return an ApplyResult"""
+        self.is_blocking = True
+        self.save_config()
+        return self.enforce()
+
+    def stop_blocking(self):
+        """Stop blocking websites and return an ApplyResult"""
+        self.is_blocking = False
+        self.save_config()
+        return self.enforce()
+
+    def enforce(self):
+        """
+        Make the enforcement backend match what should be blocked now.
+
+        With the hosts backend the managed section is rewritten from scratch
+        (or removed when nothing is blocked) and committed atomically. With
+        the DNS backend queries are answered from the live blocklists, so the
+        sinkhole only has to be running.
+        """
+        if self.backend == BACKEND_DNS:
+            if self.is_enforcing():
+                self.start_sinkhole().active = True
+            elif self._sinkhole is not None:
+                self._sinkhole.active = False
+            return ApplyResult(len(self.blocked_sites) if self.is_blocking else 0, 0, 0)
+
+        stats = self.stats
+        with stats.timer('apply' if self.is_enforcing() else 'unapply'):
+            self.report_progress("Reading hosts file")
+            try:
+                hosts_content = read_hosts(self.hosts_path)
+            except FileNotFoundError:
+                # Deleted: a new file holds just the section (nothing is
+                # written when there is no section either)
+                hosts_content = ""
+            stats.incr('hosts_bytes_read', len(hosts_content))
+
+            if self.is_enforcing():
+                # Replace the managed section with the enforced blocklists
+                hostnames, section, count = self.rendered_section()
+                new_content = apply_rendered(hosts_content, section)
+            else:
+                # Remove the managed section, leaving every other line untouched
+                hostnames = []
+                count = 0
+                new_content = strip_section(hosts_content)
+
+            self.report_progress(f"Writing hosts file ({len(new_content) / 1e6:.1f} MB)")
+            written = commit_hosts(self.hosts_path, new_content, current=hosts_content)
+            stats.incr('hosts_bytes_written', written)
+            self._section_index = (
+                SectionIndex(self.hosts_path, new_content, hostnames, self.render_options)
+                if self.is_enforcing() else None
+            )
+
+        if written:
+            self.report_progress("Flushing DNS cache")
+            self.flush_dns()
+        return ApplyResult(len(self.blocked_sites) if self.is_blocking else 0, count, written)
+
+    def section_cache(self):
+        """Return the SectionCache for rendered sections, or None if caching is disabled"""
+        if self.render_cache is None:
+            return None
+        # A relative directory lives next to the configuration, not in
+        # whatever directory the process was started from
+        directory = os.path.join(os.path.dirname(os.path.abspath(self.config_file)), self.render_cache)
+        if self._section_cache is None or self._section_cache.directory != directory:
+            self._section_cache = SectionCache(directory)
+        return self._section_cache
+
+    def rendered_section(self):
+        """
+        Return (hostnames, section, count) for the enforced blocklists.
+
+        The section comes from the render cache when the enforced lists, the
+        subdomain corpus and the render options are unchanged since it was
+        rendered; hostnames is None then, and count says how many there are.
+        """
+        cache = self.section_cache()
+        if cache is not None:
+            stores = self.enforced_stores()
+            signature = repr((
+                self.main_enforced(),
+                sorted(self.active_groups & self.groups.keys()),
+                [session.id for session in self.active_sessions() if session.sites is not None],
+            ))
+            try:
+                corpus_stamp = file_stamp(self.subdomain_corpus)
+            except OSError:
+                corpus_stamp = None
+            key = content_key(stores, corpus_stamp, tuple(self.render_options))
+            cached = cache.get(signature, key)
+            if cached is not None:
+                self.stats.incr('render_cache_hits')
+                return (None,) + cached
+            self.stats.incr('render_cache_misses')
+
+        self.report_progress("Expanding blocklist")
+        hostnames = self.blocked_hostnames()
+        self.report_progress(f"Rendering {len(hostnames)} hostnames")
+        section = render_section(hostnames, self.render_options)
+        if cache is not None:
+            try:
+                cache.put(signature, key, section, len(hostnames))
+            except OSError as e:
+                print(f"Could not cache the rendered section: {e}", file=sys.stderr)
+        return hostnames, section, len(hostnames)
+
+    def set_render_options(self, **changes):
+        """
+        Change the hosts section layout: address, address6 and aliases.
+
+        address6 of None writes no IPv6 lines; aliases is the number of
+        hostnames per line. An active section is rewritten in the new layout.
+        Returns the RenderOptions now in effect.
+        """
+        try:
+            options = self.render_options._replace(**changes)
+            check_render_options(options)
+        except (TypeError, ValueError) as e:
+            raise BlockerError(str(e)) from None
+        if options != self.render_options:
+            self.render_options = options
+            self.save_config()
+            self.resync_blocking()
+        return options
+
+    def resync_blocking(self):
+        """Re-apply the whole blocklist if blocking is active"""
+        if self.is_enforcing() or self.backend == BACKEND_DNS:
+            return self.enforce()
+        return None
+
+    def resume_enforcement(self):
+        """
+        Pick up enforcement where the saved state left it, in a long-running process.
+
+        The hosts file keeps its section across restarts, but the DNS
+        sinkhole has to be started again. Not done by the constructor, so
+        short-lived commands never bind the DNS port.
+        """
+        if self.backend == BACKEND_DNS and self.is_enforcing():
+            return self.enforce()
+        return None
+
+    def apply_delta(self, added_sites=(), removed_sites=()):
+        """
+        Patch the active hosts section after the main blocklist changed.
+
+        Must be called after the store has been updated. Returns an
+        ApplyResult, or None if the main blocklist is not being enforced.
+        """
+        if not self.main_enforced():
+            return None
+        return self._patch_section(added_sites, removed_sites)
+
+    def _patch_section(self, added_sites=(), removed_sites=()):
+        """
+        Write only the hostnames of the given entries to the hosts section.
+
+        Expanding and rendering cost time proportional to the change rather
+        than to the blocklist; the file itself is committed atomically.
+        Removed hostnames that are still covered by an enforced entry (another
+        group, or a wildcard) are kept. Falls back to a full apply when the
+        hosts file was modified behind our back. With the DNS backend the
+        sinkhole answers from the live lists, so it only has to be running.
+        """
+        if self.backend != BACKEND_HOSTS:
+            return self.enforce()
+        index = self._section_index
+        if not self.is_enforcing() or index is None or not index.is_current():
+            return self.enforce()
+
+        corpus = ()
+        if any(is_wildcard(site) for site in added_sites) or \
+                any(is_wildcard(site) for site in removed_sites):
+            corpus = list(iter_corpus(self.subdomain_corpus))
+
+        added = dict.fromkeys(expand_sites(added_sites, corpus))
+        # A hostname stays blocked if another entry (e.g. a wildcard) still covers it
+        removed = [
+            hostname for hostname in dict.fromkeys(expand_sites(removed_sites, corpus))
+            if hostname not in added and not self.is_hostname_blocked(hostname)
+        ]
+        with self.stats.timer('patch'):
+            written = index.patch(added, removed)
+        self.stats.incr('hosts_bytes_written', written)
+        if index.needs_compaction():
+            return self.enforce()
+
+        if written:
+            self.flush_dns()
+        return ApplyResult(len(self.blocked_sites) if self.is_blocking else 0,
+                           len(index), written)
+
+    def start_watcher(self, dispatch=None):
+        """
+        Watch the hosts file and repair the managed section after outside edits.
+
+        dispatch(func) runs repair_hosts on the thread that owns the engine,
+        as for start_scheduler; by default it runs on the watcher thread.
+        """
+        from .watcher import HostsWatcher
+
+        if dispatch is None:
+            dispatch = lambda func, *args: func(*args)
+
+        if self.watcher is None:
+            self.watcher = HostsWatcher(self.hosts_path, lambda: dispatch(self.repair_hosts)).start()
+        return self.watcher
+
+    def repair_hosts(self):
+        """
+        Put back enforced entries that an outside edit removed from the hosts file.
+
+        Only the missing hostnames are written, and foreign entries inside the
+        section are commented out; a section that was removed or moved is
+        written again in full. Returns a RepairResult, or None when the file
+        is as the engine left it. Each repair is kept in self.repairs.
+        """
+        if self.backend != BACKEND_HOSTS or not self.is_enforcing():
+            return None
+        index = self._section_index
+        if index is not None and index.is_current():
+            # Our own write, or a change outside the file's contents
+            return None
+
+        try:
+            stamp = file_stamp(self.hosts_path)
+        except FileNotFoundError:
+            stamp = None
+        content = read_hosts(self.hosts_path) if stamp is not None else ""
+        index = SectionIndex.from_content(self.hosts_path, content, self.render_options) if content else None
+        if index is not None and index.stamp != stamp:
+            # Written again while being read; the watcher reports that change too
+            return None
+
+        expected = self.blocked_hostnames()
+        if index is None:
+            result = self.enforce()
+            repair = RepairResult(time.time(), len(expected), 0, result.bytes_written, True)
+        else:
+            wanted = set(expected)
+            restored = [hostname for hostname in expected if hostname not in index]
+            removed = [hostname for hostname in index if hostname not in wanted]
+            self._section_index = index
+            if not restored and not removed:
+                # Edited elsewhere in the file; the section is intact
+                return None
+            with self.stats.timer('patch'):
+                written = index.patch(restored, removed)
+            self.stats.incr('hosts_bytes_written', written)
+            if written:
+                self.flush_dns()
+            repair = RepairResult(time.time(), len(restored), len(removed), written, False)
+
+        self.repairs.append(repair)
+        self.stats.incr('hosts_repairs')
+        print(f"Repaired hosts file: {repair.restored} entries restored, "
+              f"{repair.removed} removed{' (full rewrite)' if repair.full else ''}", file=sys.stderr)
+        if self.on_repair is not None:
+            self.on_repair(repair)
+        return repair
+
+    def flush_dns(self):
+        """Flush the DNS cache; returns the FlushResult, or None when queued"""
+        if self._flusher is None and self.background_flush:
+            from .dnsflush import DnsFlusher
+
+            self._flusher = DnsFlusher(on_done=self._flush_done)
+        if self._flusher is not None:
+            self._flusher.request()
+            return None
+
+        from .dnsflush import flush_dns
+
+        self._flush_done(flush_dns())
+        return self.last_flush
+
+    def _flush_done(self, result):
+        self.last_flush = result
+        self.stats.observe('dns_flush', result.duration)
+        if not result.ok:
+            self.stats.incr('dns_flush_failures')
+        if self.on_dns_flush is not None:
+            self.on_dns_flush(result)
+
+    def report_progress(self, message):
+        """Pass a progress message to the progress callback, if any"""
+        if self.progress is not None:
+            self.progress(message)
+
+    def backup_hosts(self):
+        """Backup the hosts file"""
+        self.report_progress("Backing up hosts file")
+        commit_hosts(self.backup_path, read_hosts(self.hosts_path))
+        return self.backup_path
+
+    def restore_hosts(self):
+        """Restore the hosts file from backup"""
+        if not os.path.exists(self.backup_path):
+            raise BlockerError("No backup file found.")
+
+        self.report_progress("Restoring hosts file")
+        written = commit_hosts(self.hosts_path, read_hosts(self.backup_path))
+        self._section_index = None
+
+        self.is_blocking = False
+        if written:
+            self.flush_dns()
+        return ApplyResult(0, 0, written)
@@ -0,0 +1,114 @@
+"""
+One-off focus sessions.
+
+A focus session blocks a set of sites for a fixed time starting now, e.g.
+"these sites for the next 45 minutes". Pomodoro-style sessions repeat:
+cycles work periods separated by breaks, during which the sites are not
+blocked. A session with no sites of its own blocks the main blocked list.
+
+Sessions are stored with wall-clock start times, so the phase at any
+moment is computed rather than counted and survives restarts: a session
+whose time ran out while nothing was running is simply over. The engine
+keeps one timer per session, for its next phase change, on a TimerWheel.
+"""
+
+from collections import namedtuple
+
+from .store import BlocklistStore
+
+# Where a session stands: working is False during a break; ends is the
+# time the phase ends, and cycle counts from 1
+FocusPhase = namedtuple('FocusPhase', ['working', 'ends', 'cycle'])
+
+
+class FocusSession:
+    """Sites blocked for one or more timed work periods"""
+
+    def __init__(self, session_id, started, work, rest=0.0, cycles=1, sites=None):
+        self.id = session_id
+        self.started = started
+        self.work = work
+        self.rest = rest
+        self.cycles = cycles
+        # None blocks the main blocked list
+        self.sites = BlocklistStore(sites) if sites is not None else None
+
+    @property
+    def ends(self):
+        """Time at which the last work period ends"""
+        return self.started + self.cycles * (self.work + self.rest) - self.rest
+
+    def phase_at(self, moment):
+        """Return the FocusPhase at the given time, or None once the session is over"""
+        if moment >= self.ends:
+            return None
+        period = self.work + self.rest
+        cycle = max(0, int((moment - self.started) // period))
+        begins = self.started + cycle * period
+        if moment < begins + self.work:
+            return FocusPhase(True, begins + self.work, cycle + 1)
+        return FocusPhase(False, begins + period, cycle + 1)
+
+    def to_dict(self):
+        """Return the serializable form used in the configuration"""
+        return {
+            'id': self.id,
+            'started': self.started,
+            'work': self.work,
+            'rest': self.rest,
+            'cycles': self.cycles,
+            'sites': self.sites.to_list() if self.sites is not None else None
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create a session from its configuration entry, raising ValueError if it is malformed"""
+        if not isinstance(data, dict):
+            raise ValueError(f"Not a focus session: {data!r}")
+        for key in ('id', 'started', 'work'):
+            if key not in data:
+                raise ValueError(f"Focus session has no {key!r}")
+        session_id = data['id']
+        if not isinstance(session_id, int) or isinstance(session_id, bool):
+            raise ValueError(f"Focus session id must be an integer, not {session_id!r}")
+        started, work = data['started'], data['work']
+        rest, cycles = data.get('rest', 0.0), data.get('cycles', 1)
+        for key, value in (('started', started), ('work', work), ('rest', rest)):
+            if not _is_number(value):
+                raise ValueError(f"Focus session #{session_id} has a non-numeric {key}: {value!r}")
+        if work <= 0 or rest < 0:
+            raise ValueError(f"Focus session #{session_id} needs a positive work period and a break of 0 or more")
+        if not isinstance(cycles, int) or isinstance(cycles, bool) or cycles < 1:
+            raise ValueError(f"Focus session #{session_id} needs at least one cycle, not {cycles!r}")
+        sites = data.get('sites')
+        if sites is not None and not (isinstance(sites, list) and all(isinstance(site, str) for site in sites)):
+            raise ValueError(f"Focus session #{session_id} sites must be a list of names or null")
+        return cls(session_id, started, work, rest, cycles, sites)
+
+
+def _is_number(value):
+    """Return True for an int or float that is not a bool"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def format_duration(seconds):
+    """Format a number of seconds as H:MM:SS or M:SS"""
+    minutes, seconds = divmod(max(0, int(round(seconds))), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def format_session(session, now):
+    """Format a focus session and its current phase for display"""
+    if session.sites is None:
+        target = "blocked list"
+    else:
+        target = f"{len(session.sites)} site{'s' if len(session.sites) != 1 else ''}"
+    phase = session.phase_at(now)
+    if phase is None:
+        return f"#{session.id} {target}: finished"
+    state = "focus" if phase.working else "break"
+    cycles = f" {phase.cycle}/{session.cycles}" if session.cycles > 1 else ""
+    return f"#{session.id} {target}: {state}{cycles}, {format_duration(phase.ends - now)} left"
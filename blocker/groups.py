@@ -0,0 +1,92 @@
+"""
+Named site groups with their own schedules.
+
+A group bundles a set of sites with the weekly schedules during which
+they are blocked, e.g. "social" 09:00-17:00 on weekdays, "news"
+09:00-12:00, and "games" always. Groups are independent of the main
+blocked list and its manual on/off toggle.
+
+Timetable combines the main schedules and every group schedule into one
+object the Scheduler can drive: its boundaries are the union of all
+transition instants, and its state is the set of keys that are active,
+so the engine can work out exactly which groups entered or left the
+blocked state at each transition.
+"""
+
+from .store import BlocklistStore
+from .weekly import WeeklyIndex
+
+# Timetable key for the main scheduled_blocks list
+MAIN_SCHEDULE = None
+
+
+class SiteGroup:
+    """A named set of sites blocked according to its own schedules"""
+
+    def __init__(self, name, sites=(), schedules=(), always=False):
+        self.name = name
+        self.sites = BlocklistStore(sites)
+        self.schedules = list(schedules)
+        self.always = always
+        self._index = None
+
+    def index(self):
+        """Return the compiled WeeklyIndex of this group's schedules"""
+        if self._index is None:
+            self._index = WeeklyIndex(self.schedules)
+        return self._index
+
+    def schedules_changed(self):
+        """Drop the compiled index after the schedules were edited"""
+        self._index = None
+
+    def is_active_at(self, moment):
+        """Return True if the group is blocked at the given datetime"""
+        return self.always or self.index().is_active(moment)
+
+    def to_dict(self):
+        """Return the serializable form used in the configuration"""
+        return {
+            'sites': self.sites.to_list(),
+            'schedules': list(self.schedules),
+            'always': self.always
+        }
+
+    @classmethod
+    def from_dict(cls, name, data):
+        """Create a group from its configuration entry, raising ValueError if it is malformed"""
+        if not isinstance(data, dict):
+            raise ValueError(f"Site group {name!r} is not an object")
+        sites = data.get('sites', [])
+        if not isinstance(sites, list) or not all(isinstance(site, str) for site in sites):
+            raise ValueError(f"Sites of group {name!r} must be a list of names")
+        schedules = data.get('schedules', [])
+        if not isinstance(schedules, list):
+            raise ValueError(f"Schedules of group {name!r} must be a list")
+        always = data.get('always', False)
+        if not isinstance(always, bool):
+            raise ValueError(f"'always' of group {name!r} must be true or false, not {always!r}")
+        return cls(name, sites, schedules, always)
+
+
+class Timetable:
+    """Combined schedule state of the main schedules and all groups"""
+
+    def __init__(self, main_index, groups):
+        self.main_index = main_index
+        self.groups = list(groups)
+
+    def boundaries(self):
+        """Return every minute of the week at which some state changes"""
+        boundaries = set(self.main_index.boundaries())
+        for group in self.groups:
+            if not group.always:
+                boundaries.update(group.index().boundaries())
+        return boundaries
+
+    def state_at(self, moment):
+        """Return the frozenset of active keys (group names, MAIN_SCHEDULE)"""
+        active = {group.name for group in self.groups if group.is_active_at(moment)}
+        if self.main_index.is_active(moment):
+            active.add(MAIN_SCHEDULE)
+        return frozenset(active)
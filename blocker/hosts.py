@@ -0,0 +1,590 @@
+"""
+Hosts file managed section.
+
+All entries written by Website Blocker live between a BEGIN and an END
+marker line. Applying and removing the section is a single pass over the
+hosts file lines, and lines outside the markers are never inspected for
+hostnames, so unrelated entries can not be removed by accident.
+
+Writes go through commit_hosts(), which replaces the file atomically and
+skips the write entirely when nothing changed. While blocking is active,
+SectionIndex patches the committed section so that adding or removing a
+few hostnames skips rendering and re-reading the whole blocklist; the
+patched file is still committed atomically like every other write.
+
+RenderOptions choose the layout: the sink address, an optional IPv6 sink
+address whose lines repeat every hostname so AAAA lookups are blocked too,
+and how many hostnames share a line. Packing several aliases per line
+makes the file several times smaller and quicker for resolvers to parse.
+"""
+
+import errno
+import os
+import re
+import tempfile
+from collections import namedtuple
+from itertools import accumulate, chain, repeat
+from operator import add
+
+SINK_ADDRESS = "127.0.0.1"
+# Longest line written when packing aliases, newline included; only a single
+# hostname longer than that gets a longer line
+MAX_LINE_LENGTH = 256
+# Windows ignores the aliases after the ninth on a hosts line
+MAX_ALIASES = 9
+_TOKEN_RE = re.compile(rb"\S+")
+BEGIN_MARKER = "# BEGIN Website Blocker - Umar J"
+END_MARKER = "# END Website Blocker - Umar J"
+
+# Marker written by version 2.0, followed by unterminated entry lines
+LEGACY_MARKER = "# Website Blocker - Umar J"
+
+# Hosts files are read and written as UTF-8, passing undecodable bytes through
+ENCODING = "utf-8"
+ERRORS = "surrogateescape"
+
+ApplyResult = namedtuple('ApplyResult', ['sites', 'hostnames', 'bytes_written'])
+RenderOptions = namedtuple('RenderOptions', ['address', 'address6', 'aliases'])
+
+# One line per hostname, IPv4 only: the layout of every earlier version
+DEFAULT_RENDER = RenderOptions(SINK_ADDRESS, None, 1)
+
+
+def check_render_options(options):
+    """Raise ValueError unless options describe a layout every resolver reads"""
+    import ipaddress
+
+    if not isinstance(ipaddress.ip_address(options.address), ipaddress.IPv4Address):
+        raise ValueError(f"Not an IPv4 address: {options.address}")
+    if options.address6 is not None and \
+            not isinstance(ipaddress.ip_address(options.address6), ipaddress.IPv6Address):
+        raise ValueError(f"Not an IPv6 address: {options.address6}")
+    aliases = options.aliases
+    if not isinstance(aliases, int) or isinstance(aliases, bool) or not 1 <= aliases <= MAX_ALIASES:
+        raise ValueError(f"Aliases per line must be between 1 and {MAX_ALIASES}")
+
+
+def pack_aliases(hostnames, address, aliases):
+    """Group hostnames into lists of at most aliases that fit on one line after address"""
+    names = []
+    length = len(address) + 1
+    for hostname in hostnames:
+        if names and (len(names) == aliases or length + 1 + len(hostname) > MAX_LINE_LENGTH):
+            yield names
+            names = []
+            length = len(address) + 1
+        names.append(hostname)
+        length += 1 + len(hostname)
+    if names:
+        yield names
+
+
+def render_entries(hostnames, address=SINK_ADDRESS, aliases=1):
+    """Yield the hosts lines for hostnames, with up to aliases hostnames per line"""
+    if aliases == 1:
+        for hostname in hostnames:
+            yield f"{address} {hostname}\n"
+        return
+    for names in pack_aliases(hostnames, address, aliases):
+        yield f"{address} {' '.join(names)}\n"
+
+
+def render_section(hostnames, options=DEFAULT_RENDER):
+    """Render the complete managed section, markers included, from a list of hostnames"""
+    parts = [BEGIN_MARKER + "\n"]
+    parts.extend(render_entries(hostnames, options.address, options.aliases))
+    if options.address6 is not None:
+        parts.extend(render_entries(hostnames, options.address6, options.aliases))
+    parts.append(END_MARKER + "\n")
+    return "".join(parts)
+
+
+def split_section(content):
+    """
+    Split hosts content into (outside_lines, section_lines).
+
+    Runs in one pass. A BEGIN marker without an END marker extends to the end
+    of the file, so a section cut short by a crash is still recognised. Blocks
+    written by the legacy format are dropped from both results.
+    """
+    outside = []
+    section = []
+    state = None
+    for line in content.splitlines(keepends=True):
+        marker = line.strip()
+        if state == "section":
+            if marker == END_MARKER:
+                state = None
+            else:
+                section.append(line)
+            continue
+        if state == "legacy":
+            if marker.startswith(SINK_ADDRESS + " "):
+                continue
+            state = None
+            if not marker:
+                continue
+        if marker == BEGIN_MARKER:
+            state = "section"
+        elif marker == LEGACY_MARKER:
+            state = "legacy"
+        else:
+            outside.append(line)
+    return outside, section
+
+
+def has_section(content):
+    """Return True if the content carries a managed or legacy section"""
+    # Look for the markers rather than split what may be megabytes of lines
+    for marker in (BEGIN_MARKER, LEGACY_MARKER):
+        position = content.find(marker)
+        while position != -1:
+            line_start = content.rfind("\n", 0, position) + 1
+            line_end = content.find("\n", position)
+            if content[line_start:line_end if line_end != -1 else len(content)].strip() == marker:
+                return True
+            position = content.find(marker, position + len(marker))
+    return False
+
+
+def strip_section(content):
+    """Return the hosts content with the managed section removed"""
+    outside, _ = split_section(content)
+    return "".join(outside)
+
+
+def apply_section(content, hostnames, options=DEFAULT_RENDER):
+    """Return the hosts content with the managed section replaced by hostnames"""
+    return apply_rendered(content, render_section(hostnames, options))
+
+
+def apply_rendered(content, section):
+    """Return the hosts content with the managed section replaced by an already rendered one"""
+    base = strip_section(content)
+    if base and not base.endswith("\n"):
+        base += "\n"
+    return base + section
+
+
+def read_hosts(path):
+    """Read the hosts file, preserving its line endings"""
+    with open(path, 'r', encoding=ENCODING, errors=ERRORS, newline='') as file:
+        return file.read()
+
+
+def file_stamp(path):
+    """Return (size, mtime_ns, inode), which changes whenever the file is written"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+def commit_hosts(path, content, current=None):
+    """
+    Atomically replace the file at path with content.
+
+    When the content is identical to what is on disk (or to current, if the
+    caller already read it) nothing is written. Returns the number of bytes
+    written.
+    """
+    data = content.encode(ENCODING, ERRORS)
+    if current is not None:
+        current = current.encode(ENCODING, ERRORS)
+    return commit_bytes(path, data, current)
+
+
+def commit_bytes(path, data, current=None):
+    """
+    Atomically replace the file at path with data.
+
+    The new content is written to a temporary file in the same directory,
+    fsynced and renamed over the original, so readers only ever see the old
+    or the new file. Skipped when data equals current, or the file on disk
+    if current is None. Returns the number of bytes written.
+    """
+    if current is None:
+        try:
+            with open(path, 'rb') as file:
+                current = file.read()
+        except FileNotFoundError:
+            current = None
+    if data == current:
+        return 0
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".hosts.", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        _copy_ownership(path, temp_path)
+        try:
+            os.replace(temp_path, path)
+        except OSError as e:
+            # Bind-mounted hosts files (containers) can not be renamed over
+            if e.errno not in (errno.EBUSY, errno.EXDEV):
+                raise
+            _write_in_place(path, data)
+            os.unlink(temp_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+    return len(data)
+
+
+def _write_in_place(path, data):
+    """Overwrite path in place, used only when a rename is not possible"""
+    with open(path, 'r+b') as file:
+        file.write(data)
+        file.truncate()
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def _copy_ownership(source, target):
+    """Give target the permission bits and owner of source, if it exists"""
+    try:
+        stat = os.stat(source)
+    except FileNotFoundError:
+        os.chmod(target, 0o644)
+        return
+    os.chmod(target, stat.st_mode & 0o7777)
+    if hasattr(os, "chown"):
+        try:
+            os.chown(target, stat.st_uid, stat.st_gid)
+        except PermissionError:
+            pass
+
+
+def _fsync_directory(directory):
+    """Persist the rename on filesystems that need the directory synced"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SectionIndex:
+    """
+    Byte offsets of every hostname in the managed section as last committed.
+
+    The section is always the last thing in the file, so hostnames can be
+    added by overwriting the END marker with new lines plus a new marker.
+    A removed hostname is overwritten with spaces, or its line turned into a
+    comment by writing '#' over its first byte once no hostname is left on
+    it. The edits are made to a copy of the file in memory, which is then
+    committed through commit_bytes(), so a crash or a concurrent reader
+    never sees a half-patched file; what patching saves is rendering and
+    indexing the whole blocklist, not writing the file. The index is
+    only trusted while the file's size, mtime and inode match what was
+    recorded; any outside edit makes is_current() return False and the
+    caller falls back to a full apply, which also compacts the section.
+    """
+
+    def __init__(self, path, content, hostnames=None, options=DEFAULT_RENDER):
+        """
+        Index the section of content, which has just been committed to path.
+
+        hostnames are the section's entries in rendered order; without them,
+        or when the layout is not one line per hostname, the section is
+        parsed back from the file. Either way the offsets are only worked out
+        when first needed, as most sections are never patched.
+        """
+        self.path = path
+        self.options = options
+        self.tombstones = 0
+        self.end_offset = len(content.encode(ENCODING, ERRORS)) - len(END_MARKER) - 1
+        self._hostnames = hostnames if self._one_per_line() else None
+        self._offsets = None
+        self._offsets6 = None
+        self.stamp = self._stamp()
+
+    def _one_per_line(self):
+        return self.options.aliases == 1 and self.options.address6 is None
+
+    @property
+    def offsets(self):
+        """Map of each hostname to the byte offset of its IPv4 entry"""
+        if self._offsets is None:
+            if self._hostnames is not None:
+                hostnames = self._hostnames
+                size = len("".join(hostnames).encode(ENCODING, ERRORS))
+                start = self.end_offset - size - (len(self.options.address) + 2) * len(hostnames)
+                self._offsets = self._index_entries(hostnames, start, self.options.address)
+                self._hostnames = None
+            else:
+                # Unless the file changed since, it holds exactly what was rendered
+                validate = not self.is_current()
+                with open(self.path, 'rb') as file:
+                    data = file.read()
+                if self._scan(data, validate) is None:
+                    self._offsets = {}
+                    self._offsets6 = {} if self.options.address6 is not None else None
+        return self._offsets
+
+    def _addresses(self):
+        """Return the address of each block of lines, IPv4 first"""
+        if self.options.address6 is None:
+            return [self.options.address]
+        return [self.options.address, self.options.address6]
+
+    def _blocks(self):
+        """Return (address, offsets) for each block of lines"""
+        return list(zip(self._addresses(), [self.offsets, self._offsets6]))
+
+    def _index_entries(self, hostnames, start, address, counts=None):
+        """
+        Map hostnames to their offsets in untouched entry lines beginning at start.
+
+        counts holds the number of hostnames on each line, one if not given.
+        """
+        if "".join(hostnames).isascii():
+            lengths = map(len, hostnames)
+        else:
+            lengths = (len(hostname.encode(ENCODING, ERRORS)) for hostname in hostnames)
+        shift = len(address) + 1
+        if counts is None:
+            line_shifts = range(shift, shift * (len(hostnames) + 1), shift)
+        else:
+            line_shifts = chain.from_iterable(repeat(shift * line, count)
+                                              for line, count in enumerate(counts, 1))
+        # A hostname follows every earlier hostname and its separator, plus
+        # the address of its own line and of every line before
+        positions = map(add, accumulate(map(add, lengths, repeat(1)), initial=start), line_shifts)
+        return dict(zip(hostnames, positions))
+
+    @classmethod
+    def from_content(cls, path, content, options=DEFAULT_RENDER):
+        """
+        Index a section as found on disk rather than as just rendered.
+
+        Comment and blank lines inside the section count as tombstones.
+        Returns None when the section is missing, is not the last thing in
+        the file, or holds lines patching could not account for (foreign
+        entries, duplicates); the caller then applies the section afresh.
+        """
+        index = cls.__new__(cls)
+        index.path = path
+        index.options = options
+        index.tombstones = 0
+        index._hostnames = None
+        index._offsets = index._offsets6 = None
+
+        end_offset = index._scan(content.encode(ENCODING, ERRORS))
+        if end_offset is None:
+            return None
+        index.end_offset = end_offset
+        index.stamp = index._stamp()
+        return index
+
+    def _scan(self, data, validate=True):
+        """Index the section in data; returns the END marker offset or None"""
+        end_offset = self._scan_rendered(data, validate)
+        if end_offset is None:
+            end_offset = self._scan_lines(data)
+        return end_offset
+
+    def _scan_rendered(self, data, validate=True):
+        """
+        Index a section still laid out exactly as render_section writes it.
+
+        The common case, checked with one regular expression (skipped when
+        not validating a section known to be freshly rendered) and indexed
+        without a Python-level loop over bytes. Returns the END marker offset,
+        or None to fall back to _scan_lines.
+        """
+        begin = (BEGIN_MARKER + "\n").encode(ENCODING)
+        end = (END_MARKER + "\n").encode(ENCODING)
+        start = data.find(begin)
+        if start == -1 or (start and data[start - 1:start] != b"\n") or not data.endswith(end):
+            return None
+        start += len(begin)
+        end_offset = len(data) - len(end)
+        section = data[start:end_offset]
+        addresses = self._addresses()
+        prefixes = [address.encode(ENCODING) + b" " for address in addresses]
+        if self._one_per_line():
+            # Entry lines, and the tombstones patch() leaves behind
+            pattern = rb"(?:" + re.escape(prefixes[0]) + rb"[^\s#]+\n|#[^\n]*\n)*"
+        else:
+            # A block of lines for each address in turn
+            pattern = b"".join(rb"(?:" + re.escape(prefix) + rb"[^\s#]+(?: [^\s#]+)*\n)*"
+                               for prefix in prefixes)
+        if start > end_offset or (validate and re.fullmatch(pattern, section) is None):
+            return None
+
+        if b"#" not in section:
+            maps = []
+            for address, prefix, following in zip(addresses, prefixes, prefixes[1:] + [None]):
+                # The block ends where the next address's lines begin
+                if following is None:
+                    block_end = len(section)
+                elif section.startswith(following):
+                    block_end = 0
+                else:
+                    block_end = section.find(b"\n" + following) + 1 or len(section)
+                # Without tombstones the hostnames are all that is left once
+                # the prefixes are removed
+                text = "\n" + section[:block_end].decode(ENCODING, ERRORS)
+                text = text.replace("\n" + prefix.decode(ENCODING), "\n")[1:]
+                lines = text.split("\n")[:-1]
+                if " " not in text:
+                    hostnames, counts = lines, None
+                else:
+                    hostnames = " ".join(lines).split(" ") if lines else []
+                    counts = [line.count(" ") + 1 for line in lines]
+                offsets = self._index_entries(hostnames, start, address, counts)
+                if len(offsets) != len(hostnames):
+                    return None
+                maps.append(offsets)
+                start += block_end
+                section = section[block_end:]
+            self._offsets = maps[0]
+            self._offsets6 = maps[1] if len(maps) > 1 else None
+            self.tombstones = 0
+            return end_offset
+
+        # Hostnames are punycode, so the section is normally ASCII and can be
+        # decoded in one go, with character offsets equal to byte offsets
+        if section.isascii():
+            lines = section.decode('ascii').splitlines(keepends=True)
+            positions = accumulate(map(len, lines), initial=start)
+        else:
+            raw_lines = section.splitlines(keepends=True)
+            lines = [line.decode(ENCODING, ERRORS) for line in raw_lines]
+            positions = accumulate(map(len, raw_lines), initial=start)
+        skip = len(prefixes[0])
+        entries = [(line[skip:-1], position + skip) for line, position in zip(lines, positions)
+                   if not line.startswith("#")]
+        self._offsets = dict(entries)
+        count = len(entries)
+        self.tombstones = len(lines) - count
+        if len(self._offsets) != count:
+            return None
+        return end_offset
+
+    def _scan_lines(self, data):
+        """Index an edited or multi-alias section line by line; returns the END offset or None"""
+        offsets = self._offsets = {}
+        offsets6 = self._offsets6 = {} if self.options.address6 is not None else None
+        blocks = {self.options.address.encode(ENCODING): offsets}
+        if offsets6 is not None:
+            blocks[self.options.address6.encode(ENCODING)] = offsets6
+        self.tombstones = 0
+        begin = BEGIN_MARKER.encode(ENCODING)
+        end = END_MARKER.encode(ENCODING)
+        end_offset = None
+        in_section = False
+        position = 0
+        for line in data.splitlines(keepends=True):
+            stripped = line.strip()
+            if end_offset is not None:
+                if stripped:
+                    return None
+            elif not in_section:
+                in_section = stripped == begin
+            elif stripped == end:
+                end_offset = position
+            elif not stripped or stripped.startswith(b"#"):
+                self.tombstones += 1
+            else:
+                tokens = [(match.group(), position + match.start()) for match in _TOKEN_RE.finditer(line)]
+                target = blocks.get(tokens[0][0])
+                if target is None:
+                    return None
+                if len(tokens) == 1:
+                    # Every hostname on the line was removed by hand
+                    self.tombstones += 1
+                for token, offset in tokens[1:]:
+                    hostname = token.decode(ENCODING, ERRORS)
+                    if hostname in target or hostname.startswith("#"):
+                        return None
+                    target[hostname] = offset
+            position += len(line)
+        return end_offset
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, hostname):
+        """True if hostname has every entry the layout calls for"""
+        return all(hostname in offsets for _, offsets in self._blocks())
+
+    def __iter__(self):
+        """Yield each hostname with at least one entry in the section"""
+        seen = self.offsets
+        yield from seen
+        for _, offsets in self._blocks()[1:]:
+            yield from (hostname for hostname in offsets if hostname not in seen)
+
+    def _stamp(self):
+        return file_stamp(self.path)
+
+    def is_current(self):
+        """Return True if the file is still exactly as this index left it"""
+        try:
+            return self._stamp() == self.stamp
+        except OSError:
+            return False
+
+    def needs_compaction(self):
+        """Return True once removed entries outnumber live ones"""
+        return self.tombstones > max(1024, len(self.offsets))
+
+    def _remove(self, data, hostname, position):
+        """Remove the entry at position from its line in the bytearray data"""
+        length = len(hostname.encode(ENCODING, ERRORS))
+        line_start = data.rfind(b"\n", 0, position) + 1
+        line_end = data.find(b"\n", position)
+        self.tombstones += 1
+        # The address and this hostname, or other hostnames besides?
+        if len(data[line_start:position].split()) > 1 or data[position + length:line_end].strip():
+            data[position:position + length] = b" " * length
+        else:
+            data[line_start:line_start + 1] = b"#"
+
+    def patch(self, added=(), removed=()):
+        """Apply a hostname delta, commit the file atomically and return the bytes written"""
+        blocks = self._blocks()
+        removed = [hostname for hostname in removed
+                   if any(hostname in offsets for _, offsets in blocks)]
+        added = [hostname for hostname in added if hostname not in self]
+        if not added and not removed:
+            return 0
+
+        with open(self.path, 'rb') as file:
+            current = file.read()
+        data = bytearray(current)
+        for _, offsets in blocks:
+            for hostname in removed:
+                position = offsets.pop(hostname, None)
+                if position is not None:
+                    self._remove(data, hostname, position)
+
+        if added:
+            position = self.end_offset
+            lines = []
+            for address, offsets in blocks:
+                missing = [hostname for hostname in added if hostname not in offsets]
+                for names in pack_aliases(missing, address, self.options.aliases):
+                    token = position + len(address) + 1
+                    for hostname in names:
+                        offsets[hostname] = token
+                        token += len(hostname.encode(ENCODING, ERRORS)) + 1
+                    line = f"{address} {' '.join(names)}\n".encode(ENCODING, ERRORS)
+                    position += len(line)
+                    lines.append(line)
+            lines.append((END_MARKER + "\n").encode(ENCODING, ERRORS))
+            data[self.end_offset:] = b"".join(lines)
+            self.end_offset = position
+
+        written = commit_bytes(self.path, bytes(data), current)
+        self.stamp = self._stamp()
+        return written
@@ -0,0 +1,454 @@
+"""
+Domain normalization.
+
+Turns whatever a user or a blocklist provides into the canonical hostname
+the hosts file needs: lowercase ASCII, with internationalized names in
+punycode. Schemes, credentials, paths, query strings, ports, a trailing
+dot and a leading "www." are stripped, so
+
+    https://User@WWW.Bücher.Example:8080/path?q=1   ->  xn--bcher-kva.example
+
+Internationalized names follow UTS #46 nontransitional processing, as
+browsers do, so "faß.de" is xn--fa-hia.de rather than fass.de. That needs
+the optional idna package; without it the standard library's IDNA 2003
+codec is used, and names it would map to a different domain (ß, final
+sigma, joiners) are rejected instead of blocking the wrong site.
+
+normalize_hostname() handles one input and normalize_many() streams
+results for whole blocklist lines (hosts, adblock or plain domain) in
+input order. normalize_batch() is the fast path for large inputs: each
+chunk is joined into one string, lowercased, and the host of every line
+in a recognized form is cut out by a single regular expression pass. Runs
+of lines that are then canonical are accepted by one more scan. The line
+forms are matched exactly as parse_line() and normalize_hostname() read
+them, so the batch path never accepts anything the per-item path would
+not. Everything left over goes through the per-item pipeline, where IDN
+labels are converted through a cache. Rejected inputs always come with a
+short reason.
+"""
+
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+from .wildcard import WILDCARD_PREFIX
+
+MAX_HOSTNAME_LENGTH = 253
+MAX_LABEL_LENGTH = 63
+
+# Rejection reasons
+EMPTY = "empty"
+UNRECOGNIZED_LINE = "unrecognized line"
+IP_ADDRESS = "IP address"
+INVALID_PORT = "invalid port"
+INVALID_IDN = "invalid internationalized name"
+IDN_UNSUPPORTED = "internationalized name needs the idna package"
+TOO_LONG = "name longer than 253 characters"
+NO_TLD = "missing top-level domain"
+EMPTY_LABEL = "empty label"
+LABEL_TOO_LONG = "label longer than 63 characters"
+INVALID_CHARACTER = "invalid character"
+HYPHEN = "label starts or ends with a hyphen"
+INVALID_TLD = "invalid top-level domain"
+
+# Hostnames that appear in most hosts-format lists but must never be blocked
+RESERVED_NAMES = frozenset([
+    'localhost', 'localhost.localdomain', 'local', 'broadcasthost',
+    'ip6-localhost', 'ip6-loopback', 'ip6-localnet', 'ip6-mcastprefix',
+    'ip6-allnodes', 'ip6-allrouters', 'ip6-allhosts', '0.0.0.0',
+])
+
+Normalized = namedtuple('Normalized', ['raw', 'hostname', 'reason'])
+BatchResult = namedtuple('BatchResult', ['accepted', 'rejected'])
+
+# Inputs per chunk in normalize_batch()
+CHUNK_SIZE = 10000
+# Converted IDN labels to remember
+IDN_CACHE_SIZE = 65536
+
+_LABEL = r'[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?'
+_TLD = r'(?:[a-z]{2,63}|xn--[a-z0-9-]{1,59})'
+_CANONICAL_RE = re.compile(rf'(?:{_LABEL}\.)+{_TLD}')
+_SCHEME_RE = re.compile(r'[a-z][a-z0-9+.-]*://', re.IGNORECASE)
+_END_OF_HOST_RE = re.compile(r'[/?#\\]')
+_INVALID_CHARACTER_RE = re.compile(r'[^a-z0-9-]')
+
+# Any number of canonical lines, each followed by a newline
+_CANONICAL_LINES_RE = re.compile(rf'(?:(?!www\.)(?:{_LABEL}\.)+{_TLD}\n)*')
+
+
+def _url_host(name, tail):
+    """Pattern for one URL-ish token whose host is captured as name, as normalize_hostname() reads it"""
+    return (
+        r'(?:[a-z][a-z0-9+.-]*://)?'  # leading scheme
+        r'(?:[^/?#\\\s]*@)?'          # credentials, up to the last @ of the host part
+        r'(?:www\.)?'
+        rf'(?P<{name}>[^/?#\\@:\s^]*)'
+        r'(?::\d+)?'
+        + tail
+    )
+
+
+# Every line in a form parse_line() takes apart: a hosts entry with a
+# single name, an adblock block rule, or one token, each with an optional
+# comment. Bare names are captured whole first, as the cheapest case, and
+# any other line is captured whole as "other" and falls through to the
+# per-item path.
+_DECORATED_LINE_RE = re.compile(
+    r'^(?:'
+    r'(?P<bare>[a-z0-9.-]*)'
+    r'|(?:0\.0\.0\.0|127\.0\.0\.1)[ \t]+' + _url_host('hosts', r'(?:[/?\\][^\s#]*)?[ \t]*(?:#[^\n]*)?')
+    + r'|\|\|' + _url_host('adblock', r'(?:[/?#\\][^\n]*)?\^')
+    + r'|(?![#!\[]|\|\||@@)' + _url_host('plain', r'(?:[/?\\][^\s#]*)?[ \t]*(?:#[^\n]*)?')
+    + r'|(?P<other>[^\n]*)'
+    r')$',
+    re.MULTILINE
+)
+_DECORATION_MARKERS = ("://", "@", "www.", "/", "?", "#", "\\", ":", "^", " ", "\t")
+
+# Characters IDNA 2003 maps away but UTS #46 nontransitional keeps, so the
+# standard library codec would turn the name into a different domain
+_DEVIATIONS = frozenset('\u00df\u03c2\u200c\u200d')
+
+# RFC 3492 parameters for punycode
+_BASE, _TMIN, _TMAX, _SKEW, _DAMP = 36, 1, 26, 38, 700
+_DIGITS = 'abcdefghijklmnopqrstuvwxyz0123456789'
+
+_idna = None
+# Characters classified so far; of those, the ones UTS #46 maps to
+# themselves, and the ones valid anywhere in a left-to-right label
+_SEEN_CHARACTERS = set()
+_UNCHANGED_CHARACTERS = set()
+_SIMPLE_CHARACTERS = set()
+
+
+class IdnaUnavailableError(UnicodeError):
+    """Raised for a name only UTS #46 converts correctly when idna is not installed"""
+
+
+def _rejection_reason(hostname):
+    """Explain why a lowercase ASCII hostname is not valid"""
+    if hostname.replace('.', '').isdigit():
+        return IP_ADDRESS
+    labels = hostname.split('.')
+    if len(labels) < 2:
+        return NO_TLD
+    for label in labels:
+        if not label:
+            return EMPTY_LABEL
+        if len(label) > MAX_LABEL_LENGTH:
+            return LABEL_TOO_LONG
+        if _INVALID_CHARACTER_RE.search(label):
+            return INVALID_CHARACTER
+        if label[0] == '-' or label[-1] == '-':
+            return HYPHEN
+    return INVALID_TLD
+
+
+def _load_idna():
+    """Return the idna module, or False when it is not installed"""
+    global _idna
+    if _idna is None:
+        try:
+            import idna
+        except ImportError:
+            idna = False
+        _idna = idna
+    return _idna
+
+
+def _classify_characters(characters):
+    """Sort characters not seen before into the IDN character sets"""
+    idna = _load_idna()
+    for character in characters - _SEEN_CHARACTERS:
+        try:
+            unchanged = idna.uts46_remap(character, std3_rules=False, transitional=False) == character
+        except idna.IDNAError:
+            unchanged = False
+        if unchanged:
+            _UNCHANGED_CHARACTERS.add(character)
+            if (idna.intranges_contain(ord(character), idna.idnadata.codepoint_classes['PVALID'])
+                    and unicodedata.bidirectional(character) not in ('R', 'AL', 'AN')):
+                _SIMPLE_CHARACTERS.add(character)
+        _SEEN_CHARACTERS.add(character)
+
+
+def _punycode(label):
+    """Encode a label as RFC 3492 punycode, without the xn-- prefix"""
+    codepoints = [ord(character) for character in label]
+    output = [character for character in label if character < '\x80']
+    handled = basic = len(output)
+    if basic:
+        output.append('-')
+    code, delta, bias = 0x80, 0, 72
+    for next_code in sorted({codepoint for codepoint in codepoints if codepoint >= 0x80}):
+        delta += (next_code - code) * (handled + 1)
+        code = next_code
+        for codepoint in codepoints:
+            if codepoint < code:
+                delta += 1
+            elif codepoint == code:
+                q = delta
+                k = _BASE
+                while True:
+                    t = _TMIN if k <= bias else _TMAX if k >= bias + _TMAX else k - bias
+                    if q < t:
+                        break
+                    output.append(_DIGITS[t + (q - t) % (_BASE - t)])
+                    q = (q - t) // (_BASE - t)
+                    k += _BASE
+                output.append(_DIGITS[q])
+                # Bias adaptation
+                delta = delta // _DAMP if handled == basic else delta // 2
+                delta += delta // (handled + 1)
+                k = 0
+                while delta > ((_BASE - _TMIN) * _TMAX) // 2:
+                    delta //= _BASE - _TMIN
+                    k += _BASE
+                bias = k + (_BASE - _TMIN + 1) * delta // (delta + _SKEW)
+                delta = 0
+                handled += 1
+        delta += 1
+        code += 1
+    return ''.join(output)
+
+
+@lru_cache(maxsize=IDN_CACHE_SIZE)
+def _alabel(label):
+    """Return the punycode form of one mapped IDN label"""
+    idna = _load_idna()
+    characters = set(label)
+    if not _SEEN_CHARACTERS.issuperset(characters):
+        _classify_characters(characters)
+    # Labels of valid left-to-right characters need none of the contextual
+    # or bidi rules, so only the positional checks of check_label() apply
+    simple = (
+        label[0] != '-' and label[-1] != '-' and label[2:4] != '--'
+        and not unicodedata.category(label[0]).startswith('M')
+        and _SIMPLE_CHARACTERS.issuperset(characters)
+    )
+    if not simple:
+        return idna.alabel(label).decode('ascii')
+    encoded = 'xn--' + _punycode(label)
+    if len(encoded) > MAX_LABEL_LENGTH:
+        raise idna.IDNAError("Label too long")
+    return encoded
+
+
+def _unchanged_by_mapping(label):
+    """Return True if UTS #46 mapping leaves a label as it is"""
+    if label.isascii():
+        return True
+    characters = set(label)
+    if not _SEEN_CHARACTERS.issuperset(characters):
+        _classify_characters(characters)
+    return _UNCHANGED_CHARACTERS.issuperset(characters) and unicodedata.normalize('NFC', label) == label
+
+
+def idn_to_ascii(hostname):
+    """Convert an internationalized hostname to ASCII, raising UnicodeError if invalid"""
+    idna = _load_idna()
+    if not idna:
+        if not _DEVIATIONS.isdisjoint(hostname):
+            raise IdnaUnavailableError(hostname)
+        return hostname.encode('idna').decode('ascii')
+    labels = hostname.split('.')
+    if not all(map(_unchanged_by_mapping, labels)):
+        labels = idna.uts46_remap(hostname, std3_rules=False, transitional=False).split('.')
+    return '.'.join(label if label.isascii() else _alabel(label) for label in labels)
+
+
+def normalize_hostname(raw):
+    """
+    Normalize one website, URL or domain.
+
+    Returns (hostname, reason): reason is None when the hostname is valid,
+    otherwise hostname is the partly cleaned input, for error messages.
+    """
+    if _CANONICAL_RE.fullmatch(raw) and not raw.startswith('www.') and len(raw) <= MAX_HOSTNAME_LENGTH:
+        return raw, None
+
+    text = raw.strip()
+    if not text:
+        return text, EMPTY
+
+    if text.startswith(WILDCARD_PREFIX):
+        hostname, reason = normalize_hostname(text[len(WILDCARD_PREFIX):])
+        return WILDCARD_PREFIX + hostname, reason
+
+    # Keep only the host part of a URL
+    scheme = _SCHEME_RE.match(text)
+    if scheme is not None:
+        text = text[scheme.end():]
+    end = _END_OF_HOST_RE.search(text)
+    if end is not None:
+        text = text[:end.start()]
+    text = text[text.rfind('@') + 1:]
+
+    if text.startswith('[') or text.count(':') > 1:
+        return text, IP_ADDRESS
+    colon = text.find(':')
+    if colon != -1:
+        if not text[colon + 1:].isdigit():
+            return text, INVALID_PORT
+        text = text[:colon]
+
+    text = text.rstrip('.').lower()
+    if text.startswith('www.'):
+        text = text[4:]
+    if not text:
+        return text, EMPTY
+
+    if not text.isascii():
+        try:
+            text = idn_to_ascii(text)
+        except IdnaUnavailableError:
+            return text, IDN_UNSUPPORTED
+        except UnicodeError:
+            return text, INVALID_IDN
+
+    if len(text) > MAX_HOSTNAME_LENGTH:
+        return text, TOO_LONG
+    if _CANONICAL_RE.fullmatch(text):
+        return text, None
+    return text, _rejection_reason(text)
+
+
+def _is_address(token):
+    """Return True if a token looks like an IPv4 or IPv6 address"""
+    return ':' in token or token.replace('.', '').isdigit()
+
+
+def parse_line(line):
+    """
+    Return the candidate domains on one blocklist line.
+
+    Comments and blank lines yield an empty list. Adblock rules other than
+    plain ``||domain^`` blocks (exceptions, paths, options) yield None so
+    they can be counted as rejected.
+    """
+    line = line.strip()
+    if not line or line[0] in '#![':
+        return []
+
+    if line.startswith('||'):
+        rule = line[2:]
+        if not rule.endswith('^'):
+            return None
+        return [rule[:-1]]
+    if line.startswith('@@'):
+        return None
+
+    tokens = line.split('#', 1)[0].split()
+    if not tokens:
+        return []
+    if len(tokens) > 1 and _is_address(tokens[0]):
+        return [token for token in tokens[1:] if token.lower() not in RESERVED_NAMES]
+    if len(tokens) == 1:
+        return tokens
+    return None
+
+
+def normalize_many(inputs):
+    """
+    Normalize an iterable of websites, URLs or blocklist lines.
+
+    Yields a Normalized(raw, hostname, reason) for every candidate, where
+    reason is None for accepted hostnames. Comments and blank lines yield
+    nothing; a line that can not be interpreted yields one rejection.
+    """
+    fullmatch = _CANONICAL_RE.fullmatch
+    for raw in inputs:
+        # Fast path: a bare canonical domain, the common case by far
+        text = raw.strip()
+        if fullmatch(text) and not text.startswith('www.') and len(text) <= MAX_HOSTNAME_LENGTH:
+            yield Normalized(text, text, None)
+            continue
+
+        candidates = parse_line(raw)
+        if candidates is None:
+            yield Normalized(raw, raw.strip(), UNRECOGNIZED_LINE)
+            continue
+        for candidate in candidates:
+            hostname, reason = normalize_hostname(candidate)
+            yield Normalized(candidate, hostname, reason)
+
+
+def _normalize_chunk(chunk, accepted, rejected):
+    """Normalize one list of inputs into the accepted and rejected lists"""
+    text = "\n".join(chunk) + "\n"
+    if text.count("\n") != len(chunk):
+        # An input with an embedded newline would shift every line after it
+        lines = None
+    else:
+        text = _strip_url_parts(text.lower())
+        lines = text.split("\n")
+
+    position = 0
+    index = 0
+    count = len(chunk)
+    match = _CANONICAL_LINES_RE.match
+    while index < count:
+        if lines is not None:
+            end = match(text, position).end()
+            run = text.count("\n", position, end)
+            if run:
+                hostnames = lines[index:index + run]
+                if max(map(len, hostnames)) <= MAX_HOSTNAME_LENGTH and RESERVED_NAMES.isdisjoint(hostnames):
+                    accepted.extend(hostnames)
+                else:
+                    _normalize_items(chunk[index:index + run], accepted, rejected)
+                index += run
+                position = end
+                if index >= count:
+                    break
+            position += len(lines[index]) + 1
+
+        line = chunk[index]
+        # Comments and blank lines yield nothing either way
+        if line and line[0] not in '#![':
+            _normalize_items((line,), accepted, rejected)
+        index += 1
+
+
+def _strip_url_parts(text):
+    """Cut the host out of every newline-terminated line in a recognized form"""
+    if any(marker in text for marker in _DECORATION_MARKERS):
+        # One tuple per line, with only the group of its form set
+        lines = _DECORATED_LINE_RE.findall(text, 0, len(text) - 1)
+        text = "\n".join([
+            bare or hosts or adblock or plain or other
+            for bare, hosts, adblock, plain, other in lines
+        ]) + "\n"
+    return text.replace(".\n", "\n")
+
+
+def _normalize_items(items, accepted, rejected):
+    for result in normalize_many(items):
+        if result.reason is None:
+            accepted.append(result.hostname)
+        else:
+            rejected.append(result)
+
+
+def normalize_batch(inputs, chunk_size=CHUNK_SIZE):
+    """
+    Normalize an iterable of websites, URLs or blocklist lines in bulk.
+
+    Yields one BatchResult(accepted, rejected) per chunk of inputs: the
+    accepted hostnames in input order, and a Normalized for every
+    rejection. Comments and blank lines appear in neither.
+    """
+    chunk = []
+    for raw in inputs:
+        chunk.append(raw.strip())
+        if len(chunk) >= chunk_size:
+            accepted, rejected = [], []
+            _normalize_chunk(chunk, accepted, rejected)
+            yield BatchResult(accepted, rejected)
+            chunk = []
+    if chunk:
+        accepted, rejected = [], []
+        _normalize_chunk(chunk, accepted, rejected)
+        yield BatchResult(accepted, rejected)
@@ -0,0 +1,136 @@
+"""
+Debounced background persistence for the configuration.
+
+Every add, remove or schedule edit used to rewrite blocker_config.json
+synchronously. ConfigWriter instead marks the configuration dirty and
+lets a background thread write it once the burst of edits has settled,
+so a thousand quick edits cost one write. Writes are atomic (temporary
+file plus rename) and flush() forces any pending write out, which the
+GUI does when it closes.
+
+ConfigWriter does not know the file layout itself: the engine serializes
+the files that make up the configuration on its own thread and hands
+over (path, data) pairs, so the writer thread never looks at live state.
+A write that fails is kept and retried.
+"""
+
+import json
+import sys
+import threading
+import time
+
+from .hosts import commit_bytes
+
+# Write once edits have paused for this long...
+DEFAULT_DELAY = 0.5
+# ...but never hold back a dirty configuration for longer than this
+DEFAULT_MAX_DELAY = 5.0
+# Pause before retrying a write that failed
+RETRY_DELAY = 5.0
+
+
+def dump_config(config):
+    """Serialize a configuration dict the way it is stored on disk"""
+    return json.dumps(config, indent=4)
+
+
+class ConfigWriter:
+    """Coalesces configuration saves and writes them from a background thread"""
+
+    def __init__(self, delay=DEFAULT_DELAY, max_delay=DEFAULT_MAX_DELAY, write=commit_bytes):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.write = write
+        self.writes = 0
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        # Latest data per path, in the order the files must be written
+        self._pending = {}
+        self._dirty_since = None
+        self._last_change = None
+        self._retry_at = None
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="config-writer", daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self, files):
+        """Schedule a write of serialized (path, data) pairs, in the given order"""
+        with self._condition:
+            for path, data in files:
+                # A newer version of a file is written after anything it replaced
+                self._pending.pop(path, None)
+                self._pending[path] = data
+            now = time.monotonic()
+            if self._dirty_since is None:
+                self._dirty_since = now
+            self._last_change = now
+            self._condition.notify()
+
+    @property
+    def pending(self):
+        """True while a write is scheduled but not yet done"""
+        return self._dirty_since is not None
+
+    def flush(self):
+        """Write any pending change now, on the calling thread"""
+        return self._write()
+
+    def close(self):
+        """Flush pending changes and stop the writer thread"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+    def _write(self):
+        # Taking the files and writing them is one step, so an older
+        # version can never land on disk after a newer one
+        with self._write_lock:
+            with self._condition:
+                if self._dirty_since is None:
+                    return False
+                files = list(self._pending.items())
+                self._pending.clear()
+                self._dirty_since = None
+                self._last_change = None
+                self._retry_at = None
+
+            written = 0
+            try:
+                for path, data in files:
+                    self.write(path, data)
+                    written += 1
+                self.writes += 1
+                return True
+            except Exception as e:
+                print(f"Error saving config: {e}", file=sys.stderr)
+                self._retry(files[written:])
+                return False
+
+    def _retry(self, files):
+        """Put files that were not written back, unless newer data arrived"""
+        with self._condition:
+            pending = {path: data for path, data in files if path not in self._pending}
+            pending.update(self._pending)
+            self._pending = pending
+            now = time.monotonic()
+            self._dirty_since = self._last_change = now
+            self._retry_at = now + RETRY_DELAY
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and self._dirty_since is None:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                now = time.monotonic()
+                due = min(self._last_change + self.delay, self._dirty_since + self.max_delay)
+                if self._retry_at is not None:
+                    due = max(due, self._retry_at)
+                if now < due:
+                    self._condition.wait(due - now)
+                    continue
+            self._write()
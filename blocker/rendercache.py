@@ -0,0 +1,111 @@
+"""
+On-disk cache of rendered hosts sections.
+
+Expanding wildcards and rendering the managed section takes seconds for a
+blocklist of a million entries, yet scheduled blocks switch the same lists
+on and off many times a day. SectionCache keeps the last section rendered
+for each combination of enforced lists (the main list and the active
+groups), keyed by a hash of their contents, the subdomain corpus and the
+render options. Re-enabling an unchanged list is then a file read and a
+commit. Once a list changes its key no longer matches, and the next render
+replaces the stale entry; combinations not used for a while are evicted
+beyond MAX_ENTRIES.
+
+Each entry is a plain text file holding the key and the number of
+hostnames on its first line, then the section exactly as it goes into the
+hosts file.
+"""
+
+import hashlib
+import os
+
+from .hosts import BEGIN_MARKER, END_MARKER, ENCODING, ERRORS, commit_bytes
+
+CACHE_FORMAT = 2
+DEFAULT_CACHE_DIR = "render_cache"
+MAX_ENTRIES = 8
+
+_SUFFIX = ".section"
+
+
+def content_key(stores, corpus_stamp=None, options=()):
+    """Hash the contents of the enforced stores and everything that shapes their rendering"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{CACHE_FORMAT}\n{corpus_stamp}\n{options}\n".encode())
+    for store in stores:
+        digest.update(f"\0{len(store)}\n".encode())
+        digest.update("\n".join(store).encode(ENCODING, ERRORS))
+    return digest.hexdigest()
+
+
+class SectionCache:
+    """Directory of rendered sections, one per combination of enforced lists"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_entries=MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def _path(self, signature):
+        name = hashlib.blake2b(signature.encode(ENCODING, ERRORS), digest_size=8).hexdigest()
+        return os.path.join(self.directory, name + _SUFFIX)
+
+    def get(self, signature, key):
+        """Return (section, hostname count) cached for signature under key, or None"""
+        path = self._path(signature)
+        try:
+            with open(path, 'r', encoding=ENCODING, errors=ERRORS, newline='') as file:
+                header = file.readline().split()
+                if len(header) != 2 or header[0] != key or not header[1].isdigit():
+                    return None
+                section = file.read()
+        except OSError:
+            return None
+        if not (section.startswith(BEGIN_MARKER + "\n") and section.endswith(END_MARKER + "\n")):
+            return None
+        try:
+            # Mark the entry as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return section, int(header[1])
+
+    def put(self, signature, key, section, count):
+        """Store a section of count hostnames rendered for signature under key; returns bytes written"""
+        os.makedirs(self.directory, exist_ok=True)
+        data = f"{key} {count}\n{section}".encode(ENCODING, ERRORS)
+        written = commit_bytes(self._path(signature), data)
+        self._evict()
+        return written
+
+    def _entries(self):
+        """Return (mtime, path) for every entry, oldest first"""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if name.endswith(_SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+        entries.sort()
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove every cached section"""
+        for _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
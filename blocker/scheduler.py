@@ -0,0 +1,144 @@
+"""
+Event-driven schedule runner.
+
+Instead of waking up every minute to re-check every schedule, the
+scheduler computes the instants at which the scheduled state can change,
+keeps the upcoming ones in a priority queue and sleeps until the earliest
+of them. Editing the schedules wakes it immediately so the queue can be
+rebuilt.
+"""
+
+import heapq
+import sys
+import threading
+from datetime import datetime, timedelta
+
+# Upper bound on a single sleep, so suspend/resume and clock changes are
+# noticed within this many seconds even when no transition is due
+MAX_SLEEP = 3600.0
+# Seconds before a transition whose on_change failed is tried again
+RETRY_DELAY = 30.0
+
+
+def next_occurrence(minute, now):
+    """Return the first datetime strictly after now at the given minute of the week"""
+    week_start = (now - timedelta(days=now.weekday())).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    when = week_start + timedelta(minutes=minute)
+    if when <= now:
+        when += timedelta(days=7)
+    return when
+
+
+class Scheduler:
+    """
+    Background thread that reports scheduled start/stop transitions.
+
+    get_timetable() returns an object with boundaries() (minutes of the week
+    at which the state may change) and state_at(moment). on_change(state)
+    is called from the scheduler thread whenever the state changes, and
+    once at start-up with the current state. If it raises, the error is
+    printed and the same state is passed again after RETRY_DELAY seconds.
+    """
+
+    def __init__(self, get_timetable, on_change, clock=datetime.now):
+        self.get_timetable = get_timetable
+        self.on_change = on_change
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._timetable = None
+        self._queue = []
+        self._dirty = True
+        self._running = False
+        self._state = None
+        self._retry_at = None
+        self._thread = None
+
+    def start(self):
+        """Start the scheduler thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the scheduler thread"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def wake(self):
+        """Rebuild the transition queue after the schedules changed"""
+        with self._condition:
+            self._dirty = True
+            self._condition.notify()
+
+    def next_transition(self):
+        """Return the datetime of the next queued transition, or None"""
+        with self._condition:
+            return self._queue[0][0] if self._queue else None
+
+    def _rebuild(self, now):
+        timetable = self.get_timetable()
+        queue = [(next_occurrence(minute, now), minute) for minute in timetable.boundaries()]
+        heapq.heapify(queue)
+        self._timetable, self._queue = timetable, queue
+
+    def _evaluate(self, now):
+        """Return the new state if it changed since the last evaluation"""
+        state = self._timetable.state_at(now)
+        if state == self._state:
+            return None
+        self._state = state
+        return state
+
+    def _run(self):
+        while True:
+            changed = None
+            with self._condition:
+                if not self._running:
+                    return
+                now = self.clock()
+                previous = self._state
+                if self._dirty:
+                    self._dirty = False
+                    try:
+                        self._rebuild(now)
+                    except Exception as e:
+                        # Keep running on the previous queue until the next edit
+                        print(f"Could not compile the schedules: {e}", file=sys.stderr)
+                        continue
+                    self._retry_at = None
+                    changed = self._evaluate(now)
+                elif self._queue and self._queue[0][0] <= now:
+                    while self._queue and self._queue[0][0] <= now:
+                        _, minute = heapq.heappop(self._queue)
+                        heapq.heappush(self._queue, (next_occurrence(minute, now), minute))
+                    self._retry_at = None
+                    changed = self._evaluate(now)
+                elif self._retry_at is not None and self._retry_at <= now:
+                    self._retry_at = None
+                    changed = self._evaluate(now)
+                else:
+                    timeout = MAX_SLEEP
+                    if self._queue:
+                        timeout = min(timeout, (self._queue[0][0] - now).total_seconds())
+                    if self._retry_at is not None:
+                        timeout = min(timeout, (self._retry_at - now).total_seconds())
+                    self._condition.wait(timeout)
+                    continue
+
+            if changed is not None:
+                try:
+                    self.on_change(changed)
+                except Exception as e:
+                    print(f"Could not apply the scheduled change, retrying in {RETRY_DELAY:.0f}s: {e}",
+                          file=sys.stderr)
+                    with self._condition:
+                        # Forget the state so the retry passes it on again
+                        if self._state == changed:
+                            self._state = previous
+                        self._retry_at = self.clock() + timedelta(seconds=RETRY_DELAY)
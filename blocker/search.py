@@ -0,0 +1,75 @@
+"""
+Incremental search over the blocked list.
+
+SiteIndex keeps the blocked domains in display order and answers
+substring queries as the user types. Every result is remembered against
+its query, so typing one more character only filters the previous
+(already narrowed) result instead of the whole list, and deleting a
+character returns a remembered result straight away. A query with no
+cached ancestor costs one pass over the list, a substring test per row
+in an interpreted loop; narrowing cached results is what keeps typing
+fast.
+"""
+
+# Remember this many query results, enough to backspace through a word
+MAX_CACHED = 32
+
+
+class SiteIndex:
+    """Display rows of the blocked list with cached substring search"""
+
+    def __init__(self, sites=()):
+        self.reset(sites)
+
+    def reset(self, sites):
+        """Replace every row"""
+        self.rows = list(sites)
+        self._positions = None
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, site):
+        """Append a row"""
+        self.rows.append(site)
+        if self._positions is not None:
+            self._positions[site] = len(self.rows) - 1
+        self._cache = {}
+
+    def discard(self, site):
+        """Remove a row, returning False if it was not present"""
+        if self._positions is None:
+            self._positions = {row: position for position, row in enumerate(self.rows)}
+        position = self._positions.pop(site, None)
+        if position is None:
+            return False
+        del self.rows[position]
+        if position < len(self.rows):
+            # Rows after the removed one moved up; rebuild lazily
+            self._positions = None
+        self._cache = {}
+        return True
+
+    def search(self, query):
+        """Return the rows containing query (case-insensitive), in display order"""
+        query = query.strip().lower()
+        if not query:
+            return self.rows
+
+        results = self._cache.get(query)
+        if results is not None:
+            return results
+
+        # Any row matching query also matches every substring of it, so the
+        # longest cached substring is the smallest list worth scanning
+        candidates = self.rows
+        for cached, cached_results in self._cache.items():
+            if cached in query and len(cached_results) < len(candidates):
+                candidates = cached_results
+        results = [row for row in candidates if query in row]
+
+        if len(self._cache) >= MAX_CACHED:
+            del self._cache[next(iter(self._cache))]
+        self._cache[query] = results
+        return results
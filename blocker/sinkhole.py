@@ -0,0 +1,276 @@
+"""
+Local DNS sinkhole backend.
+
+An alternative to rewriting the hosts file: a small asyncio UDP DNS
+responder, normally bound to loopback, that answers queries for blocked
+names itself and forwards everything else to an upstream resolver. The
+blocklist is consulted on every query, so adding, removing or toggling
+takes effect immediately, without file writes or resolver restarts.
+
+Only the parts of RFC 1035 needed to answer A/AAAA questions are
+implemented; anything the sinkhole does not understand is forwarded.
+"""
+
+import asyncio
+import os
+import socket
+import struct
+import threading
+
+DEFAULT_LISTEN = "127.0.0.1:53"
+DEFAULT_UPSTREAM = "1.1.1.1:53"
+SINK_V4 = "0.0.0.0"
+SINK_V6 = "::"
+ANSWER_TTL = 60
+UPSTREAM_TIMEOUT = 3.0
+
+TYPE_A = 1
+TYPE_AAAA = 28
+CLASS_IN = 1
+
+_HEADER = struct.Struct("!HHHHHH")
+_QUESTION_TAIL = struct.Struct("!HH")
+_ANSWER = struct.Struct("!HHIH")
+
+FLAG_QR = 0x8000
+FLAG_RD = 0x0100
+FLAG_RA = 0x0080
+OPCODE_MASK = 0x7800
+RCODE_SERVFAIL = 2
+
+
+def parse_address(text, default_port=53):
+    """Parse 'host:port' (or '[v6]:port') into a (host, port) tuple"""
+    if text.startswith('['):
+        host, _, port = text[1:].partition(']')
+        port = port.lstrip(':')
+    elif text.count(':') == 1:
+        host, _, port = text.partition(':')
+    else:
+        host, port = text, ''
+    return host, int(port) if port else default_port
+
+
+def parse_question(message):
+    """
+    Return (txid, flags, qname, qtype, question_end) for a DNS query.
+
+    Raises ValueError if the message is not a single-question query.
+    """
+    if len(message) < _HEADER.size:
+        raise ValueError("short DNS message")
+    txid, flags, qdcount, _, _, _ = _HEADER.unpack_from(message)
+    if flags & FLAG_QR or qdcount != 1:
+        raise ValueError("not a single-question query")
+
+    labels = []
+    offset = _HEADER.size
+    while True:
+        if offset >= len(message):
+            raise ValueError("truncated question name")
+        length = message[offset]
+        offset += 1
+        if length == 0:
+            break
+        if length & 0xC0:
+            raise ValueError("compressed question name")
+        labels.append(message[offset:offset + length].decode('ascii', 'replace'))
+        offset += length
+    if offset + _QUESTION_TAIL.size > len(message):
+        raise ValueError("truncated question")
+    qtype, qclass = _QUESTION_TAIL.unpack_from(message, offset)
+    return txid, flags, ".".join(labels).lower(), qtype, offset + _QUESTION_TAIL.size
+
+
+def build_blocked_response(message, sink_v4=SINK_V4, sink_v6=SINK_V6, ttl=ANSWER_TTL):
+    """Build the answer to a query for a blocked name"""
+    txid, flags, _, qtype, question_end = parse_question(message)
+    answers = []
+    if qtype == TYPE_A:
+        answers.append((TYPE_A, socket.inet_pton(socket.AF_INET, sink_v4)))
+    elif qtype == TYPE_AAAA:
+        answers.append((TYPE_AAAA, socket.inet_pton(socket.AF_INET6, sink_v6)))
+
+    response_flags = FLAG_QR | FLAG_RA | (flags & (OPCODE_MASK | FLAG_RD))
+    parts = [_HEADER.pack(txid, response_flags, 1, len(answers), 0, 0),
+             message[_HEADER.size:question_end]]
+    for rtype, rdata in answers:
+        # 0xC00C points back at the question name
+        parts.append(b"\xc0\x0c" + _ANSWER.pack(rtype, CLASS_IN, ttl, len(rdata)) + rdata)
+    return b"".join(parts)
+
+
+def build_error_response(message, rcode=RCODE_SERVFAIL):
+    """Build an error response echoing the query's question"""
+    txid, flags, _, _, question_end = parse_question(message)
+    response_flags = FLAG_QR | FLAG_RA | (flags & (OPCODE_MASK | FLAG_RD)) | rcode
+    return _HEADER.pack(txid, response_flags, 1, 0, 0, 0) + message[_HEADER.size:question_end]
+
+
+class _UpstreamProtocol(asyncio.DatagramProtocol):
+    """Receives replies from the upstream resolver"""
+
+    def __init__(self, sinkhole):
+        self.sinkhole = sinkhole
+
+    def datagram_received(self, data, addr):
+        self.sinkhole._upstream_reply(data)
+
+
+class DnsSinkhole(asyncio.DatagramProtocol):
+    """
+    UDP DNS responder that sinks blocked names and forwards the rest.
+
+    is_blocked is called with the lower-cased query name for every query
+    while active is True; when active is False every query is forwarded.
+    """
+
+    def __init__(self, is_blocked, listen=DEFAULT_LISTEN, upstream=DEFAULT_UPSTREAM,
+                 sink_v4=SINK_V4, sink_v6=SINK_V6, timeout=UPSTREAM_TIMEOUT):
+        self.is_blocked = is_blocked
+        self.listen = parse_address(listen) if isinstance(listen, str) else listen
+        self.upstream = parse_address(upstream) if isinstance(upstream, str) else upstream
+        self.sink_v4 = sink_v4
+        self.sink_v6 = sink_v6
+        self.timeout = timeout
+        self.active = True
+        self.transport = None
+        self.upstream_transport = None
+        self._pending = {}
+
+    async def start(self):
+        """Bind the listening socket and connect to the upstream resolver"""
+        loop = asyncio.get_running_loop()
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: self, local_addr=self.listen
+        )
+        self.upstream_transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UpstreamProtocol(self), remote_addr=self.upstream
+        )
+        return self
+
+    def close(self):
+        """Close both sockets and drop pending forwards"""
+        for _, _, timer in self._pending.values():
+            timer.cancel()
+        self._pending.clear()
+        if self.transport is not None:
+            self.transport.close()
+        if self.upstream_transport is not None:
+            self.upstream_transport.close()
+
+    @property
+    def address(self):
+        """The (host, port) the sinkhole is listening on"""
+        return self.transport.get_extra_info('sockname')[:2]
+
+    def datagram_received(self, data, addr):
+        try:
+            _, _, qname, _, _ = parse_question(data)
+        except ValueError:
+            return
+        if self.active and self.is_blocked(qname):
+            self.transport.sendto(
+                build_blocked_response(data, self.sink_v4, self.sink_v6), addr
+            )
+        else:
+            self._forward(data, addr)
+
+    def _forward(self, data, addr):
+        """Relay a query upstream under a fresh transaction id"""
+        if len(self._pending) >= 0xFFFF:
+            self.transport.sendto(build_error_response(data), addr)
+            return
+        txid = struct.unpack_from("!H", os.urandom(2))[0]
+        while txid in self._pending:
+            txid = (txid + 1) & 0xFFFF
+        loop = asyncio.get_running_loop()
+        timer = loop.call_later(self.timeout, self._upstream_timeout, txid)
+        self._pending[txid] = (data, addr, timer)
+        self.upstream_transport.sendto(struct.pack("!H", txid) + data[2:])
+
+    def _upstream_reply(self, data):
+        if len(data) < 2:
+            return
+        txid = struct.unpack_from("!H", data)[0]
+        pending = self._pending.pop(txid, None)
+        if pending is None:
+            return
+        query, addr, timer = pending
+        timer.cancel()
+        self.transport.sendto(query[:2] + data[2:], addr)
+
+    def _upstream_timeout(self, txid):
+        pending = self._pending.pop(txid, None)
+        if pending is not None:
+            query, addr, _ = pending
+            self.transport.sendto(build_error_response(query), addr)
+
+
+class SinkholeThread:
+    """Runs a DnsSinkhole on its own event loop in a daemon thread"""
+
+    def __init__(self, is_blocked, **options):
+        self.sinkhole = DnsSinkhole(is_blocked, **options)
+        self.loop = None
+        self._thread = None
+        self._started = threading.Event()
+        self._error = None
+
+    def start(self):
+        """Start the sinkhole and wait until its sockets are bound"""
+        self._thread = threading.Thread(target=self._run, name="dns-sinkhole", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self.sinkhole.start())
+        except Exception as e:
+            self._error = e
+            self._started.set()
+            self.loop.close()
+            return
+        self._started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.sinkhole.close()
+            self.loop.close()
+
+    def stop(self):
+        """Stop the event loop and close the sockets"""
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def active(self):
+        return self.sinkhole.active
+
+    @active.setter
+    def active(self, value):
+        self.sinkhole.active = value
+
+
+def run_sinkhole(is_blocked, **options):
+    """Run a sinkhole in the foreground until interrupted"""
+    async def serve():
+        sinkhole = await DnsSinkhole(is_blocked, **options).start()
+        host, port = sinkhole.address
+        print(f"DNS sinkhole listening on {host}:{port}, forwarding to "
+              f"{sinkhole.upstream[0]}:{sinkhole.upstream[1]}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            sinkhole.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
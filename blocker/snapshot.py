@@ -0,0 +1,277 @@
+"""
+Compact binary snapshot of the blocklist.
+
+Large blocklists make blocker_config.json slow to parse at start-up, since
+every domain has to be decoded before the first window appears. A snapshot
+stores the domains once, sorted, in a binary table that is memory-mapped
+and decoded lazily: opening it costs a header read and a checksum, looking
+a domain up is a binary search over the mapped bytes, and only the domains
+that are actually iterated are turned into strings.
+
+Layout (all integers little-endian):
+
+    header   magic, format version, flags, entry count, table size, CRC-32
+    offsets  one uint32 per entry, the entry's position in the table
+    table    entries in sorted order, each a uint8 length followed by
+             that many UTF-8 bytes
+
+The CRC-32 covers the offsets and the table. SnapshotStore layers the
+usual BlocklistStore edits on top of a read-only snapshot, so adding or
+removing a few sites does not require decoding the whole list.
+"""
+
+import json
+import mmap
+import os
+import struct
+import zlib
+from itertools import chain
+
+from .engine import BlockerError
+from .hosts import commit_bytes
+from .store import BlocklistStore
+
+MAGIC = b"WBSNAP\r\n"
+FORMAT_VERSION = 1
+DEFAULT_SNAPSHOT_FILE = "blocklist.snap"
+
+HEADER = struct.Struct("<8sHHIII")
+_OFFSET = struct.Struct("<I")
+_MAX_ENTRY = 255
+
+
+class SnapshotError(BlockerError, ValueError):
+    """Raised when a snapshot file is malformed or corrupt"""
+
+
+def encode_snapshot(domains):
+    """Return the snapshot bytes for an iterable of domains"""
+    entries = sorted({domain.encode('utf-8') for domain in domains})
+    offsets = bytearray(_OFFSET.size * len(entries))
+    table = bytearray()
+    for position, entry in enumerate(entries):
+        if len(entry) > _MAX_ENTRY:
+            raise SnapshotError(f"Domain too long for a snapshot: {entry[:40]!r}...")
+        _OFFSET.pack_into(offsets, position * _OFFSET.size, len(table))
+        table.append(len(entry))
+        table += entry
+    checksum = zlib.crc32(table, zlib.crc32(offsets))
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(entries), len(table), checksum)
+    return header + bytes(offsets) + bytes(table)
+
+
+def write_snapshot(path, domains):
+    """Atomically write a snapshot of domains and return the bytes written"""
+    return commit_bytes(path, encode_snapshot(domains))
+
+
+class Snapshot:
+    """Read-only, sorted set of domains backed by a memory-mapped snapshot"""
+
+    def __init__(self, path, verify=True, data=None):
+        self.path = path
+        if data is not None:
+            # Bytes already in memory, e.g. just encoded for path
+            self._data = data
+        else:
+            self._data = self._map(path)
+
+        if len(self._data) < HEADER.size:
+            raise SnapshotError(f"{path} is too short to be a snapshot")
+        magic, version, _, count, table_size, checksum = HEADER.unpack_from(self._data)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not a blocklist snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version} in {path}")
+
+        self._count = count
+        self._table = HEADER.size + count * _OFFSET.size
+        if len(self._data) != self._table + table_size:
+            raise SnapshotError(f"{path} is truncated")
+        if verify:
+            with memoryview(self._data) as view:
+                valid = zlib.crc32(view[HEADER.size:]) == checksum
+            if not valid:
+                raise SnapshotError(f"Checksum mismatch in {path}")
+
+    @staticmethod
+    def _map(path):
+        with open(path, 'rb') as file:
+            if os.name == 'nt':
+                # A mapped file can not be replaced on Windows, which would
+                # stop the next save, so read it into memory there instead
+                return file.read()
+            size = os.fstat(file.fileno()).st_size
+            if size < HEADER.size:
+                raise SnapshotError(f"{path} is too short to be a snapshot")
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self._count
+
+    def __bool__(self):
+        return self._count > 0
+
+    def __repr__(self):
+        return f"Snapshot({self.path!r}, {self._count} domains)"
+
+    def _entry(self, position):
+        """Return the raw bytes of the entry at position"""
+        start = self._table + _OFFSET.unpack_from(self._data, HEADER.size + position * _OFFSET.size)[0]
+        return self._data[start + 1:start + 1 + self._data[start]]
+
+    def __getitem__(self, position):
+        if not 0 <= position < self._count:
+            raise IndexError("snapshot index out of range")
+        return self._entry(position).decode('utf-8')
+
+    def __contains__(self, domain):
+        if not isinstance(domain, str):
+            return False
+        target = domain.encode('utf-8')
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self._count and self._entry(low) == target
+
+    def __iter__(self):
+        # Walk the length-prefixed table directly; no offset lookups needed
+        data = self._data
+        position = self._table
+        end = len(data)
+        while position < end:
+            length = data[position]
+            yield data[position + 1:position + 1 + length].decode('utf-8')
+            position += 1 + length
+
+    def close(self):
+        """Release the mapping"""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+
+class SnapshotStore(BlocklistStore):
+    """
+    BlocklistStore whose bulk lives in a Snapshot.
+
+    Additions are kept in the ordinary insertion-ordered dict and removals of
+    snapshot domains in a set, so membership never needs the full list
+    decoded. Snapshot domains come first when iterating, in sorted order.
+    """
+
+    __slots__ = ('_base', '_removed')
+
+    def __init__(self, snapshot, domains=()):
+        super().__init__()
+        self._base = snapshot
+        self._removed = set()
+        self.add_many(domains)
+
+    @property
+    def modified(self):
+        """True once the store differs from its snapshot"""
+        return bool(self._domains or self._removed) or self.snapshot is None
+
+    @property
+    def snapshot(self):
+        """The underlying Snapshot, or None after clear()"""
+        return self._base if isinstance(self._base, Snapshot) else None
+
+    def __contains__(self, domain):
+        if domain in self._domains:
+            return True
+        return domain not in self._removed and domain in self._base
+
+    def __iter__(self):
+        if not self._removed:
+            return chain(self._base, self._domains)
+        removed = self._removed
+        return chain((domain for domain in self._base if domain not in removed), self._domains)
+
+    def __len__(self):
+        return len(self._base) - len(self._removed) + len(self._domains)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __repr__(self):
+        return f"SnapshotStore({len(self)} domains)"
+
+    def add(self, domain):
+        """Add a domain, returning False if it was already present"""
+        if domain in self._domains:
+            return False
+        if domain in self._base and domain not in self._removed:
+            return False
+        # A re-added snapshot domain stays in _removed and lives in the
+        # overlay, so newest() still sees it
+        self._domains[domain] = None
+        return True
+
+    def discard(self, domain):
+        """Remove a domain, returning False if it was not present"""
+        if super().discard(domain):
+            return True
+        if domain in self._removed or domain not in self._base:
+            return False
+        self._removed.add(domain)
+        return True
+
+    def add_many(self, domains):
+        """Add many domains at once and return how many were new"""
+        if not self._base:
+            return super().add_many(domains)
+        add = self.add
+        return sum(1 for domain in domains if add(domain))
+
+    def remove_many(self, domains):
+        """Remove many domains at once and return how many were present"""
+        discard = self.discard
+        return sum(1 for domain in domains if discard(domain))
+
+    def rebase(self, snapshot):
+        """Make snapshot, which must hold exactly the current domains, the new base"""
+        self._base = snapshot
+        self._removed.clear()
+        self._domains.clear()
+
+    def clear(self):
+        """Remove every domain"""
+        self._base = ()
+        self._removed.clear()
+        self._domains.clear()
+
+    def to_list(self):
+        """Return the domains as a list, snapshot domains first"""
+        # Copy the mutable parts first so a concurrent edit can not break
+        # the walk over the snapshot
+        overlay = list(self._domains)
+        removed = set(self._removed)
+        base = [domain for domain in self._base if domain not in removed]
+        return base + overlay
+
+
+def json_to_snapshot(json_path, snapshot_path):
+    """Write the blocked_sites of an exported JSON configuration to a snapshot"""
+    with open(json_path, 'r') as file:
+        config = json.load(file)
+    if 'blocked_sites' not in config:
+        raise SnapshotError(f"{json_path} has no blocked_sites list")
+    write_snapshot(snapshot_path, config['blocked_sites'])
+    return len(config['blocked_sites'])
+
+
+def snapshot_to_json(snapshot_path, json_path):
+    """Write a snapshot as a JSON configuration that import_config accepts"""
+    snapshot = Snapshot(snapshot_path)
+    try:
+        config = {'blocked_sites': list(snapshot), 'scheduled_blocks': []}
+    finally:
+        snapshot.close()
+    with open(json_path, 'w') as file:
+        json.dump(config, file, indent=4)
+    return len(config['blocked_sites'])
@@ -0,0 +1,185 @@
+"""
+Lightweight timing and counter instrumentation.
+
+The engine records how long applying and removing the hosts section, delta
+patches and DNS flushes take, how many bytes of hosts file it reads and
+writes, and how many scheduler transitions it acts on. Stats collects
+these in memory and can dump them as JSON or in the Prometheus text
+exposition format (for node_exporter's textfile collector, for example).
+
+Instrumentation is off by default. The engine then holds NULL_STATS, whose
+methods do nothing, so the hot paths pay only an attribute lookup and an
+empty call.
+"""
+
+import json
+import threading
+import time
+
+from .hosts import commit_hosts
+
+METRIC_PREFIX = "website_blocker_"
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+HELP = {
+    'apply': "Time to write the blocking section to the hosts file",
+    'unapply': "Time to remove the blocking section from the hosts file",
+    'patch': "Time to patch added or removed sites into the active section",
+    'dns_flush': "Time to flush the DNS cache",
+    'gui_refresh': "Time to refresh the blocked-sites list in the GUI",
+    'hosts_bytes_read': "Bytes of hosts file read",
+    'hosts_bytes_written': "Bytes of hosts file written",
+    'dns_flush_failures': "DNS cache flushes that failed",
+    'scheduler_transitions': "Schedule transitions acted on",
+    'group_transitions': "Site groups that entered or left the blocked state",
+    'focus_transitions': "Focus sessions that started or ended a work period",
+    'hosts_repairs': "Repairs of the hosts file after outside edits",
+    'render_cache_hits': "Hosts sections taken from the render cache",
+    'render_cache_misses': "Hosts sections rendered because the cache had no current copy",
+    'startup_import': "Time to import the GUI and engine modules",
+    'startup_window': "Time to create the main window",
+    'startup_config': "Time to load the configuration or connect to the daemon",
+    'startup_gui': "Time to build the widgets shown at startup",
+    'startup_first_paint': "Time from building the widgets to an idle, interactive window",
+}
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullStats:
+    """Stats stand-in that records nothing"""
+
+    enabled = False
+
+    def incr(self, name, value=1):
+        pass
+
+    def observe(self, name, seconds):
+        pass
+
+    def timer(self, name):
+        return _NULL_TIMER
+
+
+NULL_STATS = NullStats()
+
+
+class _Timer:
+    __slots__ = ('stats', 'name', 'started')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.observe(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class Stats:
+    """Thread-safe counters and latency histograms"""
+
+    enabled = True
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+
+    def incr(self, name, value=1):
+        """Add value to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        """Record one duration"""
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = {
+                    'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * len(BUCKETS)
+                }
+            timing['count'] += 1
+            timing['sum'] += seconds
+            if seconds > timing['max']:
+                timing['max'] = seconds
+            for position, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    timing['buckets'][position] += 1
+                    break
+
+    def timer(self, name):
+        """Return a context manager that records the duration of its block"""
+        return _Timer(self, name)
+
+    def snapshot(self):
+        """Return a copy of every counter and timing"""
+        with self._lock:
+            return {
+                'started': self.started,
+                'uptime': time.time() - self.started,
+                'counters': dict(self._counters),
+                'timings': {
+                    name: dict(timing, buckets=list(timing['buckets']))
+                    for name, timing in self._timings.items()
+                },
+            }
+
+    def to_json(self):
+        """Return the stats as a JSON document"""
+        snapshot = self.snapshot()
+        for timing in snapshot['timings'].values():
+            timing['mean'] = timing['sum'] / timing['count'] if timing['count'] else 0.0
+            timing['buckets'] = dict(zip((str(bound) for bound in BUCKETS), timing['buckets']))
+        return json.dumps(snapshot, indent=4)
+
+    def to_prometheus(self):
+        """Return the stats in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot['counters'].items()):
+            metric = f"{METRIC_PREFIX}{name}_total"
+            lines.append(f"# HELP {metric} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, timing in sorted(snapshot['timings'].items()):
+            metric = f"{METRIC_PREFIX}{name}_seconds"
+            lines.append(f"# HELP {metric} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(BUCKETS, timing['buckets']):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {timing["count"]}')
+            lines.append(f"{metric}_sum {timing['sum']:.6f}")
+            lines.append(f"{metric}_count {timing['count']}")
+            lines.append(f"# TYPE {metric}_max gauge")
+            lines.append(f"{metric}_max {timing['max']:.6f}")
+        metric = f"{METRIC_PREFIX}start_time_seconds"
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {snapshot['started']:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Atomically write the stats; .prom files get Prometheus text, others JSON"""
+        content = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        commit_hosts(path, content)
+        return path
@@ -0,0 +1,83 @@
+"""
+Blocklist storage.
+
+BlocklistStore is an insertion-ordered set backed by a dict, so membership,
+insert and delete are O(1) while the display order stays stable. Bulk
+operations run at C speed through dict.update and are the preferred way
+to load or import large lists.
+"""
+
+from itertools import islice
+
+_MISSING = object()
+
+
+class BlocklistStore:
+    """Insertion-ordered set of blocked domains"""
+
+    __slots__ = ('_domains',)
+
+    def __init__(self, domains=()):
+        self._domains = dict.fromkeys(domains)
+
+    def __contains__(self, domain):
+        return domain in self._domains
+
+    def __iter__(self):
+        return iter(self._domains)
+
+    def __len__(self):
+        return len(self._domains)
+
+    def __bool__(self):
+        return bool(self._domains)
+
+    def __eq__(self, other):
+        if isinstance(other, BlocklistStore):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"BlocklistStore({len(self._domains)} domains)"
+
+    def add(self, domain):
+        """Add a domain, returning False if it was already present"""
+        if domain in self._domains:
+            return False
+        self._domains[domain] = None
+        return True
+
+    def discard(self, domain):
+        """Remove a domain, returning False if it was not present"""
+        return self._domains.pop(domain, _MISSING) is not _MISSING
+
+    def add_many(self, domains):
+        """Add many domains at once and return how many were new"""
+        before = len(self._domains)
+        self._domains.update(dict.fromkeys(domains))
+        return len(self._domains) - before
+
+    def remove_many(self, domains):
+        """Remove many domains at once and return how many were present"""
+        pop = self._domains.pop
+        removed = 0
+        for domain in domains:
+            if pop(domain, _MISSING) is not _MISSING:
+                removed += 1
+        return removed
+
+    def newest(self, count):
+        """Return the count most recently added domains, oldest first"""
+        if count <= 0:
+            return []
+        newest = list(islice(reversed(self._domains), count))
+        newest.reverse()
+        return newest
+
+    def clear(self):
+        """Remove every domain"""
+        self._domains.clear()
+
+    def to_list(self):
+        """Return the domains as a list in insertion order"""
+        return list(self._domains)
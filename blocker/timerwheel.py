@@ -0,0 +1,253 @@
+"""
+Hierarchical timer wheel.
+
+Focus sessions need one-off deadlines ("unblock in 45 minutes", "break
+ends at 10:35") rather than weekly boundaries, possibly thousands of them
+at once, and each has to fire within a second of its deadline. A heap
+would make cancelling a timer O(n); the wheel keeps both insert and
+cancel O(1).
+
+Time is cut into ticks of TICK seconds. Level 0 has one slot per tick for
+the next SLOTS ticks, level 1 one slot per SLOTS ticks, and so on, so a
+timer is dropped straight into the slot of the coarsest level that still
+separates it from now. Each time the finer level wraps around, the next
+slot of the coarser level is cascaded: its timers are placed again, one
+level finer, until they reach level 0 and fire. Deadlines beyond the top
+level simply cascade back into it until they come within range.
+
+TimerThread runs a wheel in the background, sleeping until the next tick
+that has work to do.
+"""
+
+import sys
+import threading
+import time
+
+# Seconds per tick; timers fire at most this long after their deadline
+TICK = 0.25
+# Slots per level, and the number of levels (SLOTS ** LEVELS ticks, 48 days)
+SLOTS = 64
+LEVELS = 4
+# Upper bound on a single sleep, so clock changes and suspend/resume are
+# noticed even when no timer is due soon
+MAX_SLEEP = 60.0
+
+
+class Timer:
+    """A pending callback; cancel it through the wheel that returned it"""
+
+    __slots__ = ('deadline', 'callback', 'args', 'tick', '_slot')
+
+    def __init__(self, deadline, callback, args, tick):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.tick = tick
+        self._slot = None
+
+    @property
+    def pending(self):
+        """True until the timer fires or is cancelled"""
+        return self._slot is not None
+
+    def __repr__(self):
+        return f"Timer(deadline={self.deadline!r}, callback={self.callback!r})"
+
+
+class TimerWheel:
+    """
+    Timers bucketed by deadline on a hierarchy of wheels.
+
+    Not thread-safe; TimerThread serializes access. Deadlines are in the
+    same unit as origin and the now passed to advance(), normally
+    time.time() seconds.
+    """
+
+    def __init__(self, origin, tick=TICK, slots=SLOTS, levels=LEVELS):
+        self.origin = origin
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        # Last tick that has been processed
+        self.current = 0
+        self._wheels = [[set() for _ in range(slots)] for _ in range(levels)]
+        self._counts = [0] * levels
+        self._spans = [slots ** level for level in range(levels + 1)]
+
+    def __len__(self):
+        return sum(self._counts)
+
+    def tick_at(self, moment):
+        """Return the last tick that has started at the given moment"""
+        return int((moment - self.origin) // self.tick)
+
+    def time_of(self, tick):
+        """Return the moment at which a tick starts"""
+        return self.origin + tick * self.tick
+
+    def schedule(self, deadline, callback, *args):
+        """Add a timer calling callback(*args) once deadline has passed, and return it"""
+        # The first tick that starts at or after the deadline, so timers
+        # never fire early; one already due fires on the next tick
+        tick = -int((self.origin - deadline) // self.tick)
+        timer = Timer(deadline, callback, args, max(tick, self.current + 1))
+        self._place(timer)
+        return timer
+
+    def cancel(self, timer):
+        """Remove a pending timer; return False if it already fired or was cancelled"""
+        slot = timer._slot
+        if slot is None:
+            return False
+        level, timers = slot
+        timers.discard(timer)
+        self._counts[level] -= 1
+        timer._slot = None
+        return True
+
+    def _place(self, timer):
+        delta = timer.tick - self.current
+        level = 0
+        while level < self.levels - 1 and delta >= self._spans[level + 1]:
+            level += 1
+        timers = self._wheels[level][(timer.tick // self._spans[level]) % self.slots]
+        timers.add(timer)
+        self._counts[level] += 1
+        timer._slot = (level, timers)
+
+    def _cascade(self, tick):
+        """Move the timers of coarser slots that begin at tick one level down"""
+        for level in range(1, self.levels):
+            span = self._spans[level]
+            if tick % span:
+                return
+            timers = self._wheels[level][(tick // span) % self.slots]
+            if timers:
+                moved = list(timers)
+                timers.clear()
+                self._counts[level] -= len(moved)
+                for timer in moved:
+                    self._place(timer)
+
+    def advance(self, now):
+        """Process every tick up to now and return the timers that are due, in order"""
+        target = self.tick_at(now)
+        due = []
+        while self.current < target:
+            level = self._lowest_level()
+            if level is None:
+                self.current = target
+                break
+            if level > 0:
+                # Nothing can happen before the next cascade of that level
+                span = self._spans[level]
+                self.current = max(self.current, min(target, (self.current // span + 1) * span) - 1)
+                if self.current >= target:
+                    break
+            self.current += 1
+            self._cascade(self.current)
+            timers = self._wheels[0][self.current % self.slots]
+            if timers:
+                fired = sorted(timers, key=lambda timer: timer.deadline)
+                timers.clear()
+                self._counts[0] -= len(fired)
+                for timer in fired:
+                    timer._slot = None
+                due.extend(fired)
+        return due
+
+    def _lowest_level(self):
+        for level, count in enumerate(self._counts):
+            if count:
+                return level
+        return None
+
+    def next_tick(self):
+        """Return the next tick at which advance() has work to do, or None"""
+        # The next cascade of the finest coarse level holding timers comes
+        # before (or with) that of any coarser one
+        cascade = None
+        for level in range(1, self.levels):
+            if self._counts[level]:
+                span = self._spans[level]
+                cascade = (self.current // span + 1) * span
+                break
+        if self._counts[0]:
+            # Level 0 only holds timers due within the next SLOTS ticks
+            for tick in range(self.current + 1, self.current + self.slots + 1):
+                if cascade is not None and tick >= cascade:
+                    break
+                if self._wheels[0][tick % self.slots]:
+                    return tick
+        return cascade
+
+
+class TimerThread:
+    """
+    Background thread firing the timers of a TimerWheel.
+
+    Callbacks run on the timer thread, one at a time and outside the lock,
+    so they may schedule or cancel timers themselves; pass them through a
+    dispatch function to run them elsewhere.
+    """
+
+    def __init__(self, clock=time.time, tick=TICK):
+        self.clock = clock
+        self.wheel = TimerWheel(clock(), tick)
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def __len__(self):
+        with self._condition:
+            return len(self.wheel)
+
+    def start(self):
+        """Start the timer thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="timer-wheel", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the timer thread; pending timers do not fire"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def schedule(self, deadline, callback, *args):
+        """Call callback(*args) on the timer thread once deadline has passed"""
+        with self._condition:
+            timer = self.wheel.schedule(deadline, callback, *args)
+            # The thread may be sleeping past the new timer's tick
+            self._condition.notify()
+        return timer
+
+    def cancel(self, timer):
+        """Cancel a pending timer; return False if it already fired"""
+        with self._condition:
+            return self.wheel.cancel(timer)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                due = self.wheel.advance(self.clock())
+                if not due:
+                    timeout = MAX_SLEEP
+                    tick = self.wheel.next_tick()
+                    if tick is not None:
+                        timeout = min(timeout, self.wheel.time_of(tick) - self.clock())
+                    if timeout > 0:
+                        self._condition.wait(timeout)
+                    continue
+
+            for timer in due:
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    print(f"Timer callback failed: {e}", file=sys.stderr)
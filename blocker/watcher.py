@@ -0,0 +1,162 @@
+"""
+Hosts file change watcher.
+
+Other tools rewrite the hosts file too: package upgrades, network managers,
+VPN clients or the user in an editor. HostsWatcher notices within
+milliseconds so the engine can put back whatever went missing from the
+managed section.
+
+On Linux it uses inotify (through ctypes, so nothing needs installing) on
+the directory holding the file, because atomic replacements swap the
+file's inode and a watch on the file itself would be lost. Elsewhere, or
+when inotify is unavailable, it polls the file's size, mtime and inode once
+a second; the contents are never rescanned unless they changed. Bursts of
+events, as editors write in several steps, are coalesced into one callback.
+"""
+
+import os
+import select
+import struct
+import sys
+import threading
+
+# Seconds between stat() calls when polling
+POLL_INTERVAL = 1.0
+# Seconds without further events before a burst is reported
+SETTLE_DELAY = 0.02
+
+METHOD_INOTIFY = "inotify"
+METHOD_POLLING = "polling"
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+               IN_MOVED_TO | IN_CREATE | IN_DELETE)
+_EVENT = struct.Struct("iIII")
+
+
+def _inotify_watch(directory):
+    """Return an inotify descriptor watching directory, or None if unavailable"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(directory), _WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+    except (OSError, AttributeError):
+        return None
+    return fd
+
+
+def _stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+class HostsWatcher:
+    """
+    Background thread calling on_change() whenever the watched file changes.
+
+    Changes made by the caller itself are reported too; the engine tells
+    them apart by comparing the file with its SectionIndex.
+    """
+
+    def __init__(self, path, on_change, poll_interval=POLL_INTERVAL):
+        self.path = os.path.abspath(path)
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.method = None
+        self._inotify = None
+        self._wake_read = self._wake_write = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start watching, with inotify when possible"""
+        self._inotify = _inotify_watch(os.path.dirname(self.path))
+        if self._inotify is not None:
+            self.method = METHOD_INOTIFY
+            self._wake_read, self._wake_write = os.pipe()
+            target = self._run_inotify
+        else:
+            self.method = METHOD_POLLING
+            target = self._run_polling
+        self._thread = threading.Thread(target=target, name="hosts-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop watching"""
+        self._stop.set()
+        if self._wake_write is not None:
+            os.write(self._wake_write, b"x")
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._inotify, self._wake_read, self._wake_write):
+            if fd is not None:
+                os.close(fd)
+        self._inotify = self._wake_read = self._wake_write = None
+
+    def _notify(self):
+        try:
+            self.on_change()
+        except Exception as e:
+            print(f"Hosts watcher callback failed: {e}", file=sys.stderr)
+
+    def _read_events(self):
+        """Return True if the pending inotify events concern the watched file"""
+        name = os.fsencode(os.path.basename(self.path))
+        relevant = False
+        while True:
+            try:
+                data = os.read(self._inotify, 65536)
+            except BlockingIOError:
+                return relevant
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                if data[offset:offset + length].rstrip(b"\0") == name:
+                    relevant = True
+                offset += length
+
+    def _run_inotify(self):
+        pending = False
+        while not self._stop.is_set():
+            timeout = SETTLE_DELAY if pending else None
+            ready, _, _ = select.select([self._inotify, self._wake_read], [], [], timeout)
+            if self._wake_read in ready:
+                return
+            if self._inotify in ready:
+                pending = self._read_events() or pending
+            elif pending:
+                # The burst is over
+                pending = False
+                self._notify()
+
+    def _run_polling(self):
+        stamp = _stamp(self.path)
+        while not self._stop.wait(self.poll_interval):
+            current = _stamp(self.path)
+            if current != stamp:
+                stamp = current
+                self._notify()
@@ -0,0 +1,99 @@
+"""
+Compiled weekly schedule index.
+
+Schedules are stored as {'start_time': 'HH:MM', 'end_time': 'HH:MM',
+'days': [...]} entries. WeeklyIndex compiles any number of them into a
+sorted list of merged, non-overlapping intervals over the minutes of the
+week, so "is blocking scheduled now?" is a binary search and the next
+start/stop transition is read straight off the interval bounds.
+
+The end minute is inclusive (09:00-17:00 blocks until 17:00:59). A span
+whose end is before its start runs overnight into the following day, so
+22:00-02:00 on Friday covers Friday night and early Saturday. Spans on
+consecutive days that touch are merged, which is how multi-day blocks
+are expressed.
+"""
+
+from bisect import bisect_right
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def parse_minutes(hhmm):
+    """Convert 'HH:MM' into minutes after midnight"""
+    hours, minutes = hhmm.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def minute_of_week(moment):
+    """Return the minute of the week (Monday 00:00 is 0) for a datetime"""
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+
+def schedule_intervals(schedule):
+    """Yield the half-open (start, end) minute-of-week intervals of one schedule"""
+    start = parse_minutes(schedule['start_time'])
+    end = parse_minutes(schedule['end_time']) + 1
+    if end <= start:
+        end += MINUTES_PER_DAY  # overnight span
+    for day in schedule['days']:
+        offset = WEEKDAYS.index(day) * MINUTES_PER_DAY
+        first, last = offset + start, offset + end
+        if last <= MINUTES_PER_WEEK:
+            yield first, last
+        else:
+            # Sunday night running into Monday morning wraps around the week
+            yield first, MINUTES_PER_WEEK
+            yield 0, last - MINUTES_PER_WEEK
+
+
+def merge_intervals(intervals):
+    """Sort and merge overlapping or touching half-open intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [tuple(interval) for interval in merged]
+
+
+class WeeklyIndex:
+    """Merged interval index of a set of weekly schedules"""
+
+    __slots__ = ('intervals', '_starts')
+
+    def __init__(self, schedules=()):
+        intervals = []
+        for schedule in schedules:
+            intervals.extend(schedule_intervals(schedule))
+        self.intervals = merge_intervals(intervals)
+        self._starts = [start for start, _ in self.intervals]
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def covers(self, minute):
+        """Return True if the given minute of the week is scheduled"""
+        position = bisect_right(self._starts, minute) - 1
+        return position >= 0 and minute < self.intervals[position][1]
+
+    def is_active(self, moment):
+        """Return True if blocking is scheduled at the given datetime"""
+        return self.covers(minute_of_week(moment))
+
+    def boundaries(self):
+        """Return the minutes of the week at which the scheduled state changes"""
+        boundaries = set()
+        for start, end in self.intervals:
+            boundaries.add(start)
+            boundaries.add(end % MINUTES_PER_WEEK)
+        # An interval ending at the end of the week continues into one
+        # starting on Monday 00:00, so that instant is not a transition
+        if self.intervals and self.intervals[0][0] == 0 and self.intervals[-1][1] == MINUTES_PER_WEEK:
+            boundaries.discard(0)
+        return boundaries
@@ -0,0 +1,129 @@
+"""
+Wildcard subdomain rules.
+
+A rule such as ``*.example.com`` blocks example.com and every subdomain of
+it. Hosts files can not express wildcards, so at apply time the rules are
+expanded against a local corpus of known hostnames (one per line, in any
+format the importer understands).
+
+Rules are kept in a trie keyed by reversed labels (com -> example -> cdn),
+so rules sharing a suffix share nodes, and matching a hostname costs one
+dict lookup per label no matter how many rules exist.
+"""
+
+import sys
+
+WILDCARD_PREFIX = "*."
+
+# Key marking a node as the end of a rule; can never collide with a label
+_TERMINAL = ""
+
+
+def is_wildcard(site):
+    """Return True if a blocklist entry is a wildcard rule"""
+    return site.startswith(WILDCARD_PREFIX)
+
+
+class SuffixTrie:
+    """Reversed-label trie of wildcard rule suffixes"""
+
+    __slots__ = ('_root', '_size')
+
+    def __init__(self, suffixes=()):
+        self._root = {}
+        self._size = 0
+        for suffix in suffixes:
+            self.add(suffix)
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def __contains__(self, hostname):
+        return self.matches(hostname)
+
+    def add(self, suffix):
+        """Add a domain suffix, returning False if it was already present"""
+        node = self._root
+        for label in reversed(suffix.lower().split('.')):
+            child = node.get(label)
+            if child is None:
+                child = node[sys.intern(label)] = {}
+            node = child
+        if _TERMINAL in node:
+            return False
+        node[_TERMINAL] = True
+        self._size += 1
+        return True
+
+    def matches(self, hostname):
+        """Return True if hostname equals or is a subdomain of any suffix"""
+        node = self._root
+        for label in reversed(hostname.lower().split('.')):
+            node = node.get(label)
+            if node is None:
+                return False
+            if _TERMINAL in node:
+                return True
+        return False
+
+
+def iter_corpus(path):
+    """Yield hostnames from a corpus file, streaming it line by line"""
+    from .normalize import parse_line
+
+    try:
+        file = open(path, 'r', encoding='utf-8', errors='replace')
+    except FileNotFoundError:
+        return
+    with file:
+        for line in file:
+            for hostname in parse_line(line) or ():
+                yield hostname.lower()
+
+
+def expand_sites(sites, corpus=()):
+    """
+    Yield every hostname to block for the given blocklist entries.
+
+    Plain sites produce the site and its www. variant. Wildcard rules
+    produce the same for their base domain, plus every corpus hostname that
+    falls under one of the rules. The corpus is only consumed when at least
+    one wildcard rule is present. Output may contain duplicates.
+    """
+    trie = SuffixTrie()
+    for site in sites:
+        if is_wildcard(site):
+            site = site[len(WILDCARD_PREFIX):]
+            trie.add(site)
+        yield site
+        yield f"www.{site}"
+
+    if trie:
+        matches = trie.matches
+        for hostname in corpus:
+            if matches(hostname):
+                yield hostname
+
+
+def blocklist_matches(sites, hostname):
+    """
+    Return True if hostname is blocked by the entries in sites.
+
+    sites only needs to support ``in``; the check costs one lookup per label
+    of hostname, which lets the DNS sinkhole consult the live blocklist on
+    every query. Semantics match expand_sites without needing a corpus.
+    """
+    hostname = hostname.lower().rstrip('.')
+    if hostname in sites:
+        return True
+    if hostname.startswith('www.') and hostname[4:] in sites:
+        return True
+    suffix = hostname
+    while suffix:
+        if WILDCARD_PREFIX + suffix in sites:
+            return True
+        _, _, suffix = suffix.partition('.')
+    return False
@@ -0,0 +1,101 @@
+"""
+Background worker that owns the engine.
+
+Starting or stopping blocking on a large list rewrites megabytes of hosts
+file, which must not happen inside a Tk callback. HostsWorker runs every
+engine operation that touches the hosts file or the blocklist on a single
+thread, one job at a time in submission order, so the engine is never
+used from two threads at once.
+
+The worker never calls back into the GUI directly. Progress messages and
+job results are put on an event queue which the GUI drains from its own
+thread with process_events(), typically from a short root.after() poll.
+"""
+
+import queue
+import sys
+import threading
+
+# Sentinel that tells the worker thread to exit
+_STOP = object()
+
+
+class HostsWorker:
+    """Single thread running queued engine jobs and posting their events"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.events = queue.Queue()
+        self.on_progress = None
+        self.on_idle = None
+        self.current = None
+        self._jobs = queue.Queue()
+        self._closed = False
+        engine.progress = self._progress
+        self._thread = threading.Thread(target=self._run, name="hosts-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, name=None, on_done=None, on_error=None):
+        """
+        Queue func(*args) to run on the worker thread.
+
+        on_done(result) or on_error(exception) is posted as an event when it
+        finishes. Errors without an on_error handler are printed. Returns
+        False if the worker has been closed.
+        """
+        if self._closed:
+            return False
+        self._jobs.put((name or getattr(func, '__name__', 'job'), func, args, on_done, on_error))
+        return True
+
+    def post(self, callback, *args):
+        """Queue callback(*args) to run on the thread that processes events"""
+        self.events.put((callback, args))
+
+    def process_events(self, limit=100):
+        """Run up to limit queued event callbacks; call this from the GUI thread"""
+        for _ in range(limit):
+            try:
+                callback, args = self.events.get_nowait()
+            except queue.Empty:
+                return
+            callback(*args)
+
+    @property
+    def busy(self):
+        """True while a job is running or waiting"""
+        return self.current is not None or not self._jobs.empty()
+
+    def close(self, timeout=None):
+        """Finish the queued jobs and stop the worker thread"""
+        if not self._closed:
+            self._closed = True
+            self._jobs.put(_STOP)
+        self._thread.join(timeout)
+        self.engine.progress = None
+
+    def _progress(self, message):
+        if self.on_progress is not None:
+            self.post(self.on_progress, self.current, message)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is _STOP:
+                return
+            name, func, args, on_done, on_error = job
+            self.current = name
+            try:
+                result = func(*args)
+            except Exception as e:
+                if on_error is not None:
+                    self.post(on_error, e)
+                else:
+                    print(f"Error in {name}: {e}", file=sys.stderr)
+            else:
+                if on_done is not None:
+                    self.post(on_done, result)
+            finally:
+                self.current = None
+            if self._jobs.empty() and self.on_idle is not None:
+                self.post(self.on_idle)
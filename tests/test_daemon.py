@@ -0,0 +1,139 @@
+"""
+Blocker daemon: socket permissions and who may change state.
+"""
+
+import json
+import os
+import socket
+import stat
+
+import pytest
+
+import blocker.daemon
+from blocker.daemon import BlockerDaemon, DaemonClient, connect, peer_credentials
+from blocker.engine import BlockerEngine
+from blocker.hosts import DEFAULT_RENDER
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="needs Unix domain sockets")
+
+STRANGER = (1, 54321, 54321)
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    monkeypatch.setenv("DISABLE_DNS_FLUSH", "1")
+    hosts = tmp_path / "hosts"
+    hosts.write_text("127.0.0.1 localhost\n")
+    engine = BlockerEngine(str(tmp_path / "blocker_config.json"), hosts_path=str(hosts),
+                           backup_path=str(tmp_path / "hosts_backup.txt"))
+    engine.render_cache = None
+    daemon = BlockerDaemon(engine, path=str(tmp_path / "blocker.sock")).start()
+    yield daemon
+    daemon.close()
+
+
+def test_socket_is_private_by_default(daemon):
+    assert stat.S_IMODE(os.stat(daemon.path).st_mode) == 0o600
+
+
+def test_owner_may_change_state(daemon):
+    client = DaemonClient(daemon.path)
+    try:
+        assert client.call('add_website', "example.com") == "example.com"
+    finally:
+        client.close()
+    assert "example.com" in daemon.engine.blocked_sites
+
+
+@pytest.mark.skipif(not hasattr(socket, 'SO_PEERCRED'), reason="needs SO_PEERCRED")
+def test_peer_credentials_identify_the_client(daemon):
+    client = DaemonClient(daemon.path).connect()
+    try:
+        _, uid, gid = peer_credentials(client._socket)
+    finally:
+        client.close()
+    assert (uid, gid) == (os.getuid(), os.getgid())
+
+
+def test_other_users_may_only_query(daemon):
+    response = daemon.handle('add_website', ["example.com"], {}, STRANGER)
+    assert response['error']['type'] == 'PermissionError'
+    assert "example.com" not in daemon.engine.blocked_sites
+
+    assert 'result' in daemon.handle('state', [], {}, STRANGER)
+
+
+def test_remote_properties_never_wait_on_the_socket(daemon):
+    engine = connect(daemon.path)
+    try:
+        assert len(engine.blocked_sites) == 0
+        engine.add_website("example.com")
+        engine.start_blocking()
+
+        def unreachable(*args, **kwargs):
+            raise AssertionError("property read went to the daemon")
+
+        call, engine.client.call = engine.client.call, unreachable
+        assert engine.is_blocking
+        assert "example.com" in engine.blocked_sites
+        assert engine.focus_sessions == {}
+        engine.client.call = call
+    finally:
+        engine.close()
+
+
+def test_blocklists_are_imported_in_chunks(daemon, tmp_path, monkeypatch):
+    monkeypatch.setattr(blocker.daemon, 'IMPORT_CHUNK_LINES', 3)
+    blocklist = tmp_path / "list.txt"
+    blocklist.write_text("# ads\n0.0.0.0 a.com\n||b.com^\nc.com\na.com\nnot a domain\nd.com\r\n")
+    chunks = []
+    engine = connect(daemon.path)
+    call = engine.client.call
+
+    def recording(method, *args, **kwargs):
+        if method == 'import_lines':
+            chunks.append(args[0])
+        return call(method, *args, **kwargs)
+
+    engine.client.call = recording
+    try:
+        report = engine.import_blocklist(str(blocklist))
+    finally:
+        engine.close()
+
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert chunks[-1] == ["d.com"]
+    assert report[:4] == (7, 4, 1, 1)
+    assert set(daemon.engine.blocked_sites) == {"a.com", "b.com", "c.com", "d.com"}
+
+
+@pytest.mark.parametrize("changes, allowed", [
+    ({'address': "0.0.0.0"}, True),
+    ({'address': "127.0.0.2"}, True),
+    ({'address6': "::1"}, True),
+    ({'address6': "::"}, True),
+    ({'address': "192.0.2.10"}, False),
+    ({'address6': "2001:db8::1"}, False),
+])
+def test_remote_sink_addresses_must_stay_local(daemon, changes, allowed):
+    response = daemon.handle('set_render_options', [], changes)
+    if allowed:
+        assert 'result' in response
+    else:
+        assert response['error']['type'] == 'PermissionError'
+        assert daemon.engine.render_options == DEFAULT_RENDER
+
+
+@pytest.mark.parametrize("line", [b"[1, 2]", b'"ping"', b"not json",
+                                  b'{"method": "ping", "args": {}}', b'{"method": "ping", "kwargs": []}'])
+def test_malformed_requests_get_an_answer(daemon, line):
+    client = DaemonClient(daemon.path).connect()
+    try:
+        client._socket.sendall(line + b"\n")
+        response = json.loads(client._file.readline())
+        assert response['error']['type'] == 'DaemonError'
+        assert response['error']['message'].startswith("Bad request")
+        # The connection stays usable
+        assert client.call('ping')['pid'] == os.getpid()
+    finally:
+        client.close()
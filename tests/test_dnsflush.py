@@ -0,0 +1,50 @@
+"""
+DNS flush method detection.
+"""
+
+import shutil
+import subprocess
+
+import pytest
+
+from blocker import dnsflush
+
+
+@pytest.fixture
+def host(monkeypatch):
+    """A Linux host where every command is installed and only the listed services run"""
+    state = {'running': set(), 'commands': []}
+
+    def run(command, **kwargs):
+        state['commands'].append(command)
+        if command[0] in ("systemctl", "pidof"):
+            return subprocess.CompletedProcess(command, 0 if command[-1] in state['running'] else 1)
+        return subprocess.CompletedProcess(command, 0)
+
+    monkeypatch.delenv("DISABLE_DNS_FLUSH", raising=False)
+    monkeypatch.setattr(dnsflush.platform, "system", lambda: "Linux")
+    monkeypatch.setattr(shutil, "which", lambda name: f"/usr/bin/{name}")
+    monkeypatch.setattr(subprocess, "run", run)
+    monkeypatch.setattr(dnsflush, "_detected", None)
+    return state
+
+
+def test_installed_but_stopped_cache_is_not_chosen(host):
+    host['running'] = {"nscd"}
+
+    assert dnsflush.flush_dns().method == "nscd"
+
+    host['running'] = set()
+    dnsflush._detected = None
+    result = dnsflush.flush_dns()
+    assert result.method == dnsflush.NO_CACHE
+    assert ["killall", "-HUP", "dnsmasq"] not in host['commands']
+
+
+def test_no_cache_is_probed_again(host, monkeypatch):
+    assert dnsflush.flush_dns().method == dnsflush.NO_CACHE
+    host['running'] = {"dnsmasq"}
+    assert dnsflush.flush_dns().method == dnsflush.NO_CACHE
+
+    monkeypatch.setattr(dnsflush, "REPROBE_INTERVAL", 0.0)
+    assert dnsflush.flush_dns().method == "dnsmasq"
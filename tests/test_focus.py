@@ -0,0 +1,72 @@
+"""
+Focus sessions: ids and the active set.
+"""
+
+import json
+import time
+
+from blocker.engine import BlockerEngine
+
+
+def make_engine(tmp_path):
+    hosts = tmp_path / "hosts"
+    if not hosts.exists():
+        hosts.write_text("127.0.0.1 localhost\n")
+    engine = BlockerEngine(str(tmp_path / "blocker_config.json"), hosts_path=str(hosts),
+                           backup_path=str(tmp_path / "hosts_backup.txt"))
+    engine.render_cache = None
+    return engine
+
+
+def test_ids_are_never_reused(tmp_path, monkeypatch):
+    monkeypatch.setenv("DISABLE_DNS_FLUSH", "1")
+    engine = make_engine(tmp_path)
+    first = engine.start_focus(25, ["a.com"])
+    second = engine.start_focus(25, ["b.com"])
+    engine.cancel_focus(second.id)
+
+    assert engine.start_focus(25, ["c.com"]).id == second.id + 1
+
+    engine.cancel_focus(first.id)
+    engine.cancel_focus(second.id + 1)
+    engine.close()
+    assert make_engine(tmp_path).start_focus(25, ["d.com"]).id == second.id + 2
+
+
+def test_active_set_is_replaced_not_mutated(tmp_path, monkeypatch):
+    monkeypatch.setenv("DISABLE_DNS_FLUSH", "1")
+    engine = make_engine(tmp_path)
+    before = engine.active_focus
+    session = engine.start_focus(25, ["a.com"])
+    during = engine.active_focus
+    engine.cancel_focus(session.id)
+
+    assert isinstance(during, frozenset)
+    assert before == frozenset() and during == {session.id}
+    assert engine.active_focus == frozenset()
+
+
+def test_bad_stored_sessions_are_skipped(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("DISABLE_DNS_FLUSH", "1")
+    good = {'id': 3, 'started': time.time(), 'work': 600, 'rest': 0, 'cycles': 1, 'sites': ["a.com"]}
+    config = {
+        'blocked_sites': ["keep1.com", "keep2.com"],
+        'focus_sessions': [
+            {'started': time.time(), 'work': 60},
+            {'id': 1, 'started': time.time(), 'work': "60"},
+            {'id': 2, 'started': time.time(), 'work': 60, 'cycles': 0},
+            {'id': 4, 'started': time.time(), 'work': 60, 'sites': "a.com"},
+            "not a session",
+            good,
+        ],
+    }
+    (tmp_path / "blocker_config.json").write_text(json.dumps(config))
+
+    engine = make_engine(tmp_path)
+    engine.add_website("new.com")
+
+    assert list(engine.focus_sessions) == [3]
+    assert engine.active_focus == {3}
+    assert engine.focus_next_id == 4
+    assert engine.config_dict()['blocked_sites'] == ["keep1.com", "keep2.com", "new.com"]
+    assert capsys.readouterr().err.count("Skipping focus session") == 5
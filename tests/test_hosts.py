@@ -0,0 +1,87 @@
+"""
+Managed hosts section: patching and repair.
+"""
+
+import os
+import stat
+
+from blocker.engine import BlockerEngine
+from blocker.hosts import BEGIN_MARKER, END_MARKER, read_hosts
+
+
+def section_names(path):
+    content = read_hosts(path)
+    section = content.split(BEGIN_MARKER + "\n")[1].split(END_MARKER)[0]
+    return {name for line in section.splitlines() if not line.startswith("#") for name in line.split()[1:]}
+
+
+def make_engine(tmp_path, sites):
+    hosts = tmp_path / "hosts"
+    hosts.write_text("127.0.0.1 localhost\n")
+    engine = BlockerEngine(str(tmp_path / "blocker_config.json"), hosts_path=str(hosts),
+                           backup_path=str(tmp_path / "hosts_backup.txt"))
+    engine.render_cache = None
+    engine.add_websites(sites)
+    engine.start_blocking()
+    return engine, str(hosts)
+
+
+def test_patch_replaces_the_file_atomically(tmp_path, monkeypatch):
+    monkeypatch.setenv("DISABLE_DNS_FLUSH", "1")
+    engine, hosts = make_engine(tmp_path, ["a.com", "b.com"])
+    inode = os.stat(hosts).st_ino
+
+    engine.add_website("c.com")
+    engine.remove_website("a.com")
+
+    # A rename, not a write into the live file
+    assert os.stat(hosts).st_ino != inode
+    assert section_names(hosts) == {"b.com", "www.b.com", "c.com", "www.c.com"}
+    assert read_hosts(hosts).startswith("127.0.0.1 localhost\n")
+    assert engine._section_index.is_current()
+
+
+def test_repair_restores_removed_entries(tmp_path, monkeypatch):
+    monkeypatch.setenv("DISABLE_DNS_FLUSH", "1")
+    engine, hosts = make_engine(tmp_path, ["a.com", "b.com"])
+    with open(hosts) as file:
+        content = file.read()
+    with open(hosts, "w") as file:
+        file.write(content.replace("127.0.0.1 www.b.com\n", ""))
+
+    repair = engine.repair_hosts()
+
+    assert repair.restored == 1
+    assert section_names(hosts) == {"a.com", "www.a.com", "b.com", "www.b.com"}
+
+
+def test_repair_recreates_a_deleted_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("DISABLE_DNS_FLUSH", "1")
+    engine, hosts = make_engine(tmp_path, ["a.com"])
+    os.remove(hosts)
+
+    repair = engine.repair_hosts()
+
+    assert repair is not None
+    assert section_names(hosts) == {"a.com", "www.a.com"}
+    assert stat.S_IMODE(os.stat(hosts).st_mode) == 0o644
+    assert engine._section_index.is_current()
+
+    os.remove(hosts)
+    engine.stop_blocking()
+    assert not os.path.exists(hosts)
+
+
+def test_bulk_remove_reports_invalid_inputs(tmp_path, monkeypatch):
+    monkeypatch.setenv("DISABLE_DNS_FLUSH", "1")
+    engine, hosts = make_engine(tmp_path, ["a.com", "b.com"])
+    patched = []
+    apply_delta = engine.apply_delta
+    engine.apply_delta = lambda **delta: patched.append(delta) or apply_delta(**delta)
+
+    result = engine.remove_websites(["a.com", "not a domain!!", "", "c.com", "A.com"])
+
+    # Blank inputs are skipped, as by add_websites
+    assert tuple(result) == (1, 2, 1)
+    assert patched == [{'removed_sites': ["a.com"]}]
+    assert section_names(hosts) == {"b.com", "www.b.com"}
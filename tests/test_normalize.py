@@ -0,0 +1,102 @@
+"""
+Domain normalization: the batch and per-item paths, and IDN handling.
+"""
+
+import random
+
+import pytest
+
+from blocker.normalize import (
+    INVALID_IDN,
+    normalize_batch,
+    normalize_hostname,
+    normalize_many,
+)
+
+PIECES = [
+    "", "a.com", "www.", "WWW.", "b.example.org", "http://", "HTTPS://", "ftp+x://", "x://", "://",
+    "u@", "u:p@", "a@b@", "@", "@@", "||", "|", "^", ":80", ":", ":x", "/", "/p?q=1", "?q", "#", "#c",
+    "\\", ".", "..", " ", "\t", "0.0.0.0 ", "127.0.0.1\t", "1.2.3.4 ", "!", "[", "*.", "-", "_",
+    "localhost", "localhost.localdomain", "bücher", "xn--bcher-kva", "ß", ".de", "\u3002", "K",
+]
+
+
+def per_item(lines):
+    accepted, rejected = [], []
+    for result in normalize_many(lines):
+        if result.reason is None:
+            accepted.append(result.hostname)
+        else:
+            rejected.append(result)
+    return accepted, rejected
+
+
+def batch(lines):
+    accepted, rejected = [], []
+    for result in normalize_batch(lines):
+        accepted.extend(result.accepted)
+        rejected.extend(result.rejected)
+    return accepted, rejected
+
+
+@pytest.mark.parametrize('lines', [
+    ["||u@abab.co", "||u@abab.co^", "@@a.com", "@@a.com^", "!u@a.com", "[u@a.com", "#u@a.com"],
+    ["0.0.0.0 ||a.com^", "0.0.0.0 a.com b.com", "0.0.0.0 #a.com", "0.0.0.0 a.com#x", "a.com # x"],
+    ["x.com/http://y.org", "http://a.com/x://b.org", "a.com:80", "a.com:", "a.com:80:90", "a.com..", ""],
+    ["www.www.a.com", "www.com", "LOCALHOST.localdomain.", "0.0.0.0 localhost.localdomain", "||a.com ^"],
+])
+def test_batch_agrees_with_per_item(lines):
+    assert batch(lines) == per_item([line.strip() for line in lines])
+
+
+def test_batch_agrees_with_per_item_on_random_lines():
+    rng = random.Random(0)
+    lines = ["".join(rng.choice(PIECES) for _ in range(rng.randint(1, 6))) for _ in range(20000)]
+    lines = [line.strip() for line in lines]
+    assert batch(lines) == per_item(lines)
+
+
+def test_only_a_leading_scheme_is_stripped():
+    assert normalize_hostname("x.com/http://y.org") == ("x.com", None)
+    assert normalize_hostname("HTTPS://y.org/") == ("y.org", None)
+
+
+@pytest.mark.parametrize('name, expected', [
+    ("faß.de", "xn--fa-hia.de"),
+    ("Bücher.Example", "xn--bcher-kva.example"),
+    ("пример\u3002рф", "xn--e1afmkfd.xn--p1ai"),
+    ("ＥＸＡＭＰＬＥ.com", "example.com"),
+])
+def test_internationalized_names_follow_uts46(name, expected):
+    pytest.importorskip("idna")
+    assert normalize_hostname(name) == (expected, None)
+
+
+def test_fast_idn_path_matches_idna():
+    idna = pytest.importorskip("idna")
+    rng = random.Random(1)
+    scripts = [(0xe0, 0x17f), (0x3b1, 0x3c9), (0x430, 0x44f), (0x5d0, 0x5ea), (0x627, 0x64a),
+               (0x905, 0x939), (0x300, 0x36f), (0x3041, 0x3096), (0x4e00, 0x9fff), (0xac00, 0xd7a3)]
+    for _ in range(5000):
+        low, high = rng.choice(scripts)
+        label = "".join(chr(rng.randint(low, high)) if rng.random() < 0.8 else rng.choice("ab1-ß")
+                        for _ in range(rng.randint(1, 15)))
+        name = label + ".com"
+        try:
+            expected = (idna.encode(name, uts46=True, transitional=False).decode('ascii'), None)
+        except idna.IDNAError:
+            expected = None
+        hostname, reason = normalize_hostname(name)
+        if expected is None:
+            assert reason is not None
+        else:
+            assert (hostname, reason) == expected
+    assert normalize_hostname("\u0301a.com")[1] == INVALID_IDN
+
+
+def test_without_idna_deviations_are_refused(monkeypatch):
+    from blocker import normalize
+
+    monkeypatch.setattr(normalize, '_idna', False)
+    assert normalize_hostname("bücher.example") == ("xn--bcher-kva.example", None)
+    assert normalize_hostname("faß.de")[1] == normalize.IDN_UNSUPPORTED
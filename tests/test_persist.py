@@ -0,0 +1,66 @@
+"""
+Background configuration writer.
+"""
+
+import json
+
+from blocker import persist
+from blocker.engine import BlockerEngine
+from blocker.persist import ConfigWriter
+
+
+class FlakyDisk:
+    """write() stand-in that fails a given number of times"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.files = {}
+        self.order = []
+
+    def write(self, path, data):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        self.files[path] = data
+        self.order.append(path)
+
+
+def test_failed_write_is_retried(monkeypatch, capsys):
+    monkeypatch.setattr(persist, 'RETRY_DELAY', 0.0)
+    disk = FlakyDisk(failures=1)
+    writer = ConfigWriter(delay=0.0, write=disk.write)
+    writer.mark_dirty([("config", b"1")])
+
+    assert not writer.flush()
+    assert writer.pending
+    assert writer.flush()
+    assert disk.files == {"config": b"1"}
+    assert "disk full" in capsys.readouterr().err
+    writer.close()
+
+
+def test_retry_keeps_newer_data_and_write_order(monkeypatch):
+    monkeypatch.setattr(persist, 'RETRY_DELAY', 60.0)
+    disk = FlakyDisk(failures=1)
+    writer = ConfigWriter(delay=60.0, write=disk.write)
+    writer.mark_dirty([("snapshot", b"old"), ("config", b"old")])
+    writer.flush()
+    writer.mark_dirty([("config", b"new")])
+    writer.close()
+
+    assert disk.files == {"snapshot": b"old", "config": b"new"}
+    assert disk.order == ["snapshot", "config"]
+
+
+def test_engine_hands_over_serialized_state(tmp_path):
+    config_file = tmp_path / "blocker_config.json"
+    engine = BlockerEngine(str(config_file), hosts_path=str(tmp_path / "hosts"),
+                           backup_path=str(tmp_path / "hosts_backup.txt"), background_save=True)
+    engine._writer.delay = engine._writer.max_delay = 60.0
+    engine.add_websites(["a.com"])
+    # Edits made behind the engine's back after the save are not picked up
+    engine.blocked_sites.add("sneaky.com")
+    engine.flush_config()
+
+    assert json.loads(config_file.read_text())['blocked_sites'] == ["a.com"]
+    engine.close()
@@ -0,0 +1,23 @@
+"""
+Render cache location.
+"""
+
+import os
+
+from blocker.engine import BlockerEngine
+
+
+def test_cache_lives_next_to_the_config(tmp_path, monkeypatch):
+    monkeypatch.setenv("DISABLE_DNS_FLUSH", "1")
+    elsewhere = tmp_path / "cwd"
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+    hosts = tmp_path / "hosts"
+    hosts.write_text("127.0.0.1 localhost\n")
+    engine = BlockerEngine(str(tmp_path / "conf" / "blocker_config.json"), hosts_path=str(hosts),
+                           backup_path=str(tmp_path / "hosts_backup.txt"))
+    engine.add_websites(["example.com"])
+    engine.start_blocking()
+
+    assert os.listdir(tmp_path / "conf" / "render_cache")
+    assert os.listdir(elsewhere) == []
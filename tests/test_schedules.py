@@ -0,0 +1,112 @@
+"""
+Schedule and site group validation when loading and importing configurations.
+"""
+
+import json
+import threading
+
+import pytest
+
+from blocker import scheduler
+from blocker.engine import BlockerEngine, InvalidScheduleError
+from blocker.scheduler import Scheduler
+
+GOOD = {'start_time': '09:00', 'end_time': '17:00', 'days': ['Monday']}
+MALFORMED = [
+    {'start_time': '9', 'end_time': '17:00', 'days': ['Monday']},
+    {'start_time': '09:00', 'end_time': '17:00', 'days': ['Funday']},
+    {'start_time': '09:00', 'end_time': '17:00', 'days': 'Monday'},
+    {'start_time': 900, 'end_time': '17:00', 'days': ['Monday']},
+    {'start_time': '09:00', 'days': ['Monday']},
+    'Monday 09:00',
+]
+
+
+def make_engine(tmp_path, **config):
+    config_file = tmp_path / "blocker_config.json"
+    config.setdefault('blocked_sites', [])
+    config_file.write_text(json.dumps(config))
+    return BlockerEngine(str(config_file), hosts_path=str(tmp_path / "hosts"),
+                         backup_path=str(tmp_path / "hosts_backup.txt"))
+
+
+def test_load_skips_malformed_schedules(tmp_path, capsys):
+    engine = make_engine(tmp_path, scheduled_blocks=[GOOD] + MALFORMED,
+                         site_groups={'news': {'sites': ['news.com'], 'schedules': MALFORMED + [GOOD]}})
+
+    assert engine.scheduled_blocks == [GOOD]
+    assert engine.groups['news'].schedules == [GOOD]
+    assert len(engine.timetable().boundaries()) == 2
+    assert capsys.readouterr().err.count("Skipping schedule") == 2 * len(MALFORMED)
+
+
+def test_load_skips_malformed_groups(tmp_path, capsys):
+    engine = make_engine(tmp_path, blocked_sites=['keep1.com', 'keep2.com'], site_groups={
+        'list': ['a.com'],
+        'flag': {'sites': ['b.com'], 'always': 'yes'},
+        'text': {'sites': 'c.com'},
+        'plan': {'schedules': GOOD},
+        'news': {'sites': ['news.com'], 'schedules': [GOOD], 'always': False},
+    })
+
+    assert list(engine.groups) == ['news']
+    assert engine.groups['news'].schedules == [GOOD]
+    assert engine.blocked_sites.to_list() == ['keep1.com', 'keep2.com']
+    assert capsys.readouterr().err.count("Skipping site group") == 4
+
+
+@pytest.mark.parametrize('entry', MALFORMED)
+def test_import_refuses_malformed_schedules(tmp_path, entry):
+    engine = make_engine(tmp_path, blocked_sites=['kept.com'], scheduled_blocks=[GOOD])
+    saved = (tmp_path / "blocker_config.json").read_text()
+
+    with pytest.raises(InvalidScheduleError):
+        engine.import_config_dict({'blocked_sites': ['new.com'], 'scheduled_blocks': [GOOD, entry]})
+
+    assert engine.scheduled_blocks == [GOOD]
+    assert list(engine.blocked_sites) == ['kept.com']
+    assert (tmp_path / "blocker_config.json").read_text() == saved
+
+
+def test_active_groups_are_replaced_not_mutated(tmp_path, monkeypatch):
+    monkeypatch.setenv("DISABLE_DNS_FLUSH", "1")
+    (tmp_path / "hosts").write_text("127.0.0.1 localhost\n")
+    engine = make_engine(tmp_path)
+    engine.render_cache = None
+    engine.create_group('games', always=True)
+    engine.add_group_sites('games', ['game.com'])
+    active = engine.active_groups
+
+    engine.delete_group('games')
+
+    assert active == {'games'} and isinstance(active, frozenset)
+    assert engine.active_groups == frozenset()
+
+
+class ConstantTimetable:
+    def boundaries(self):
+        return set()
+
+    def state_at(self, moment):
+        return frozenset({'games'})
+
+
+def test_failed_transition_is_retried(monkeypatch, capsys):
+    monkeypatch.setattr(scheduler, 'RETRY_DELAY', 0.05)
+    calls = []
+    retried = threading.Event()
+
+    def on_change(state):
+        calls.append(state)
+        if len(calls) == 1:
+            raise PermissionError("hosts file is locked")
+        retried.set()
+
+    runner = Scheduler(ConstantTimetable, on_change).start()
+    try:
+        assert retried.wait(5)
+    finally:
+        runner.stop()
+
+    assert calls == [frozenset({'games'})] * 2
+    assert "hosts file is locked" in capsys.readouterr().err
@@ -0,0 +1,146 @@
+"""
+DNS sinkhole backend, against a stand-in upstream resolver on loopback.
+"""
+
+import json
+import socket
+import struct
+import threading
+
+import pytest
+
+from blocker.engine import BlockerEngine
+from blocker.sinkhole import TYPE_A, TYPE_AAAA
+
+UPSTREAM_ANSWER = "192.0.2.1"
+
+
+class StandInUpstream:
+    """UDP resolver answering every A question with UPSTREAM_ANSWER"""
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.2)
+        self.queries = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def address(self):
+        host, port = self.sock.getsockname()
+        return f"{host}:{port}"
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                data, addr = self.sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            self.queries.append(data)
+            txid, flags = struct.unpack_from("!HH", data)
+            answer = b"\xc0\x0c" + struct.pack("!HHIH", TYPE_A, 1, 60, 4) + socket.inet_aton(UPSTREAM_ANSWER)
+            header = struct.pack("!HHHHHH", txid, 0x8180 | (flags & 0x0100), 1, 1, 0, 0)
+            self.sock.sendto(header + data[12:] + answer, addr)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.sock.close()
+
+
+def query(address, name, qtype=TYPE_A):
+    """Send one question to the sinkhole and return the rdata of the first answer"""
+    question = b"".join(bytes([len(label)]) + label.encode() for label in name.split("."))
+    message = struct.pack("!HHHHHH", 0x1234, 0x0100, 1, 0, 0, 0) + question + b"\0" + struct.pack("!HH", qtype, 1)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(5)
+        sock.sendto(message, address)
+        reply, _ = sock.recvfrom(512)
+    txid, _, _, ancount, _, _ = struct.unpack_from("!HHHHHH", reply)
+    assert txid == 0x1234
+    assert ancount == 1
+    # Answer: name pointer, type, class, ttl, rdlength, rdata
+    rtype, _, _, length = struct.unpack_from("!HHIH", reply, len(message) + 2)
+    rdata = reply[-length:]
+    family = socket.AF_INET if rtype == TYPE_A else socket.AF_INET6
+    return socket.inet_ntop(family, rdata)
+
+
+@pytest.fixture
+def upstream():
+    server = StandInUpstream()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def make_engine(tmp_path, upstream):
+    config_file = tmp_path / "blocker_config.json"
+    engines = []
+
+    def make(**config):
+        if not config_file.exists():
+            config.setdefault('blocked_sites', [])
+            config.setdefault('scheduled_blocks', [])
+            config.update(backend="dns", dns_listen="127.0.0.1:0", dns_upstream=upstream.address)
+            config_file.write_text(json.dumps(config))
+        engine = BlockerEngine(str(config_file), hosts_path=str(tmp_path / "hosts"),
+                               backup_path=str(tmp_path / "hosts_backup.txt"))
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.close()
+
+
+def sinkhole_address(engine):
+    return engine._sinkhole.sinkhole.address
+
+
+def test_sinks_blocked_names_and_forwards_the_rest(make_engine, upstream):
+    engine = make_engine(blocked_sites=["blocked.com", "*.wild.org"])
+    engine.start_blocking()
+    address = sinkhole_address(engine)
+
+    assert query(address, "blocked.com") == "0.0.0.0"
+    assert query(address, "www.blocked.com", TYPE_AAAA) == "::"
+    assert query(address, "a.b.wild.org") == "0.0.0.0"
+    assert query(address, "wild.org", TYPE_AAAA) == "::"
+    assert upstream.queries == []
+
+    assert query(address, "example.net") == UPSTREAM_ANSWER
+    assert query(address, "notblocked.com") == UPSTREAM_ANSWER
+    assert len(upstream.queries) == 2
+
+
+def test_stopping_forwards_everything(make_engine, upstream):
+    engine = make_engine(blocked_sites=["blocked.com"])
+    engine.start_blocking()
+    address = sinkhole_address(engine)
+    engine.stop_blocking()
+
+    assert query(address, "blocked.com") == UPSTREAM_ANSWER
+
+
+def test_restart_restores_blocking(make_engine):
+    engine = make_engine(blocked_sites=["blocked.com"])
+    engine.start_blocking()
+    engine.close()
+
+    restarted = make_engine()
+    assert restarted.is_blocking
+    assert restarted._sinkhole is None
+    restarted.resume_enforcement()
+    assert query(sinkhole_address(restarted), "blocked.com") == "0.0.0.0"
+
+
+def test_group_starts_the_sinkhole(make_engine):
+    engine = make_engine()
+    engine.create_group("games", always=True)
+    engine.add_group_sites("games", ["steampowered.com"])
+
+    assert not engine.is_blocking
+    assert query(sinkhole_address(engine), "steampowered.com") == "0.0.0.0"
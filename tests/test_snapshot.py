@@ -0,0 +1,46 @@
+"""
+Blocklist snapshots behind the engine.
+"""
+
+import os
+
+import pytest
+
+from blocker.engine import BlockerEngine
+
+
+@pytest.fixture(params=[False, True], ids=["sync", "background"])
+def make_engine(request, tmp_path):
+    engines = []
+
+    def make():
+        engine = BlockerEngine(str(tmp_path / "blocker_config.json"), hosts_path=str(tmp_path / "hosts"),
+                               backup_path=str(tmp_path / "hosts_backup.txt"), background_save=request.param)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.close()
+
+
+def test_store_is_rebased_after_writing(make_engine, tmp_path):
+    snapshot = str(tmp_path / "blocklist.snap")
+    engine = make_engine()
+    engine.add_websites(["a.com", "b.com"])
+    engine.enable_snapshot(snapshot)
+    engine.add_websites(["c.com"])
+    engine.remove_website("a.com")
+    engine.flush_config()
+
+    assert not engine.blocked_sites.modified
+    assert sorted(engine.blocked_sites) == ["b.com", "c.com"]
+
+    # Saving again without touching the sites leaves the snapshot alone
+    inode = os.stat(snapshot).st_ino
+    engine.add_schedule("09:00", "17:00", ["Monday"])
+    engine.flush_config()
+    assert os.stat(snapshot).st_ino == inode
+
+    engine.close()
+    assert sorted(make_engine().blocked_sites) == ["b.com", "c.com"]
@@ -8,22 +8,153 @@ A powerful and user-friendly website blocking application with GUI interface,
 scheduling features, and advanced management capabilities.
 """
 
+import time
+
+# Taken before the other imports, so the startup report includes them
+LAUNCHED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import json
 import os
 import sys
 import platform
-import threading
-import time
-from datetime import datetime, timedelta
-import webbrowser
-from pathlib import Path
-import re
-import subprocess
+from datetime import datetime
+
+from blocker.engine import (
+    BlockerEngine,
+    BlockerError,
+    DuplicateWebsiteError,
+    InvalidWebsiteError,
+    check_admin_privileges,
+    format_schedule,
+)
+from blocker.daemon import connect as connect_daemon
+from blocker.focus import format_duration, format_session
+from blocker.search import SiteIndex
+from blocker.worker import HostsWorker
+
+IMPORTED = time.perf_counter()
+
+# Seconds from launch to an interactive window; slower starts are reported
+STARTUP_BUDGET = 1.0
+
+class VirtualListbox(tk.Frame):
+    """
+    Listbox that only holds the rows currently on screen.
+
+    The full list lives in a Python sequence; scrolling swaps the slice shown
+    in the underlying tk.Listbox, so the cost of showing a list does not
+    depend on its length.
+    """
+
+    def __init__(self, parent, **listbox_options):
+        super().__init__(parent, bg=parent['bg'])
+        self.rows = []
+        self.top = 0
+        self.visible = 1
+        self.selected = None
+
+        self.scrollbar = tk.Scrollbar(self, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.listbox = tk.Listbox(self, height=1, exportselection=False, **listbox_options)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.listbox.bind('<Configure>', self._on_resize)
+        self.listbox.bind('<<ListboxSelect>>', self._on_select)
+        self.listbox.bind('<MouseWheel>', self._on_wheel)
+        self.listbox.bind('<Button-4>', lambda e: self._scroll_units(-3))
+        self.listbox.bind('<Button-5>', lambda e: self._scroll_units(3))
+        self.listbox.bind('<Up>', lambda e: self._move_selection(-1))
+        self.listbox.bind('<Down>', lambda e: self._move_selection(1))
+        self.listbox.bind('<Prior>', lambda e: self._scroll_units(-self.visible))
+        self.listbox.bind('<Next>', lambda e: self._scroll_units(self.visible))
+
+    def set_rows(self, rows):
+        """Show a new sequence of rows, keeping the scroll position if possible"""
+        self.rows = rows
+        self.selected = None
+        self.top = max(0, min(self.top, len(rows) - self.visible))
+        self.render()
+
+    def get_selected(self):
+        """Return the selected row, or None"""
+        if self.selected is None or self.selected >= len(self.rows):
+            return None
+        return self.rows[self.selected]
+
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units'|'pages')"""
+        if args[0] == tk.MOVETO:
+            self.top = int(float(args[1]) * len(self.rows))
+        elif args[0] == tk.SCROLL:
+            step = self.visible if args[2] == tk.PAGES else 1
+            self.top += int(args[1]) * step
+        self.top = max(0, min(self.top, len(self.rows) - self.visible))
+        self.render()
+
+    def render(self):
+        """Fill the listbox with the rows in view"""
+        end = min(self.top + self.visible, len(self.rows))
+        self.listbox.delete(0, tk.END)
+        if end > self.top:
+            self.listbox.insert(tk.END, *self.rows[self.top:end])
+        if self.selected is not None and self.top <= self.selected < end:
+            self.listbox.selection_set(self.selected - self.top)
+
+        total = len(self.rows)
+        if total:
+            self.scrollbar.set(self.top / total, end / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _on_resize(self, event):
+        bbox = self.listbox.bbox(0) if self.listbox.size() else None
+        if bbox:
+            line_height = bbox[3]
+        else:
+            from tkinter import font
+            line_height = font.Font(font=self.listbox['font']).metrics('linespace') + 1
+        border = 2 * (int(self.listbox['bd']) + int(self.listbox['highlightthickness']))
+        visible = max(1, (event.height - border) // line_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.top = max(0, min(self.top, len(self.rows) - self.visible))
+            self.render()
+
+    def _on_select(self, event):
+        selection = self.listbox.curselection()
+        if selection:
+            self.selected = self.top + selection[0]
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120, macOS small deltas
+        units = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+        return self._scroll_units(units * 3)
+
+    def _scroll_units(self, units):
+        self.yview(tk.SCROLL, units, tk.UNITS)
+        return "break"
+
+    def _move_selection(self, step):
+        if not self.rows:
+            return "break"
+        if self.selected is None:
+            self.selected = self.top
+        else:
+            self.selected = max(0, min(self.selected + step, len(self.rows) - 1))
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + self.visible:
+            self.top = self.selected - self.visible + 1
+        self.render()
+        return "break"
 
 class WebsiteBlocker:
     def __init__(self):
+        # Seconds spent in each startup phase, for report_startup()
+        self.startup = {'import': IMPORTED - LAUNCHED}
+        started = time.perf_counter()
         self.root = tk.Tk()
         self.root.title("Website Blocker - By Umar J")
         self.root.geometry("800x600")
@@ -44,46 +175,59 @@ class WebsiteBlocker:
             'border': '#cbd5e1'
         }
         
-        # Configuration
-        self.config_file = "blocker_config.json"
-        self.blocked_sites = []
-        self.scheduled_blocks = []
-        self.is_blocking = False
-        
-        # Get hosts file path based on OS
-        self.hosts_path = self.get_hosts_path()
-        self.backup_path = "hosts_backup.txt"
-        
-        # Load configuration
-        self.load_config()
+        # Blocking engine (configuration, hosts file and schedules): the
+        # privileged daemon when it is running, otherwise one in this process
+        self.startup['window'] = time.perf_counter() - started
+        started = time.perf_counter()
+        self.engine = connect_daemon() or BlockerEngine(background_save=True, background_flush=True)
+        self.startup['config'] = time.perf_counter() - started
+        if self.engine.remote:
+            self.root.title("Website Blocker - By Umar J (daemon)")
+        
+        # All engine operations run on one background thread; its events are
+        # handled here on the Tk thread
+        self.worker = HostsWorker(self.engine)
+        self.worker.on_progress = self.show_progress
+        self.worker.on_idle = self.clear_progress
+        self.engine.on_dns_flush = lambda result: self.run_on_main_thread(self.show_dns_flush, result)
+        self.engine.on_repair = lambda repair: self.run_on_main_thread(self.show_repair, repair)
         
         # Set up GUI
+        started = time.perf_counter()
         self.setup_gui()
         self.update_status()
-        
-        # Start scheduler thread
-        self.scheduler_thread = threading.Thread(target=self.scheduler_loop, daemon=True)
-        self.scheduler_thread.start()
+        self.gui_built = time.perf_counter()
+        self.startup['gui'] = self.gui_built - started
+        self.poll_worker()
+        
+        # Start scheduler thread; transitions are applied on the worker. With
+        # the daemon, it runs the schedules and the GUI only watches for changes
+        self.auto_started = False
+        self.worker.submit(self.engine.resume_enforcement, name="Starting DNS sinkhole",
+                           on_error=lambda e: self.job_failed("Failed to start the DNS sinkhole", e))
+        self.engine.start_scheduler(self.apply_schedule, dispatch=self.worker.submit)
+        self.engine.start_watcher(dispatch=self.worker.submit)
+        self.engine.start_focus_timers(dispatch=self.worker.submit)
+        self.focus_shown = False
+        self.tick_focus()
+        if self.engine.remote:
+            self.poll_daemon()
 
-    def get_hosts_path(self):
-        """Get the hosts file path based on the operating system"""
-        system = platform.system().lower()
-        if system == "windows":
-            return r"C:\Windows\System32\drivers\etc\hosts"
-        else:  # Linux, macOS, Unix-like
-            return "/etc/hosts"
+    @property
+    def blocked_sites(self):
+        return self.engine.blocked_sites
+
+    @property
+    def scheduled_blocks(self):
+        return self.engine.scheduled_blocks
+
+    @property
+    def is_blocking(self):
+        return self.engine.is_blocking
 
     def check_admin_privileges(self):
         """Check if the program is running with admin/root privileges"""
-        system = platform.system().lower()
-        try:
-            if system == "windows":
-                import ctypes
-                return ctypes.windll.shell32.IsUserAnAdmin()
-            else:
-                return os.geteuid() == 0
-        except:
-            return False
+        return check_admin_privileges()
 
     def request_admin_privileges(self):
         """Request admin privileges if not already running as admin"""
@@ -130,11 +274,27 @@ class WebsiteBlocker:
         self.notebook = ttk.Notebook(main_frame)
         self.notebook.pack(fill=tk.BOTH, expand=True, pady=(20, 0))
         
-        # Tabs
-        self.create_block_tab()
-        self.create_schedule_tab()
-        self.create_settings_tab()
-        self.create_about_tab()
+        # Tabs: the first is built now, the others the first time they are shown
+        self.schedule_listbox = None
+        self.focus_listbox = None
+        self.tab_builders = {}
+        for text, builder in (("Website Blocking", self.create_block_tab),
+                              ("Scheduling", self.create_schedule_tab),
+                              ("Focus", self.create_focus_tab),
+                              ("Settings", self.create_settings_tab),
+                              ("About", self.create_about_tab)):
+            frame = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=text)
+            self.tab_builders[str(frame)] = (builder, frame)
+        self.build_selected_tab()
+        self.notebook.bind('<<NotebookTabChanged>>', self.build_selected_tab)
+
+    def build_selected_tab(self, event=None):
+        """Build the widgets of the selected tab if it has not been shown before"""
+        builder = self.tab_builders.pop(self.notebook.select(), None)
+        if builder is not None:
+            create_tab, frame = builder
+            create_tab(frame)
 
     def create_header(self, parent):
         """Create the header section"""
@@ -185,12 +345,27 @@ class WebsiteBlocker:
             bg=self.colors['primary']
         )
         self.status_text.pack()
+        
+        self.activity_label = tk.Label(
+            self.status_frame,
+            text="",
+            font=("Helvetica", 7),
+            fg="white",
+            bg=self.colors['primary']
+        )
+        self.activity_label.pack()
+        
+        self.dns_label = tk.Label(
+            self.status_frame,
+            text="",
+            font=("Helvetica", 7),
+            fg="#bfdbfe",
+            bg=self.colors['primary']
+        )
+        self.dns_label.pack()
 
-    def create_block_tab(self):
+    def create_block_tab(self, block_frame):
         """Create the website blocking tab"""
-        block_frame = ttk.Frame(self.notebook)
-        self.notebook.add(block_frame, text="Website Blocking")
-        
         # Input section
         input_frame = tk.Frame(block_frame, bg="white", relief=tk.RAISED, bd=1)
         input_frame.pack(fill=tk.X, padx=10, pady=10)
@@ -270,23 +445,48 @@ class WebsiteBlocker:
             bg="white"
         ).pack(anchor=tk.W, padx=10, pady=(10, 5))
         
-        # Listbox with scrollbar
-        listbox_frame = tk.Frame(list_frame, bg="white")
-        listbox_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        # Incremental search
+        search_frame = tk.Frame(list_frame, bg="white")
+        search_frame.pack(fill=tk.X, padx=10, pady=(0, 5))
+        
+        tk.Label(
+            search_frame,
+            text="🔍 Search:",
+            font=("Helvetica", 10),
+            bg="white"
+        ).pack(side=tk.LEFT)
+        
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', lambda *args: self.schedule_search())
+        search_entry = tk.Entry(
+            search_frame,
+            textvariable=self.search_var,
+            font=("Helvetica", 10),
+            relief=tk.FLAT,
+            bd=3
+        )
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 10))
         
-        scrollbar = tk.Scrollbar(listbox_frame)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.count_label = tk.Label(
+            search_frame,
+            text="",
+            font=("Helvetica", 9),
+            bg="white",
+            fg=self.colors['text_secondary']
+        )
+        self.count_label.pack(side=tk.RIGHT)
         
-        self.website_listbox = tk.Listbox(
-            listbox_frame,
+        # Virtualized list: only the rows on screen are inserted
+        self.site_index = SiteIndex()
+        self.search_job = None
+        self.website_list = VirtualListbox(
+            list_frame,
             font=("Helvetica", 10),
-            yscrollcommand=scrollbar.set,
             relief=tk.FLAT,
             bd=5,
             selectmode=tk.SINGLE
         )
-        self.website_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.config(command=self.website_listbox.yview)
+        self.website_list.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
         
         # Remove button
         remove_btn = tk.Button(
@@ -301,11 +501,8 @@ class WebsiteBlocker:
         )
         remove_btn.pack(pady=(0, 10))
 
-    def create_schedule_tab(self):
+    def create_schedule_tab(self, schedule_frame):
         """Create the scheduling tab"""
-        schedule_frame = ttk.Frame(self.notebook)
-        self.notebook.add(schedule_frame, text="Scheduling")
-        
         # Schedule input section
         input_frame = tk.Frame(schedule_frame, bg="white", relief=tk.RAISED, bd=1)
         input_frame.pack(fill=tk.X, padx=10, pady=10)
@@ -405,12 +602,94 @@ class WebsiteBlocker:
             command=self.remove_selected_schedule
         )
         remove_schedule_btn.pack(pady=(0, 10))
+        
+        self.refresh_schedules()
 
-    def create_settings_tab(self):
-        """Create the settings tab"""
-        settings_frame = ttk.Frame(self.notebook)
-        self.notebook.add(settings_frame, text="Settings")
+    def create_focus_tab(self, focus_frame):
+        """Create the focus session tab"""
+        input_frame = tk.Frame(focus_frame, bg="white", relief=tk.RAISED, bd=1)
+        input_frame.pack(fill=tk.X, padx=10, pady=10)
+        
+        tk.Label(
+            input_frame,
+            text="Start a Focus Session:",
+            font=("Helvetica", 12, "bold"),
+            bg="white"
+        ).pack(anchor=tk.W, padx=10, pady=(10, 5))
+        
+        # Lengths
+        time_frame = tk.Frame(input_frame, bg="white")
+        time_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        
+        tk.Label(time_frame, text="Minutes:", bg="white").pack(side=tk.LEFT)
+        self.focus_minutes_var = tk.StringVar(value="25")
+        tk.Entry(time_frame, textvariable=self.focus_minutes_var, width=6).pack(side=tk.LEFT, padx=(5, 20))
+        
+        tk.Label(time_frame, text="Break:", bg="white").pack(side=tk.LEFT)
+        self.focus_break_var = tk.StringVar(value="5")
+        tk.Entry(time_frame, textvariable=self.focus_break_var, width=6).pack(side=tk.LEFT, padx=(5, 20))
+        
+        tk.Label(time_frame, text="Cycles:", bg="white").pack(side=tk.LEFT)
+        self.focus_cycles_var = tk.StringVar(value="1")
+        tk.Spinbox(time_frame, from_=1, to=99, textvariable=self.focus_cycles_var,
+                   width=4).pack(side=tk.LEFT, padx=(5, 20))
+        
+        # Websites; none means the blocked list
+        tk.Label(
+            input_frame,
+            text="Websites (leave empty to block your blocked list):",
+            bg="white"
+        ).pack(anchor=tk.W, padx=10)
+        self.focus_sites_entry = tk.Entry(input_frame, font=("Helvetica", 11), relief=tk.FLAT, bd=5)
+        self.focus_sites_entry.pack(fill=tk.X, padx=10, pady=(0, 10))
+        
+        start_focus_btn = tk.Button(
+            input_frame,
+            text="Start Focus Session",
+            font=("Helvetica", 10, "bold"),
+            bg=self.colors['success'],
+            fg="white",
+            relief=tk.FLAT,
+            padx=20,
+            command=self.start_focus
+        )
+        start_focus_btn.pack(pady=(0, 10))
+        
+        # Running sessions
+        focus_list_frame = tk.Frame(focus_frame, bg="white", relief=tk.RAISED, bd=1)
+        focus_list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        tk.Label(
+            focus_list_frame,
+            text="Focus Sessions:",
+            font=("Helvetica", 12, "bold"),
+            bg="white"
+        ).pack(anchor=tk.W, padx=10, pady=(10, 5))
         
+        self.focus_listbox = tk.Listbox(
+            focus_list_frame,
+            font=("Helvetica", 10),
+            relief=tk.FLAT,
+            bd=5
+        )
+        self.focus_listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        self.focus_ids = []
+        
+        cancel_focus_btn = tk.Button(
+            focus_list_frame,
+            text="End Selected Session",
+            font=("Helvetica", 10),
+            bg=self.colors['secondary'],
+            fg="white",
+            relief=tk.FLAT,
+            command=self.cancel_selected_focus
+        )
+        cancel_focus_btn.pack(pady=(0, 10))
+        
+        self.refresh_focus()
+
+    def create_settings_tab(self, settings_frame):
+        """Create the settings tab"""
         # Backup section
         backup_frame = tk.Frame(settings_frame, bg="white", relief=tk.RAISED, bd=1)
         backup_frame.pack(fill=tk.X, padx=10, pady=10)
@@ -486,12 +765,21 @@ class WebsiteBlocker:
             command=self.import_config
         )
         import_btn.pack(side=tk.LEFT, padx=5)
+        
+        import_list_btn = tk.Button(
+            ie_btn_frame,
+            text="📋 Import Blocklist",
+            font=("Helvetica", 10),
+            bg=self.colors['primary'],
+            fg="white",
+            relief=tk.FLAT,
+            padx=20,
+            command=self.import_blocklist
+        )
+        import_list_btn.pack(side=tk.LEFT, padx=5)
 
-    def create_about_tab(self):
+    def create_about_tab(self, about_frame):
         """Create the about tab"""
-        about_frame = ttk.Frame(self.notebook)
-        self.notebook.add(about_frame, text="About")
-        
         about_content = tk.Frame(about_frame, bg="white", relief=tk.RAISED, bd=1)
         about_content.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
@@ -552,19 +840,15 @@ Features:
             fg="white",
             relief=tk.FLAT,
             padx=30,
-            command=lambda: webbrowser.open("https://github.com/yourusername")
+            command=self.open_github
         )
         github_btn.pack(pady=20)
 
-    def validate_website(self, website):
-        """Validate website URL format"""
-        # Remove protocol if present
-        website = re.sub(r'^https?://', '', website)
-        website = re.sub(r'^www\.', '', website)
+    def open_github(self):
+        """Open the project page in the default browser"""
+        import webbrowser
         
-        # Basic domain validation
-        pattern = r'^([a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?\.)+[a-zA-Z]{2,}$'
-        return re.match(pattern, website) is not None, website
+        webbrowser.open("https://github.com/yourusername")
 
     def add_website(self):
         """Add a website to the blocked list"""
@@ -573,40 +857,51 @@ Features:
             messagebox.showwarning("Input Error", "Please enter a website URL.")
             return
         
-        is_valid, cleaned_website = self.validate_website(website)
-        if not is_valid:
-            messagebox.showerror("Invalid URL", "Please enter a valid website URL (e.g., facebook.com)")
-            return
-        
-        if cleaned_website not in self.blocked_sites:
-            self.blocked_sites.append(cleaned_website)
-            self.website_listbox.insert(tk.END, cleaned_website)
+        def added(cleaned_website):
+            self.site_index.add(cleaned_website)
+            self.apply_search()
             self.website_entry.delete(0, tk.END)
-            self.save_config()
             messagebox.showinfo("Success", f"Added {cleaned_website} to blocked list.")
-        else:
-            messagebox.showwarning("Duplicate", "This website is already in the blocked list.")
+        
+        def failed(error):
+            if isinstance(error, InvalidWebsiteError):
+                messagebox.showerror("Invalid URL", "Please enter a valid website URL (e.g., facebook.com)")
+            elif isinstance(error, DuplicateWebsiteError):
+                messagebox.showwarning("Duplicate", "This website is already in the blocked list.")
+            else:
+                self.job_failed("Failed to add website", error)
+        
+        self.worker.submit(self.engine.add_website, website, name="Adding website",
+                           on_done=added, on_error=failed)
 
     def remove_selected_website(self):
         """Remove selected website from the blocked list"""
-        selection = self.website_listbox.curselection()
-        if selection:
-            website = self.website_listbox.get(selection[0])
-            self.blocked_sites.remove(website)
-            self.website_listbox.delete(selection[0])
-            self.save_config()
-            messagebox.showinfo("Success", f"Removed {website} from blocked list.")
-        else:
+        website = self.website_list.get_selected()
+        if website is None:
             messagebox.showwarning("No Selection", "Please select a website to remove.")
+            return
+        
+        def removed(result):
+            self.site_index.discard(website)
+            self.apply_search()
+            messagebox.showinfo("Success", f"Removed {website} from blocked list.")
+        
+        self.worker.submit(self.engine.remove_website, website, name="Removing website",
+                           on_done=removed,
+                           on_error=lambda e: self.job_failed("Failed to remove website", e))
 
     def clear_all_websites(self):
         """Clear all websites from the blocked list"""
         if self.blocked_sites:
             if messagebox.askyesno("Confirm", "Are you sure you want to clear all blocked websites?"):
-                self.blocked_sites.clear()
-                self.website_listbox.delete(0, tk.END)
-                self.save_config()
-                messagebox.showinfo("Success", "All websites cleared from blocked list.")
+                def cleared(result):
+                    self.site_index.reset(())
+                    self.apply_search()
+                    messagebox.showinfo("Success", "All websites cleared from blocked list.")
+                
+                self.worker.submit(self.engine.clear_websites, name="Clearing websites",
+                                   on_done=cleared,
+                                   on_error=lambda e: self.job_failed("Failed to clear websites", e))
         else:
             messagebox.showinfo("Info", "The blocked list is already empty.")
 
@@ -616,10 +911,11 @@ Features:
             messagebox.showwarning("No Websites", "Please add websites to block first.")
             return
         
-        if not self.check_admin_privileges():
+        if not self.engine.remote and not self.check_admin_privileges():
             if not self.request_admin_privileges():
                 return
         
+        self.auto_started = False
         if self.is_blocking:
             self.stop_blocking()
         else:
@@ -627,236 +923,223 @@ Features:
 
     def start_blocking(self):
         """Start blocking websites"""
-        try:
-            with open(self.hosts_path, 'r') as file:
-                hosts_content = file.read()
-            
-            # Add blocked sites to hosts file
-            blocked_entries = []
-            for site in self.blocked_sites:
-                entries = [
-                    f"127.0.0.1 {site}",
-                    f"127.0.0.1 www.{site}"
-                ]
-                blocked_entries.extend(entries)
-            
-            # Check if sites are already blocked
-            new_entries = []
-            for entry in blocked_entries:
-                if entry not in hosts_content:
-                    new_entries.append(entry)
-            
-            if new_entries:
-                with open(self.hosts_path, 'a') as file:
-                    file.write('\n# Website Blocker - Umar J\n')
-                    for entry in new_entries:
-                        file.write(f"{entry}\n")
-            
-            self.is_blocking = True
-            self.update_status()
-            self.flush_dns()
-            messagebox.showinfo("Success", f"Blocking {len(self.blocked_sites)} websites.")
-            
-        except PermissionError:
-            messagebox.showerror("Permission Error", 
-                               "Permission denied. Please run as administrator/root.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to start blocking: {e}")
+        self.block_btn.config(state=tk.DISABLED)
+        self.worker.submit(self.engine.start_blocking, name="Starting blocking",
+                           on_done=self.blocking_started,
+                           on_error=lambda e: self.job_failed("Failed to start blocking", e))
 
     def stop_blocking(self):
         """Stop blocking websites"""
-        try:
-            with open(self.hosts_path, 'r') as file:
-                lines = file.readlines()
-            
-            # Remove blocked entries
-            filtered_lines = []
-            skip_next = False
-            
-            for line in lines:
-                if "# Website Blocker - Umar J" in line:
-                    skip_next = True
-                    continue
-                
-                if skip_next and any(site in line for site in self.blocked_sites):
-                    continue
-                
-                if skip_next and line.strip() == "":
-                    skip_next = False
-                    continue
-                
-                skip_next = False
-                filtered_lines.append(line)
-            
-            with open(self.hosts_path, 'w') as file:
-                file.writelines(filtered_lines)
-            
-            self.is_blocking = False
-            self.update_status()
-            self.flush_dns()
-            messagebox.showinfo("Success", "Website blocking stopped.")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to stop blocking: {e}")
+        self.block_btn.config(state=tk.DISABLED)
+        self.worker.submit(self.engine.stop_blocking, name="Stopping blocking",
+                           on_done=self.blocking_stopped,
+                           on_error=lambda e: self.job_failed("Failed to stop blocking", e))
 
-    def flush_dns(self):
-        """Flush DNS cache"""
-        system = platform.system().lower()
-        try:
-            if system == "windows":
-                subprocess.run(["ipconfig", "/flushdns"], 
-                             capture_output=True, check=True)
-            elif system == "darwin":  # macOS
-                subprocess.run(["sudo", "dscacheutil", "-flushcache"], 
-                             capture_output=True, check=True)
-            elif system == "linux":
-                # Try different methods for different Linux distributions
-                commands = [
-                    ["sudo", "systemctl", "restart", "systemd-resolved"],
-                    ["sudo", "/etc/init.d/networking", "restart"],
-                    ["sudo", "service", "network-manager", "restart"]
-                ]
-                for cmd in commands:
-                    try:
-                        subprocess.run(cmd, capture_output=True, check=True)
-                        break
-                    except:
-                        continue
-        except Exception:
-            pass  # DNS flush failure is not critical
+    def blocking_started(self, result):
+        """Report that blocking has been applied"""
+        self.block_btn.config(state=tk.NORMAL)
+        self.update_status()
+        messagebox.showinfo("Success", f"Blocking {result.sites} websites.")
+
+    def blocking_stopped(self, result):
+        """Report that blocking has been removed"""
+        self.block_btn.config(state=tk.NORMAL)
+        self.update_status()
+        messagebox.showinfo("Success", "Website blocking stopped.")
+
+    def job_failed(self, message, error):
+        """Report a failed background job"""
+        self.block_btn.config(state=tk.NORMAL)
+        self.update_status()
+        if isinstance(error, PermissionError):
+            messagebox.showerror("Permission Error", 
+                               "Permission denied. Please run as administrator/root.")
+        elif isinstance(error, BlockerError):
+            messagebox.showerror("Error", str(error))
+        else:
+            messagebox.showerror("Error", f"{message}: {error}")
 
     def add_schedule(self):
         """Add a scheduled blocking session"""
         start_time = self.start_time_var.get()
         end_time = self.end_time_var.get()
         
-        # Validate time format
-        try:
-            datetime.strptime(start_time, "%H:%M")
-            datetime.strptime(end_time, "%H:%M")
-        except ValueError:
-            messagebox.showerror("Invalid Time", "Please use HH:MM format (e.g., 09:00)")
-            return
-        
         # Get selected days
         selected_days = [day for day, var in self.days_vars.items() if var.get()]
         
-        if not selected_days:
-            messagebox.showwarning("No Days Selected", "Please select at least one day.")
-            return
-        
-        # Create schedule entry
-        schedule = {
-            'start_time': start_time,
-            'end_time': end_time,
-            'days': selected_days
-        }
-        
-        self.scheduled_blocks.append(schedule)
+        def added(schedule):
+            # Update schedule listbox
+            self.schedule_listbox.insert(tk.END, format_schedule(schedule))
+            messagebox.showinfo("Success", "Schedule added successfully.")
         
-        # Update schedule listbox
-        schedule_text = f"{start_time}-{end_time}: {', '.join([d[:3] for d in selected_days])}"
-        self.schedule_listbox.insert(tk.END, schedule_text)
-        
-        self.save_config()
-        messagebox.showinfo("Success", "Schedule added successfully.")
+        self.worker.submit(self.engine.add_schedule, start_time, end_time, selected_days,
+                           name="Adding schedule", on_done=added,
+                           on_error=lambda e: messagebox.showerror("Invalid Schedule", str(e)))
 
     def remove_selected_schedule(self):
         """Remove selected schedule"""
         selection = self.schedule_listbox.curselection()
         if selection:
             index = selection[0]
-            del self.scheduled_blocks[index]
-            self.schedule_listbox.delete(index)
-            self.save_config()
-            messagebox.showinfo("Success", "Schedule removed.")
+            
+            def removed(result):
+                self.schedule_listbox.delete(index)
+                messagebox.showinfo("Success", "Schedule removed.")
+            
+            self.worker.submit(self.engine.remove_schedule, index, name="Removing schedule",
+                               on_done=removed,
+                               on_error=lambda e: self.job_failed("Failed to remove schedule", e))
         else:
             messagebox.showwarning("No Selection", "Please select a schedule to remove.")
 
-    def scheduler_loop(self):
-        """Background thread to check scheduled blocks"""
-        while True:
-            try:
-                current_time = datetime.now()
-                current_day = current_time.strftime("%A")
-                current_time_str = current_time.strftime("%H:%M")
-                
-                should_block = False
-                for schedule in self.scheduled_blocks:
-                    if current_day in schedule['days']:
-                        start_time = schedule['start_time']
-                        end_time = schedule['end_time']
-                        
-                        if start_time <= current_time_str <= end_time:
-                            should_block = True
-                            break
-                
-                # Auto start/stop blocking based on schedule
-                if should_block and not self.is_blocking and self.blocked_sites:
-                    self.root.after(0, self.start_blocking)
-                elif not should_block and self.is_blocking:
-                    # Only stop if it was auto-started by scheduler
-                    self.root.after(0, self.stop_blocking)
-                
-            except Exception:
-                pass
-            
-            time.sleep(60)  # Check every minute
+    def start_focus(self):
+        """Start a focus session"""
+        text = self.focus_sites_entry.get().replace(',', ' ')
+        websites = text.split() or None
+        
+        def started(session):
+            self.focus_sites_entry.delete(0, tk.END)
+            self.refresh_focus()
+            self.update_status()
+        
+        self.worker.submit(self.engine.start_focus, self.focus_minutes_var.get(), websites,
+                           self.focus_break_var.get(), self.focus_cycles_var.get(),
+                           name="Starting focus session", on_done=started,
+                           on_error=lambda e: messagebox.showerror("Invalid Focus Session", str(e)))
 
-    def backup_hosts(self):
-        """Backup the hosts file"""
-        try:
-            with open(self.hosts_path, 'r') as source:
-                content = source.read()
-            
-            with open(self.backup_path, 'w') as backup:
-                backup.write(content)
+    def cancel_selected_focus(self):
+        """End the selected focus session"""
+        selection = self.focus_listbox.curselection()
+        if selection:
+            session_id = self.focus_ids[selection[0]]
             
-            messagebox.showinfo("Success", f"Hosts file backed up to {self.backup_path}")
+            def cancelled(result):
+                self.refresh_focus()
+                self.update_status()
             
+            self.worker.submit(self.engine.cancel_focus, session_id, name="Ending focus session",
+                               on_done=cancelled,
+                               on_error=lambda e: self.job_failed("Failed to end focus session", e))
+        else:
+            messagebox.showwarning("No Selection", "Please select a focus session to end.")
+
+    def refresh_focus(self):
+        """Show the focus sessions and the time left in their current phase"""
+        sessions = list(self.engine.focus_sessions.values())
+        selection = self.focus_listbox.curselection()
+        now = time.time()
+        self.focus_listbox.delete(0, tk.END)
+        for session in sessions:
+            self.focus_listbox.insert(tk.END, format_session(session, now))
+        self.focus_ids = [session.id for session in sessions]
+        if selection and selection[0] < len(sessions):
+            self.focus_listbox.selection_set(selection[0])
+
+    def tick_focus(self):
+        """Count the focus sessions down once a second"""
+        if self.engine.focus_sessions or self.focus_shown:
+            if self.focus_listbox is not None:
+                self.refresh_focus()
+            self.update_status()
+        self.root.after(1000, self.tick_focus)
+
+    def run_on_main_thread(self, func, *args):
+        """Hand a call from a background thread to the Tk main loop"""
+        self.worker.post(func, *args)
+
+    def poll_worker(self):
+        """Handle events posted by the background worker"""
+        self.worker.process_events()
+        self.root.after(50, self.poll_worker)
+
+    def poll_daemon(self):
+        """Pick up changes the daemon made by itself, such as scheduled blocking"""
+        if not self.worker.busy:
+            self.worker.submit(self.engine.refresh, name="Checking daemon",
+                               on_done=self.daemon_refreshed,
+                               on_error=self.daemon_unreachable)
+        self.root.after(2000, self.poll_daemon)
+
+    def daemon_refreshed(self, changed):
+        """Show the daemon's state if it changed since the last poll"""
+        self.root.title("Website Blocker - By Umar J (daemon)")
+        if changed:
+            self.refresh_gui()
+            self.update_status()
+
+    def daemon_unreachable(self, error):
+        """Note that the daemon stopped answering"""
+        self.root.title("Website Blocker - By Umar J (daemon not responding)")
+
+    def show_progress(self, job, message):
+        """Show what the background worker is doing"""
+        self.activity_label.config(text=f"{message}...")
+
+    def clear_progress(self):
+        """Clear the progress text once the worker is idle"""
+        self.activity_label.config(text="")
+
+    def show_dns_flush(self, result):
+        """Show the outcome of the last DNS cache flush"""
+        if result.ok:
+            text = f"DNS: {result.method} ({result.duration * 1000:.0f} ms)"
+        else:
+            text = "DNS flush failed"
+        self.dns_label.config(text=text)
+        if not result.ok:
+            print(f"DNS flush failed: {result.error}", file=sys.stderr)
+
+    def show_repair(self, repair):
+        """Show that the hosts file was repaired after an outside edit"""
+        when = datetime.fromtimestamp(repair.time).strftime('%H:%M:%S')
+        self.status_text.config(text=f"Active (repaired {repair.restored} entries at {when})")
+
+    def apply_schedule(self, should_block):
+        """Auto start/stop blocking based on schedule (runs on the worker thread)"""
+        engine = self.engine
+        try:
+            if should_block and not engine.is_blocking and engine.blocked_sites:
+                self.auto_started = True
+                self.run_on_main_thread(self.blocking_started, engine.start_blocking())
+            elif not should_block and engine.is_blocking and self.auto_started:
+                # Only stop if it was auto-started by scheduler
+                self.auto_started = False
+                self.run_on_main_thread(self.blocking_stopped, engine.stop_blocking())
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to backup hosts file: {e}")
+            self.run_on_main_thread(self.job_failed, "Scheduled blocking failed", e)
+
+    def backup_hosts(self):
+        """Backup the hosts file"""
+        self.worker.submit(
+            self.engine.backup_hosts, name="Backing up hosts file",
+            on_done=lambda backup_path: messagebox.showinfo(
+                "Success", f"Hosts file backed up to {backup_path}"),
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to backup hosts file: {e}")
+        )
 
     def restore_hosts(self):
         """Restore the hosts file from backup"""
-        if not os.path.exists(self.backup_path):
+        if not os.path.exists(self.engine.backup_path):
             messagebox.showerror("Error", "No backup file found.")
             return
         
         if messagebox.askyesno("Confirm", "This will restore the hosts file from backup. Continue?"):
-            try:
-                with open(self.backup_path, 'r') as backup:
-                    content = backup.read()
-                
-                with open(self.hosts_path, 'w') as hosts:
-                    hosts.write(content)
-                
-                self.is_blocking = False
+            def restored(result):
                 self.update_status()
-                self.flush_dns()
                 messagebox.showinfo("Success", "Hosts file restored from backup.")
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to restore hosts file: {e}")
+            
+            self.worker.submit(self.engine.restore_hosts, name="Restoring hosts file",
+                               on_done=restored,
+                               on_error=lambda e: self.job_failed("Failed to restore hosts file", e))
 
     def export_config(self):
         """Export configuration to JSON file"""
-        config = {
-            'blocked_sites': self.blocked_sites,
-            'scheduled_blocks': self.scheduled_blocks,
-            'version': '2.0',
-            'created_by': 'Umar J'
-        }
-        
-        try:
-            filename = f"website_blocker_config_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(filename, 'w') as file:
-                json.dump(config, file, indent=4)
-            
-            messagebox.showinfo("Success", f"Configuration exported to {filename}")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export configuration: {e}")
+        self.worker.submit(
+            self.engine.export_config, name="Exporting configuration",
+            on_done=lambda filename: messagebox.showinfo(
+                "Success", f"Configuration exported to {filename}"),
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to export configuration: {e}")
+        )
 
     def import_config(self):
         """Import configuration from JSON file"""
@@ -870,42 +1153,86 @@ Features:
         if not filename:
             return
         
-        try:
-            with open(filename, 'r') as file:
-                config = json.load(file)
-            
-            # Validate config structure
-            if 'blocked_sites' in config and 'scheduled_blocks' in config:
-                self.blocked_sites = config['blocked_sites']
-                self.scheduled_blocks = config['scheduled_blocks']
-                
-                # Update GUI
-                self.refresh_gui()
-                self.save_config()
-                
-                messagebox.showinfo("Success", "Configuration imported successfully.")
-            else:
-                messagebox.showerror("Error", "Invalid configuration file format.")
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to import configuration: {e}")
+        def imported(result):
+            # Update GUI
+            self.refresh_gui()
+            self.update_status()
+            messagebox.showinfo("Success", "Configuration imported successfully.")
+        
+        self.worker.submit(self.engine.import_config, filename, name="Importing configuration",
+                           on_done=imported,
+                           on_error=lambda e: self.job_failed("Failed to import configuration", e))
+
+    def import_blocklist(self):
+        """Import a hosts, adblock or plain-domain blocklist file"""
+        from tkinter import filedialog
+        
+        filename = filedialog.askopenfilename(
+            title="Select Blocklist File",
+            filetypes=[("Blocklists", "*.txt *.hosts *.list"), ("All files", "*.*")]
+        )
+        
+        if not filename:
+            return
+        
+        def imported(report):
+            self.refresh_gui()
+            messagebox.showinfo("Success", f"Blocklist imported: {report.summary()}")
+        
+        self.worker.submit(self.engine.import_blocklist, filename, name="Importing blocklist",
+                           on_done=imported,
+                           on_error=lambda e: self.job_failed("Failed to import blocklist", e))
 
     def refresh_gui(self):
         """Refresh GUI with current data"""
-        # Update website listbox
-        self.website_listbox.delete(0, tk.END)
-        for site in self.blocked_sites:
-            self.website_listbox.insert(tk.END, site)
-        
-        # Update schedule listbox
+        # Update website list
+        with self.engine.stats.timer('gui_refresh'):
+            self.site_index.reset(self.blocked_sites.to_list())
+            self.apply_search()
+        
+        # Update schedule listbox, once the Scheduling tab has been built
+        if self.schedule_listbox is not None:
+            self.refresh_schedules()
+
+    def refresh_schedules(self):
+        """Show the scheduled sessions"""
         self.schedule_listbox.delete(0, tk.END)
         for schedule in self.scheduled_blocks:
-            schedule_text = f"{schedule['start_time']}-{schedule['end_time']}: {', '.join([d[:3] for d in schedule['days']])}"
-            self.schedule_listbox.insert(tk.END, schedule_text)
+            self.schedule_listbox.insert(tk.END, format_schedule(schedule))
+
+    def schedule_search(self):
+        """Run the search shortly after the user stops typing"""
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(150, self.apply_search)
+
+    def apply_search(self):
+        """Show the blocked websites matching the search box"""
+        self.search_job = None
+        rows = self.site_index.search(self.search_var.get())
+        self.website_list.set_rows(rows)
+        if len(rows) == len(self.site_index):
+            self.count_label.config(text=f"{len(rows)} websites")
+        else:
+            self.count_label.config(text=f"{len(rows)} of {len(self.site_index)} websites")
 
     def update_status(self):
         """Update the status indicator"""
-        if self.is_blocking:
+        sessions = self.engine.focus_sessions
+        self.focus_shown = bool(sessions)
+        now = time.time()
+        phases = [sessions[session_id].phase_at(now) for session_id in self.engine.active_focus
+                  if session_id in sessions]
+        ends = [phase.ends for phase in phases if phase is not None]
+        if ends and not self.is_blocking:
+            # Blocked by a focus session only; the button still toggles manual blocking
+            self.status_label.config(fg=self.colors['warning'])
+            self.status_text.config(text=f"Focus ({format_duration(min(ends) - now)} left)")
+            self.block_btn.config(
+                text="🚫 Start Blocking",
+                bg=self.colors['danger']
+            )
+        elif self.is_blocking:
             self.status_label.config(fg=self.colors['success'])
             self.status_text.config(text="Active")
             self.block_btn.config(
@@ -920,38 +1247,11 @@ Features:
                 bg=self.colors['danger']
             )
 
-    def load_config(self):
-        """Load configuration from JSON file"""
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as file:
-                    config = json.load(file)
-                    self.blocked_sites = config.get('blocked_sites', [])
-                    self.scheduled_blocks = config.get('scheduled_blocks', [])
-            except Exception as e:
-                print(f"Error loading config: {e}")
-                self.blocked_sites = []
-                self.scheduled_blocks = []
-
-    def save_config(self):
-        """Save configuration to JSON file"""
-        config = {
-            'blocked_sites': self.blocked_sites,
-            'scheduled_blocks': self.scheduled_blocks,
-            'version': '2.0',
-            'created_by': 'Umar J'
-        }
-        
-        try:
-            with open(self.config_file, 'w') as file:
-                json.dump(config, file, indent=4)
-        except Exception as e:
-            print(f"Error saving config: {e}")
-
     def on_closing(self):
         """Handle application closing"""
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
-            self.save_config()
+            self.worker.close()
+            self.engine.close()
             self.root.destroy()
 
     def run(self):
@@ -965,9 +1265,25 @@ Features:
         # Center window
         self.center_window()
         
+        # The window is drawn and takes input once the main loop first idles
+        self.root.after_idle(self.report_startup)
+        
         # Start the GUI main loop
         self.root.mainloop()
 
+    def report_startup(self):
+        """Record how long each startup phase took, and print it when over budget"""
+        self.startup['first_paint'] = time.perf_counter() - self.gui_built
+        for phase, seconds in self.startup.items():
+            self.engine.stats.observe(f"startup_{phase}", seconds)
+        
+        total = time.perf_counter() - LAUNCHED
+        if total > STARTUP_BUDGET or os.environ.get("BLOCKER_STARTUP_REPORT"):
+            phases = ", ".join(f"{phase.replace('_', ' ')} {seconds * 1000:.0f} ms"
+                               for phase, seconds in self.startup.items())
+            budget = f" (over the {STARTUP_BUDGET * 1000:.0f} ms budget)" if total > STARTUP_BUDGET else ""
+            print(f"Startup: {phases}; {total * 1000:.0f} ms in total{budget}", file=sys.stderr)
+
     def center_window(self):
         """Center the window on screen"""
         self.root.update_idletasks()